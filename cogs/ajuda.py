@@ -15,10 +15,12 @@ class Ajuda(commands.Cog):
 
         embed.add_field(name="🎉 Aniversário", value=(
             "`!adicionardata DD/MM`\n"
-            "`!aniversariantes`\n"
+            "`!aniversariantes [página]`\n"
             "`!meuaniversario`\n"
             "`!removeraniversario`\n"
-            "`!proximosaniversarios`"
+            "`!proximosaniversarios [página]`\n"
+            "`!canalaniversario #canal`\n"
+            "`!cargoaniversario [@cargo]`"
         ), inline=False)
 
         embed.add_field(name="🛡️ Antipalavrão", value=(
@@ -29,9 +31,10 @@ class Ajuda(commands.Cog):
         ), inline=False)
 
         embed.add_field(name="🎁 Sorteios", value=(
-            "`!comecarsorteio <premio>`\n"
-            "`!vencedor`\n"
-            "`!encerrarsorteio`\n"
+            "`!comecarsorteio [duração] [Nv] [nivel:N] [vip:N] <premio>`\n"
+            "`!sorteios`\n"
+            "`!vencedor [id]`\n"
+            "`!encerrarsorteio [id]`\n"
             "`!canaldecomando #canal`\n"
             "`!canaldosorteio #canal`"
         ), inline=False)
@@ -56,7 +59,8 @@ class Ajuda(commands.Cog):
         embed.add_field(name="🔨 Moderação", value=(
             "`!aviso @user [motivo]`\n"
             "`!removeraviso @user [número]`\n"
-            "`!avisos [@user]`\n"
+            "`!avisos [@user] [página]`\n"
+            "`!historicomod [@user] [página]`\n"
             "`!mutar @user tempo [motivo]`\n"
             "`!desmutar @user`\n"
             "`!banir @user`\n"
@@ -76,7 +80,10 @@ class Ajuda(commands.Cog):
             "`!testsaida`"
         ), inline=False)
 
-        embed.add_field(name="📜 Logs", value="`!canaldelogs #canal`", inline=False)
+        embed.add_field(name="📜 Logs", value=(
+            "`!canaldelogs #canal`\n"
+            "`!buscarlogs [@user] [tipo] [período]`"
+        ), inline=False)
 
         embed.add_field(name="🎫 Tickets", value=(
             "`!ticket`\n"
@@ -96,6 +103,8 @@ class Ajuda(commands.Cog):
             "`!sacar / !withdraw`\n"
             "`!loja / !shop`\n"
             "`!comprar / !buy`\n"
+            "`!rank / !ricos [página]`\n"
+            "`!estatisticas / !ecostats`\n"
             "`!vender / !sell`\n"
             "`!crime`\n"
             "`!roubar / !rob`\n"
@@ -1,9 +1,49 @@
 import discord
-from discord.ext import commands
-import os
-from datetime import datetime, timedelta
+from discord.ext import commands, tasks
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
+import calendar
+import os
+from datetime import date, datetime, time, timedelta
+from pymongo import UpdateOne
+
+# Ano bissexto usado como base do dia do ano (29/02 = 60, 01/03 = 61 sempre)
+ANO_BASE = 2000
+DIAS_PROXIMOS = 30
+# Hora local do anúncio diário de aniversários
+HORA_ANUNCIO = int(os.getenv("ANIVERSARIO_HORA", "9"))
+HORARIO_ANUNCIO = time(hour=HORA_ANUNCIO, tzinfo=datetime.now().astimezone().tzinfo)
+MAX_MENCOES_ANUNCIO = 50
+ANIVERSARIOS_POR_PAGINA = 20
+# IDs de membros por consulta $in ao sincronizar um servidor
+SYNC_CHUNK_SIZE = 5000
+
+def dia_do_ano(day, month):
+    """Dia do ano em base bissexta (1-366); ValueError para datas inválidas"""
+    return date(ANO_BASE, month, day).timetuple().tm_yday
+
+def proxima_data(day, month, hoje):
+    """Próxima ocorrência do aniversário a partir de hoje (29/02 vira 28/02 fora de ano bissexto)"""
+    def ocorrencia(ano):
+        try:
+            return date(ano, month, day)
+        except ValueError:
+            return date(ano, 2, 28)
+    
+    data = ocorrencia(hoje.year)
+    return data if data >= hoje else ocorrencia(hoje.year + 1)
+
+def filtro_periodo(inicio, dias):
+    """Filtro de dia_ano para [inicio, inicio + dias], tratando a virada do ano
+    e o 29/02 (incluído quando o período termina em 28/02 de ano não bissexto)"""
+    fim = inicio + timedelta(days=dias)
+    chave_inicio = dia_do_ano(inicio.day, inicio.month)
+    chave_fim = dia_do_ano(fim.day, fim.month)
+    if (fim.month, fim.day) == (2, 28) and not calendar.isleap(fim.year):
+        chave_fim += 1
+    
+    if chave_inicio <= chave_fim:
+        return {'dia_ano': {'$gte': chave_inicio, '$lte': chave_fim}}
+    return {'$or': [{'dia_ano': {'$gte': chave_inicio}}, {'dia_ano': {'$lte': chave_fim}}]}
 
 class Aniversario(commands.Cog):
     def __init__(self, bot):
@@ -11,34 +51,36 @@ class Aniversario(commands.Cog):
         self.client = None
         self.db = None
         self.collection = None
+        self.config_collection = None
         self._connection_ready = False
+        # Evita anúncio duplicado entre a recuperação no startup e o loop diário
+        self.anuncio_lock = asyncio.Lock()
         # Inicializa a conexão com MongoDB
         self.bot.loop.create_task(self.init_database())
+        self.anuncio_diario.start()
 
     async def init_database(self):
-        """Inicializa a conexão com MongoDB"""
+        """Inicializa as coleções usando a conexão compartilhada do bot"""
         try:
-            # URL de conexão do MongoDB (vem de variável de ambiente)
-            mongo_uri = os.getenv("MONGO_URI")
-            
-            if not mongo_uri:
-                print("❌ MONGO_URI não encontrada nas variáveis de ambiente!")
+            # Pool de conexões único, criado em main.CustomBot
+            if not await self.bot.database.ensure_connection():
                 return
             
-            print("🔄 Conectando ao MongoDB (Aniversários)...")
-            self.client = AsyncIOMotorClient(mongo_uri)
-            
-            # Testa a conexão
-            await self.client.admin.command('ping')
-            
-            self.db = self.client['discord_bot']
+            self.client = self.bot.database.client
+            self.db = self.bot.database.db
             self.collection = self.db['aniversarios']
+            self.config_collection = self.db['aniversario_config']
             self._connection_ready = True
             
-            print("✅ Conectado ao MongoDB (Aniversários) com sucesso!")
+            # dia_ano: anúncio do dia; (guild_ids, dia_ano): listas e próximos do servidor
+            await self.collection.create_index('user_id')
+            await self.collection.create_index('dia_ano')
+            await self.collection.create_index([('guild_ids', 1), ('dia_ano', 1)])
+            await self.config_collection.create_index('guild_id', unique=True)
+            self.bot.loop.create_task(self.backfill_aniversarios())
             
         except Exception as e:
-            print(f"❌ Erro ao conectar com MongoDB (Aniversários): {e}")
+            print(f"❌ Erro ao inicializar MongoDB (Aniversários): {e}")
             self._connection_ready = False
 
     async def ensure_connection(self):
@@ -47,8 +89,8 @@ class Aniversario(commands.Cog):
             await self.init_database()
         return self._connection_ready
 
-    async def save_birthday(self, user_id, name, date, day, month):
-        """Salva aniversário no MongoDB"""
+    async def save_birthday(self, user_id, guild_id, name, date, day, month):
+        """Salva aniversário no MongoDB (com o dia do ano e o servidor do membro)"""
         try:
             if not await self.ensure_connection():
                 return False
@@ -61,8 +103,10 @@ class Aniversario(commands.Cog):
                         'name': name,
                         'date': date,
                         'day': day,
-                        'month': month
-                    }
+                        'month': month,
+                        'dia_ano': dia_do_ano(day, month)
+                    },
+                    '$addToSet': {'guild_ids': str(guild_id)}
                 },
                 upsert=True
             )
@@ -81,17 +125,227 @@ class Aniversario(commands.Cog):
             print(f"❌ Erro ao buscar aniversário: {e}")
             return None
 
-    async def get_all_birthdays(self):
-        """Busca todos os aniversários no MongoDB"""
+    async def get_guild_birthdays(self, guild_id, periodo=None, pagina=None):
+        """Busca os aniversários dos membros do servidor (opcionalmente só um
+        período ou uma página), ordenados pelo dia do ano"""
         try:
             if not await self.ensure_connection():
                 return []
-            cursor = self.collection.find({})
+            query = {'guild_ids': str(guild_id)}
+            if periodo:
+                query.update(periodo)
+            cursor = self.collection.find(query, {'_id': 0, 'name': 1, 'date': 1, 'day': 1, 'month': 1}).sort('dia_ano', 1)
+            if pagina:
+                cursor = cursor.skip((pagina - 1) * ANIVERSARIOS_POR_PAGINA).limit(ANIVERSARIOS_POR_PAGINA)
             return await cursor.to_list(length=None)
         except Exception as e:
             print(f"❌ Erro ao buscar aniversários: {e}")
             return []
 
+    async def count_guild_birthdays(self, guild_id):
+        """Conta os aniversários cadastrados dos membros do servidor"""
+        try:
+            if not await self.ensure_connection():
+                return 0
+            return await self.collection.count_documents({'guild_ids': str(guild_id)})
+        except Exception as e:
+            print(f"❌ Erro ao contar aniversários: {e}")
+            return 0
+
+    async def update_membership(self, user_id, guild_id, is_member):
+        """Adiciona/remove o servidor do aniversário do usuário (sem efeito se não houver cadastro)"""
+        try:
+            if not await self.ensure_connection():
+                return
+            operador = '$addToSet' if is_member else '$pull'
+            await self.collection.update_one(
+                {'user_id': str(user_id)},
+                {operador: {'guild_ids': str(guild_id)}}
+            )
+        except Exception as e:
+            print(f"❌ Erro ao atualizar membros do aniversário: {e}")
+
+    async def sincronizar_membros(self, guild):
+        """Reconcilia guild_ids com os membros atuais do servidor.
+
+        Só consulta aniversários do próprio servidor e dos seus membros
+        (em lotes de $in), nunca a coleção inteira.
+        """
+        # Sem a lista completa de membros a diferença removeria membros válidos
+        if not guild.chunked or not await self.ensure_connection():
+            return
+        
+        guild_id = str(guild.id)
+        try:
+            membros = {str(member.id) for member in guild.members if not member.bot}
+            registrados = set(await self.collection.distinct('user_id', {'guild_ids': guild_id}))
+            
+            sairam = list(registrados - membros)
+            candidatos = list(membros - registrados)
+            entraram = []
+            for i in range(0, len(candidatos), SYNC_CHUNK_SIZE):
+                entraram += await self.collection.distinct(
+                    'user_id',
+                    {'user_id': {'$in': candidatos[i:i + SYNC_CHUNK_SIZE]}}
+                )
+            
+            if sairam:
+                await self.collection.update_many(
+                    {'user_id': {'$in': sairam}},
+                    {'$pull': {'guild_ids': guild_id}}
+                )
+            if entraram:
+                await self.collection.update_many(
+                    {'user_id': {'$in': entraram}},
+                    {'$addToSet': {'guild_ids': guild_id}}
+                )
+            if sairam or entraram:
+                print(f"🎂 Aniversários sincronizados em {guild.name}: +{len(entraram)} -{len(sairam)}")
+        except Exception as e:
+            print(f"❌ Erro ao sincronizar aniversários de {guild.name}: {e}")
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild):
+        await self.sincronizar_membros(guild)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        if not member.bot:
+            await self.update_membership(member.id, member.guild.id, True)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        if not member.bot:
+            await self.update_membership(member.id, member.guild.id, False)
+
+    async def save_config(self, guild_id, campos):
+        """Salva canal/cargo de aniversário do servidor"""
+        try:
+            if not await self.ensure_connection():
+                return False
+            await self.config_collection.update_one(
+                {'guild_id': str(guild_id)},
+                {'$set': campos},
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            print(f"❌ Erro ao salvar configuração de aniversário: {e}")
+            return False
+
+    async def backfill_aniversarios(self):
+        """Preenche dia_ano dos aniversários salvos antes desse campo
+        (guild_ids é preenchido por sincronizar_membros)"""
+        await self.bot.wait_until_ready()
+        try:
+            operacoes = []
+            async for doc in self.collection.find({'dia_ano': {'$exists': False}}):
+                try:
+                    chave = dia_do_ano(doc['day'], doc['month'])
+                except (KeyError, ValueError):
+                    chave = None  # Data inválida: fica fora das consultas por período
+                operacoes.append(UpdateOne({'_id': doc['_id']}, {'$set': {'dia_ano': chave}}))
+            
+            if operacoes:
+                await self.collection.bulk_write(operacoes, ordered=False)
+                print(f"🎂 {len(operacoes)} aniversários migrados para o índice por dia do ano")
+        except Exception as e:
+            print(f"❌ Erro ao migrar aniversários: {e}")
+        
+        # Bot reiniciado depois do horário: faz o anúncio que ficou para trás
+        if datetime.now().hour >= HORA_ANUNCIO:
+            await self.anunciar_aniversarios()
+
+    async def anunciar_aniversarios(self):
+        """Anuncia os aniversariantes do dia e atualiza o cargo, uma vez por dia e servidor.
+
+        Os aniversariantes de todos os servidores pendentes vêm de uma única
+        consulta pelo dia do ano de hoje.
+        """
+        async with self.anuncio_lock:
+            await self._anunciar_aniversarios()
+
+    async def _anunciar_aniversarios(self):
+        if not await self.ensure_connection():
+            return
+        
+        hoje = date.today()
+        try:
+            configs = await self.config_collection.find(
+                {'ultimo_anuncio': {'$ne': hoje.isoformat()}}
+            ).to_list(length=None)
+            if not configs:
+                return
+            
+            pendentes = {config['guild_id']: config for config in configs}
+            query = {'guild_ids': {'$in': list(pendentes)}}
+            query.update(filtro_periodo(hoje, 0))
+            
+            aniversariantes = {guild_id: [] for guild_id in pendentes}
+            async for doc in self.collection.find(query, {'_id': 0, 'user_id': 1, 'guild_ids': 1}):
+                for guild_id in doc.get('guild_ids', []):
+                    if guild_id in aniversariantes:
+                        aniversariantes[guild_id].append(int(doc['user_id']))
+        except Exception as e:
+            print(f"❌ Erro ao buscar aniversariantes do dia: {e}")
+            return
+        
+        concluidos = []
+        for guild_id, config in pendentes.items():
+            guild = self.bot.get_guild(int(guild_id))
+            if not guild:
+                continue
+            try:
+                membros = [m for m in map(guild.get_member, aniversariantes[guild_id]) if m]
+                await self.atualizar_cargo(guild, config.get('cargo_id'), membros)
+                await self.enviar_anuncio(guild, config.get('canal_id'), membros)
+                concluidos.append(guild_id)
+            except Exception as e:
+                print(f"❌ Erro no anúncio de aniversários ({guild_id}): {e}")
+        
+        if concluidos:
+            await self.config_collection.update_many(
+                {'guild_id': {'$in': concluidos}},
+                {'$set': {'ultimo_anuncio': hoje.isoformat()}}
+            )
+
+    async def atualizar_cargo(self, guild, cargo_id, membros):
+        """Dá o cargo aos aniversariantes de hoje e tira dos de ontem"""
+        cargo = guild.get_role(cargo_id) if cargo_id else None
+        if not cargo:
+            return
+        
+        for membro in cargo.members:
+            if membro not in membros:
+                await membro.remove_roles(cargo, reason="Fim do aniversário")
+        for membro in membros:
+            if cargo not in membro.roles:
+                await membro.add_roles(cargo, reason="Aniversário")
+
+    async def enviar_anuncio(self, guild, canal_id, membros):
+        canal = guild.get_channel(canal_id) if canal_id else None
+        if not canal or not membros:
+            return
+        
+        mencoes = " ".join(membro.mention for membro in membros[:MAX_MENCOES_ANUNCIO])
+        if len(membros) > MAX_MENCOES_ANUNCIO:
+            mencoes += f" e mais {len(membros) - MAX_MENCOES_ANUNCIO}"
+        embed = discord.Embed(
+            title="🎉 Feliz Aniversário!",
+            description=f"Hoje é aniversário de {mencoes}! 🎂\nDeseje parabéns!",
+            color=0xff66cc
+        )
+        await canal.send(embed=embed)
+
+    @tasks.loop(time=HORARIO_ANUNCIO)
+    async def anuncio_diario(self):
+        """Anúncio diário dos aniversariantes"""
+        await self.anunciar_aniversarios()
+
+    @anuncio_diario.before_loop
+    async def before_anuncio_diario(self):
+        await self.bot.wait_until_ready()
+
     async def delete_birthday(self, user_id):
         """Remove aniversário do MongoDB"""
         try:
@@ -110,13 +364,12 @@ class Aniversario(commands.Cog):
             membro = ctx.author
         
         try:
-            # Valida formato DD/MM
+            # Valida formato DD/MM (dia_do_ano rejeita datas como 31/02)
             day, month = map(int, data.split('/'))
-            if not (1 <= day <= 31) or not (1 <= month <= 12):
-                raise ValueError
+            dia_do_ano(day, month)
             
             user_id = str(membro.id)
-            success = await self.save_birthday(user_id, membro.display_name, data, day, month)
+            success = await self.save_birthday(user_id, ctx.guild.id, membro.display_name, data, day, month)
             
             if success:
                 embed = discord.Embed(
@@ -141,11 +394,12 @@ class Aniversario(commands.Cog):
             await ctx.send(embed=embed)
 
     @commands.command(name='aniversariantes', aliases=['bds'])
-    async def listar_aniversariantes(self, ctx):
-        """Lista todos os aniversariantes do servidor"""
-        birthdays = await self.get_all_birthdays()
+    async def listar_aniversariantes(self, ctx, pagina: int = 1):
+        """Lista os aniversariantes do servidor. Uso: !aniversariantes [página]"""
+        pagina = max(1, pagina)
+        total = await self.count_guild_birthdays(ctx.guild.id)
         
-        if not birthdays:
+        if not total:
             embed = discord.Embed(
                 title="📅 Aniversariantes",
                 description="Nenhum aniversário cadastrado ainda.",
@@ -154,23 +408,17 @@ class Aniversario(commands.Cog):
             await ctx.send(embed=embed)
             return
         
-        # Ordena por mês e dia
-        sorted_birthdays = sorted(
-            birthdays,
-            key=lambda x: (x['month'], x['day'])
-        )
-        
-        description = ""
-        for data in sorted_birthdays:
-            member = ctx.guild.get_member(int(data['user_id']))
-            if member:  # Só mostra se o membro ainda está no servidor
-                description += f"🎉 **{data['name']}** - {data['date']}\n"
+        total_paginas = (total - 1) // ANIVERSARIOS_POR_PAGINA + 1
+        pagina = min(pagina, total_paginas)
+        # Só membros do servidor (guild_ids), já ordenados por dia do ano
+        birthdays = await self.get_guild_birthdays(ctx.guild.id, pagina=pagina)
         
         embed = discord.Embed(
             title="🎂 Lista de Aniversariantes",
-            description=description if description else "Nenhum membro encontrado.",
+            description="\n".join(f"🎉 **{data['name']}** - {data['date']}" for data in birthdays),
             color=0x9966ff
         )
+        embed.set_footer(text=f"Página {pagina}/{total_paginas} • {total} aniversários")
         await ctx.send(embed=embed)
 
     @commands.command(name='meuaniversario', aliases=['mybd'])
@@ -228,68 +476,87 @@ class Aniversario(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(name='proximosaniversarios', aliases=['nextbds'])
-    async def proximos_aniversarios(self, ctx):
-        """Mostra os próximos aniversários (próximos 30 dias)"""
-        birthdays = await self.get_all_birthdays()
+    async def proximos_aniversarios(self, ctx, pagina: int = 1):
+        """Mostra os próximos aniversários (próximos 30 dias). Uso: !proximosaniversarios [página]"""
+        hoje = date.today()
+        # Consulta limitada ao período pelo índice (guild_ids, dia_ano)
+        birthdays = await self.get_guild_birthdays(ctx.guild.id, filtro_periodo(hoje, DIAS_PROXIMOS))
         
-        if not birthdays:
-            embed = discord.Embed(
-                title="📅 Próximos Aniversários",
-                description="Nenhum aniversário cadastrado.",
-                color=0xffaa00
-            )
-            await ctx.send(embed=embed)
-            return
-        
-        hoje = datetime.now()
-        proximos = []
-        
-        for data in birthdays:
-            # Calcula próximo aniversário
-            try:
-                aniversario = datetime(hoje.year, data['month'], data['day'])
-                if aniversario < hoje:
-                    aniversario = datetime(hoje.year + 1, data['month'], data['day'])
-                
-                dias_restantes = (aniversario - hoje).days
-                if dias_restantes <= 30:
-                    member = ctx.guild.get_member(int(data['user_id']))
-                    if member:
-                        proximos.append((dias_restantes, data['name'], data['date']))
-            except ValueError:
-                continue  # Data inválida (ex: 29/02 em ano não bissexto)
+        proximos = [
+            ((proxima_data(data['day'], data['month'], hoje) - hoje).days, data['name'], data['date'])
+            for data in birthdays
+        ]
         
         if not proximos:
             embed = discord.Embed(
                 title="📅 Próximos Aniversários",
-                description="Nenhum aniversário nos próximos 30 dias.",
+                description=f"Nenhum aniversário nos próximos {DIAS_PROXIMOS} dias.",
                 color=0xffaa00
             )
             await ctx.send(embed=embed)
             return
         
-        # Ordena por dias restantes
+        # Ordena por dias restantes (a virada do ano quebra a ordem do dia_ano)
         proximos.sort(key=lambda x: x[0])
         
-        description = ""
-        for dias, nome, data in proximos:
+        total_paginas = (len(proximos) - 1) // ANIVERSARIOS_POR_PAGINA + 1
+        pagina = min(max(1, pagina), total_paginas)
+        inicio = (pagina - 1) * ANIVERSARIOS_POR_PAGINA
+        
+        linhas = []
+        for dias, nome, data in proximos[inicio:inicio + ANIVERSARIOS_POR_PAGINA]:
             if dias == 0:
-                description += f"🎉 **{nome}** - HOJE! ({data})\n"
+                linhas.append(f"🎉 **{nome}** - HOJE! ({data})")
             else:
-                description += f"🎂 **{nome}** - em {dias} dias ({data})\n"
+                linhas.append(f"🎂 **{nome}** - em {dias} dias ({data})")
         
         embed = discord.Embed(
-            title="📅 Próximos Aniversários (30 dias)",
-            description=description,
+            title=f"📅 Próximos Aniversários ({DIAS_PROXIMOS} dias)",
+            description="\n".join(linhas),
             color=0x00ff7f
         )
+        embed.set_footer(text=f"Página {pagina}/{total_paginas} • {len(proximos)} aniversários")
+        await ctx.send(embed=embed)
+
+    @commands.command(name='canalaniversario', aliases=['bdchannel'])
+    @commands.has_permissions(administrator=True)
+    async def canal_aniversario(self, ctx, canal: discord.TextChannel):
+        """Define o canal do anúncio diário de aniversários"""
+        if await self.save_config(ctx.guild.id, {'canal_id': canal.id}):
+            embed = discord.Embed(
+                title="✅ Canal de Aniversários Definido",
+                description=f"Os aniversariantes serão anunciados em {canal.mention} todos os dias às {HORA_ANUNCIO}h.",
+                color=0x00ff7f
+            )
+        else:
+            embed = discord.Embed(
+                title="❌ Erro de Conexão",
+                description="Não foi possível salvar. Verifique a conexão com o banco de dados.",
+                color=0xff4444
+            )
+        await ctx.send(embed=embed)
+
+    @commands.command(name='cargoaniversario', aliases=['bdrole'])
+    @commands.has_permissions(administrator=True)
+    async def cargo_aniversario(self, ctx, cargo: discord.Role = None):
+        """Define (ou remove, sem argumento) o cargo dado aos aniversariantes do dia"""
+        if await self.save_config(ctx.guild.id, {'cargo_id': cargo.id if cargo else None}):
+            embed = discord.Embed(
+                title="✅ Cargo de Aniversário Atualizado",
+                description=f"Aniversariantes recebem o cargo {cargo.mention} no dia." if cargo else "Cargo de aniversário removido.",
+                color=0x00ff7f
+            )
+        else:
+            embed = discord.Embed(
+                title="❌ Erro de Conexão",
+                description="Não foi possível salvar. Verifique a conexão com o banco de dados.",
+                color=0xff4444
+            )
         await ctx.send(embed=embed)
 
     async def cog_unload(self):
-        """Fecha a conexão com MongoDB quando o cog é descarregado"""
-        if self.client:
-            self.client.close()
-            print("🔌 Conexão com MongoDB (Aniversários) fechada")
+        """Para o anúncio diário"""
+        self.anuncio_diario.cancel()
 
 async def setup(bot):
     await bot.add_cog(Aniversario(bot))
\ No newline at end of file
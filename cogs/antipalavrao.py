@@ -3,7 +3,136 @@ from discord.ext import commands
 import json
 import os
 import re
-from motor.motor_asyncio import AsyncIOMotorClient
+import unicodedata
+
+# Leetspeak folding ("p0rr4" -> "porra")
+LEET = str.maketrans({
+    '0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's',
+    '7': 't', '8': 'b', '@': 'a', '$': 's'
+})
+# Characters used to split letters apart ("p.o.r.r.a")
+SEPARADORES = ".,-_*'\"`´~^|/\\+:;"
+TOKENS = re.compile(r'[\s' + re.escape(SEPARADORES) + r']+')
+REPETIDAS = re.compile(r'(.)\1+')
+# Shortest banned word matched inside a longer run of single letters
+# (shorter ones must cover the whole run: "o c u p a d o" is not "cu")
+MIN_TRECHO = 4
+
+
+def dobrar(texto):
+    """Lowercase, strip accents (NFKD) and fold leetspeak"""
+    texto = unicodedata.normalize('NFKD', texto.lower()).translate(LEET)
+    return ''.join(ch for ch in texto if not unicodedata.combining(ch))
+
+
+def normalizar_texto(texto):
+    """Normalize a message for profanity matching.
+
+    Returns ``(palavras, sequencias)``. ``palavras`` is the folded text with
+    whitespace and separators turned into single spaces, so neighbouring
+    words never get glued together ("ok,porra" -> "ok pora"). ``sequencias``
+    holds every run of two or more single-letter tokens joined together
+    ("e a p u t a" -> "eaputa"); these are matched without word boundaries.
+    Repeated letters are squashed in both. Every step is linear in the
+    length of the text.
+    """
+    palavras = []
+    sequencias = []
+    soltas = []
+    for token in TOKENS.split(dobrar(texto)):
+        if not token:
+            continue
+        palavras.append(token)
+        if len(token) == 1 and token.isalpha():
+            soltas.append(token)
+            continue
+        if len(soltas) > 1:
+            sequencias.append(''.join(soltas))
+        soltas = []
+    if len(soltas) > 1:
+        sequencias.append(''.join(soltas))
+
+    return (
+        REPETIDAS.sub(r'\1', ' '.join(palavras)),
+        [REPETIDAS.sub(r'\1', sequencia) for sequencia in sequencias]
+    )
+
+
+def normalizar_palavra(palavra):
+    """Normalize a banned word the same way (separators inside it are dropped)"""
+    palavra = ''.join(ch for ch in dobrar(palavra) if ch not in SEPARADORES)
+    return REPETIDAS.sub(r'\1', ' '.join(palavra.split()))
+
+
+def montar_trie(palavras):
+    """Build a trie-shaped regex from already normalized words"""
+    trie = {}
+    for palavra in palavras:
+        node = trie
+        for ch in palavra:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def montar(node):
+        ramos = [re.escape(ch) + montar(filho) for ch, filho in node.items() if ch != '']
+        if not ramos:
+            return ''
+        padrao = ramos[0] if len(ramos) == 1 else '(?:' + '|'.join(ramos) + ')'
+        if '' in node:
+            padrao = '(?:' + padrao + ')?'
+        return padrao
+
+    return montar(trie)
+
+
+class Matcher:
+    """Compiled profanity matcher for one word list.
+
+    Words are matched as whole words in the normalized text. A run of
+    single letters matches when it spells a banned word exactly, or when it
+    contains one at least ``MIN_TRECHO`` letters long. Each normalized form
+    maps back to the banned word it came from, so callers report the
+    original word.
+    """
+
+    def __init__(self, palavras):
+        self.originais = {}
+        for palavra in palavras:
+            normalizada = normalizar_palavra(palavra)
+            if normalizada:
+                self.originais.setdefault(normalizada, palavra)
+                self.originais.setdefault(normalizada.replace(' ', ''), palavra)
+
+        self.palavras = re.compile(r'\b' + montar_trie(self.originais) + r'\b')
+        juntas = [p for p in self.originais if ' ' not in p]
+        self.sequencias = re.compile(montar_trie(juntas))
+        longas = [p for p in juntas if len(p) >= MIN_TRECHO]
+        self.trechos = re.compile(montar_trie(longas)) if longas else None
+
+    def procurar(self, texto):
+        """Return the original banned word found in ``texto``, or None"""
+        palavras, sequencias = normalizar_texto(texto)
+        encontrado = self.palavras.search(palavras)
+        if encontrado is None:
+            for sequencia in sequencias:
+                encontrado = self.sequencias.fullmatch(sequencia)
+                if encontrado is None and self.trechos is not None:
+                    encontrado = self.trechos.search(sequencia)
+                if encontrado:
+                    break
+        return self.originais[encontrado.group(0)] if encontrado else None
+
+
+def compilar_matcher(palavras):
+    """Compile a word list into a Matcher (None when the list is empty).
+
+    Words are normalized once here, and shared prefixes are merged into a
+    trie, so the work per message position depends on the length of the
+    words, not on how many words the list has.
+    """
+    matcher = Matcher(palavras)
+    return matcher if matcher.originais else None
+
 
 class Antipalavrao(commands.Cog):
     def __init__(self, bot):
@@ -18,6 +147,10 @@ class Antipalavrao(commands.Cog):
         
         # In-memory data
         self.palavroes = []
+        self.guild_palavroes = {}  # guild_id -> word list (None = uses global list)
+        self.matchers = {}  # guild_id -> compiled matcher
+        self.global_matcher = None
+        self._global_matcher_ready = False
         self.configuracoes = {
             'ativo': True,
             'deletar_mensagem': True,
@@ -28,26 +161,18 @@ class Antipalavrao(commands.Cog):
         self.bot.loop.create_task(self.init_database())
     
     async def init_database(self):
-        """Initialize MongoDB connection"""
+        """Initialize collections from the bot's shared MongoDB connection"""
         try:
-            mongo_uri = os.getenv("MONGO_URI")
-            
-            if not mongo_uri:
-                print("❌ MONGO_URI não encontrada nas variáveis de ambiente!")
+            # Single connection pool owned by main.CustomBot
+            if not await self.bot.database.ensure_connection():
                 self.load_data()
                 return
             
-            print("🔄 Conectando ao MongoDB...")
-            self.client = AsyncIOMotorClient(mongo_uri)
-            
-            # Test connection
-            await self.client.admin.command('ping')
-            
-            self.db = self.client['discord_bot']
+            self.client = self.bot.database.client
+            self.db = self.bot.database.db
             self.collection = self.db['antipalavrao']
             self._connection_ready = True
             
-            print("✅ Conectado ao MongoDB com sucesso!")
             await self.load_data_from_mongodb()
             
         except Exception as e:
@@ -63,19 +188,50 @@ class Antipalavrao(commands.Cog):
         return self._connection_ready
 
     async def get_guild_palavroes(self, guild_id):
-        """Get guild specific words from MongoDB"""
+        """Get guild specific words (loaded from MongoDB once, then kept in memory)"""
+        guild_id = str(guild_id)
+        if guild_id in self.guild_palavroes:
+            palavras = self.guild_palavroes[guild_id]
+            return list(palavras if palavras is not None else self.palavroes)
+        
         try:
             if not await self.ensure_connection():
-                return self.palavroes
+                return list(self.palavroes)
                 
-            doc = await self.collection.find_one({"guild_id": str(guild_id)})
+            doc = await self.collection.find_one({"guild_id": guild_id}, {"palavroes": 1})
             if doc and 'palavroes' in doc:
-                return doc['palavroes']
-            return self.palavroes
+                self.guild_palavroes[guild_id] = doc['palavroes']
+            else:
+                self.guild_palavroes[guild_id] = None
+            return await self.get_guild_palavroes(guild_id)
             
         except Exception as e:
             print(f"❌ Erro ao buscar palavrões: {e}")
-            return self.palavroes
+            return list(self.palavroes)
+
+    async def get_matcher(self, guild_id):
+        """Get the compiled matcher for a guild, building it on first use"""
+        guild_id = str(guild_id)
+        if guild_id in self.matchers:
+            return self.matchers[guild_id]
+        
+        palavras = await self.get_guild_palavroes(guild_id)
+        
+        # Guilds without their own list share the global matcher
+        if self.guild_palavroes.get(guild_id) is None:
+            if not self._global_matcher_ready:
+                self.global_matcher = compilar_matcher(self.palavroes)
+                self._global_matcher_ready = True
+            return self.global_matcher
+        
+        matcher = compilar_matcher(palavras)
+        self.matchers[guild_id] = matcher
+        return matcher
+
+    def reset_global_matcher(self):
+        """Drop the global matcher so it is rebuilt from the current global list"""
+        self.global_matcher = None
+        self._global_matcher_ready = False
 
     async def save_guild_palavroes(self, guild_id, palavroes_list):
         """Save guild specific words to MongoDB"""
@@ -88,6 +244,10 @@ class Antipalavrao(commands.Cog):
                 {"$set": {"palavroes": palavroes_list}},
                 upsert=True
             )
+            
+            # Rebuild this guild's matcher on next use
+            self.guild_palavroes[str(guild_id)] = list(palavroes_list)
+            self.matchers.pop(str(guild_id), None)
             return True
                 
         except Exception as e:
@@ -143,6 +303,7 @@ class Antipalavrao(commands.Cog):
             palavroes_doc = await self.collection.find_one({"type": "global_palavroes"})
             if palavroes_doc:
                 self.palavroes = palavroes_doc.get('lista', [])
+            self.reset_global_matcher()
             
             print(f"📊 Carregados {len(self.palavroes)} palavrões do MongoDB")
             
@@ -152,6 +313,7 @@ class Antipalavrao(commands.Cog):
     
     async def save_data_to_mongodb(self):
         """Save data to MongoDB"""
+        self.reset_global_matcher()
         try:
             if not await self.ensure_connection():
                 self.save_data()
@@ -200,6 +362,7 @@ class Antipalavrao(commands.Cog):
                 'avisar_usuario': True
             }
             self.save_data()
+        self.reset_global_matcher()
     
     def save_data(self):
         """Save data to JSON file fallback"""
@@ -364,21 +527,16 @@ class Antipalavrao(commands.Cog):
         if message.author.guild_permissions.manage_messages:
             return
         
-        # Get guild specific words
-        guild_palavroes = await self.get_guild_palavroes(message.guild.id)
-        
-        # Check if message contains profanity
-        conteudo = message.content.lower()
-        palavrao_encontrado = None
+        # Get guild specific matcher (compiled once per word list)
+        matcher = await self.get_matcher(message.guild.id)
+        if matcher is None:
+            return
         
-        for palavrao in guild_palavroes:
-            # Use regex to find word as complete word
-            padrao = r'\b' + re.escape(palavrao) + r'\b'
-            if re.search(padrao, conteudo):
-                palavrao_encontrado = palavrao
-                break
+        # Check if message contains profanity in a single pass
+        palavrao_encontrado = matcher.procurar(message.content)
         
         if palavrao_encontrado:
+            print(f"🚫 Palavrão '{palavrao_encontrado}' de {message.author} em {message.guild.name}")
             # Delete message if configured
             if self.configuracoes.get('deletar_mensagem', True):
                 try:
@@ -414,12 +572,6 @@ class Antipalavrao(commands.Cog):
                 color=0xff4444
             )
             await ctx.send(embed=embed)
-    
-    async def cog_unload(self):
-        """Cleanup when cog is unloaded"""
-        if self.client:
-            self.client.close()
-            print("🔌 Conexão com MongoDB fechada")
 
 async def setup(bot):
     await bot.add_cog(Antipalavrao(bot))
\ No newline at end of file
@@ -1,10 +1,25 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import asyncio
+import copy
 import random
+import time
 from datetime import datetime, timedelta
-import os
-from motor.motor_asyncio import AsyncIOMotorClient
+from types import MappingProxyType
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from utils.cache import MISSING
+from utils.locks import KeyedLock, SingleFlight
+
+# O catálogo da loja quase nunca muda: recarrega no máximo uma vez por hora
+SHOP_CACHE_TTL = 3600
+SHOP_RETRY_SECONDS = 30
+
+# Resumo materializado da economia (!rank / !estatisticas)
+ECONOMY_STATS_INTERVAL = 10  # minutos
+RANK_SIZE = 50
+RANK_PAGE_SIZE = 10
+STATS_PERCENTILES = (25, 50, 75, 90, 99)
 
 class Economia(commands.Cog):
     def __init__(self, bot):
@@ -13,8 +28,25 @@ class Economia(commands.Cog):
         self.db = None
         self.users_collection = None
         self.shop_collection = None
-        self.vip_collection = None
         self._connection_ready = False
+        # Índice único impossível de criar: economia desativada até recarregar o cog
+        self._index_failed = False
+        
+        # Serializa os comandos de cada usuário e agrupa leituras simultâneas
+        self.user_locks = KeyedLock()
+        self.user_reads = SingleFlight()
+        
+        # Catálogo da loja em memória (somente leitura) com número de versão
+        self.shop_catalog = MappingProxyType({})
+        self.shop_version = 0
+        self.shop_expires_at = 0
+        self.shop_embed = None
+        self.shop_embed_version = None
+        
+        # Resumo da economia em memória (espelho do documento em economia_stats)
+        self.stats_collection = None
+        self.economy_summary = None
+        
         # Inicializa a conexão com MongoDB
         self.bot.loop.create_task(self.init_database())
         
@@ -48,25 +80,44 @@ class Economia(commands.Cog):
         }
 
     async def init_database(self):
-        """Inicializa a conexão com MongoDB"""
+        """Inicializa as coleções usando a conexão compartilhada do bot"""
         try:
-            mongo_uri = os.getenv("MONGO_URI")
-            if not mongo_uri:
-                print("❌ MONGO_URI não encontrada nas variáveis de ambiente!")
+            # Pool de conexões único, criado em main.CustomBot
+            if not await self.bot.database.ensure_connection():
                 return
             
-            print("🔄 Conectando ao MongoDB (Economia)...")
-            self.client = AsyncIOMotorClient(mongo_uri)
-            
-            # Testa a conexão
-            await self.client.admin.command('ping')
-            
-            self.db = self.client['discord_bot']
+            self.client = self.bot.database.client
+            self.db = self.bot.database.db
             self.users_collection = self.db['users']
             self.shop_collection = self.db['shop']
-            self.vip_collection = self.db['vip_users']
+            self.stats_collection = self.db['economia_stats']
+            
+            # Índice único: o upsert das transações não pode duplicar usuários.
+            # Sem ele os filtros de cooldown/saldo podem casar com outra cópia
+            # do usuário, então a economia só fica disponível com o índice.
+            # Bancos antigos podem ter cópias (corrida do insert_one): une antes.
+            await self.merge_duplicate_users()
+            try:
+                await self.users_collection.create_index("user_id", unique=True)
+            except OperationFailure as e:
+                self._index_failed = True
+                print(
+                    "❌ Economia desativada: o índice único em users.user_id não pôde ser criado "
+                    f"mesmo após unir os usuários duplicados. Corrija a coleção users e recarregue o cog. ({e})"
+                )
+                return
             self._connection_ready = True
             
+            # Patrimônio (carteira + banco) indexado para ranking e percentis
+            await self.backfill_patrimonio()
+            await self.users_collection.create_index([("patrimonio", -1)])
+            
+            if self.economy_summary is None:
+                self.economy_summary = await self.stats_collection.find_one({"_id": "summary"})
+            
+            if not self.refresh_economy_stats.is_running():
+                self.refresh_economy_stats.start()
+            
             # Inicializa dados da loja
             await self.initialize_shop_data()
             
@@ -78,10 +129,50 @@ class Economia(commands.Cog):
 
     async def ensure_connection(self):
         """Garante que a conexão com MongoDB está ativa"""
+        if self._index_failed:
+            return False
         if not self._connection_ready:
             await self.init_database()
         return self._connection_ready
 
+    async def merge_duplicate_users(self):
+        """Une documentos com o mesmo user_id em um só (saldos e itens somados)"""
+        duplicates = await self.users_collection.aggregate([
+            {"$group": {"_id": "$user_id", "docs": {"$push": "$$ROOT"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}}
+        ], allowDiskUse=True).to_list(length=None)
+        
+        for group in duplicates:
+            docs = group["docs"]
+            # Mantém a cópia mais rica; as demais são somadas a ela e removidas
+            docs.sort(key=lambda doc: (doc.get("balance") or 0) + (doc.get("bank") or 0), reverse=True)
+            merged = dict(docs[0])
+            merged["balance"] = sum(doc.get("balance") or 0 for doc in docs)
+            merged["bank"] = sum(doc.get("bank") or 0 for doc in docs)
+            merged.pop("patrimonio", None)  # recalculado pelo backfill_patrimonio
+            
+            inventory = {}
+            employees = []
+            for doc in docs:
+                for item, quantity in (doc.get("inventory") or {}).items():
+                    inventory[item] = inventory.get(item, 0) + quantity
+                for employee in doc.get("employees") or []:
+                    if employee not in employees:
+                        employees.append(employee)
+            merged["inventory"] = inventory
+            merged["employees"] = employees
+            merged["is_boss"] = any(doc.get("is_boss") for doc in docs)
+            merged["job"] = next((doc["job"] for doc in docs if doc.get("job")), None)
+            for field in ("last_daily", "last_work", "last_crime"):
+                values = [doc[field] for doc in docs if doc.get(field)]
+                merged[field] = max(values) if values else None
+            
+            await self.users_collection.replace_one({"_id": merged["_id"]}, merged)
+            await self.users_collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs[1:]]}})
+        
+        if duplicates:
+            print(f"🔧 {len(duplicates)} usuários duplicados unidos na coleção users")
+
     async def initialize_shop_data(self):
         """Inicializa dados da loja no MongoDB se não existir"""
         try:
@@ -97,62 +188,92 @@ class Economia(commands.Cog):
                     {"item": "casa", "price": 200000, "desc": "Casa própria"}
                 ]
                 await self.shop_collection.insert_many(shop_items)
+                self.invalidate_shop_catalog()
                 print("✅ Dados da loja inicializados no MongoDB")
         except Exception as e:
             print(f"❌ Erro ao inicializar loja: {e}")
 
     async def get_shop_data(self):
-        """Obtém dados da loja do MongoDB"""
+        """Obtém o catálogo da loja (mapeamento somente leitura em cache)"""
+        if time.monotonic() >= self.shop_expires_at:
+            await self.user_reads.do(('shop',), self.refresh_shop_catalog)
+        return self.shop_catalog
+
+    async def refresh_shop_catalog(self):
+        """Recarrega o catálogo do MongoDB; a versão só muda se o conteúdo mudou"""
         try:
             if not await self.ensure_connection():
-                return {}
+                self.shop_expires_at = time.monotonic() + SHOP_RETRY_SECONDS
+                return
                 
             shop_data = {}
-            async for item in self.shop_collection.find():
-                shop_data[item["item"]] = {
+            async for item in self.shop_collection.find({}, {"_id": 0, "item": 1, "price": 1, "desc": 1}):
+                shop_data[item["item"]] = MappingProxyType({
                     "price": item["price"],
                     "desc": item["desc"]
-                }
-            return shop_data
+                })
+            
+            if shop_data != dict(self.shop_catalog):
+                self.shop_catalog = MappingProxyType(shop_data)
+                self.shop_version += 1
+            self.shop_expires_at = time.monotonic() + SHOP_CACHE_TTL
         except Exception as e:
             print(f"❌ Erro ao buscar dados da loja: {e}")
-            return {}
+            # Mantém o catálogo atual e tenta de novo em breve
+            self.shop_expires_at = time.monotonic() + SHOP_RETRY_SECONDS
 
-    async def is_vip(self, user_id, guild_id):
-        """Verifica se usuário é VIP"""
-        try:
-            if not await self.ensure_connection():
-                return False
-                
-            user_key = f"{guild_id}_{user_id}"
-            vip_data = await self.vip_collection.find_one({"user_key": user_key})
+    def invalidate_shop_catalog(self):
+        """Força a recarga do catálogo na próxima consulta (chamar ao alterar a loja)"""
+        self.shop_expires_at = 0
+
+    def get_shop_embed(self, shop_data):
+        """Embed da loja, montado uma única vez por versão do catálogo"""
+        if self.shop_embed is None or self.shop_embed_version != self.shop_version:
+            embed = discord.Embed(title="🛒 Loja", color=0x0099ff)
             
-            if vip_data:
-                expiry_date = datetime.fromisoformat(vip_data['expiry'])
-                return datetime.now() < expiry_date
-            return False
-        except Exception as e:
-            print(f"❌ Erro ao verificar VIP: {e}")
-            return False
+            for item, data in shop_data.items():
+                embed.add_field(
+                    name=item.title(),
+                    value=f"{data['desc']}\n**Preço:** {self.format_money(data['price'])}",
+                    inline=True
+                )
+            
+            embed.set_footer(text="Use !comprar <item> para comprar")
+            self.shop_embed = embed
+            self.shop_embed_version = self.shop_version
+        return self.shop_embed
+
+    def is_vip(self, user_id, guild_id):
+        """Verifica se usuário é VIP (índice em memória do VIPSystem)"""
+        vip_cog = self.bot.get_cog('VIPSystem')
+        if vip_cog:
+            return vip_cog.is_vip_cached(user_id, guild_id)
+        return False
 
     async def get_user_data(self, user_id):
-        """Obtém dados do usuário do MongoDB"""
+        """Obtém dados do usuário (cache LRU compartilhado; leituras simultâneas viram uma só)"""
+        user_id = str(user_id)
+        user_data = self.bot.database.profiles.get('users', user_id)
+        if user_data is MISSING:
+            user_data = await self.user_reads.do(user_id, lambda: self.load_user_data(user_id))
+        
+        if user_data is None:
+            # Sem documento: dados padrão em memória, criado na primeira transação
+            return self.get_default_user_data(user_id)
+        return copy.deepcopy(user_data)
+
+    async def load_user_data(self, user_id):
+        """Busca o usuário no MongoDB e guarda no cache (None = usuário sem documento)"""
         try:
             if not await self.ensure_connection():
-                return self.get_default_user_data(str(user_id))
+                return None
                 
-            user_id = str(user_id)
             user_data = await self.users_collection.find_one({"user_id": user_id})
-            
-            if not user_data:
-                default_data = self.get_default_user_data(user_id)
-                await self.users_collection.insert_one(default_data)
-                return default_data
-            
+            self.bot.database.profiles.set('users', user_id, user_data)
             return user_data
         except Exception as e:
             print(f"❌ Erro ao buscar dados do usuário: {e}")
-            return self.get_default_user_data(str(user_id))
+            return None
 
     def get_default_user_data(self, user_id):
         """Retorna dados padrão do usuário"""
@@ -160,6 +281,7 @@ class Economia(commands.Cog):
             "user_id": user_id,
             "balance": 0,
             "bank": 0,
+            "patrimonio": 0,
             "inventory": {},
             "job": None,
             "last_daily": None,
@@ -169,24 +291,158 @@ class Economia(commands.Cog):
             "employees": []
         }
 
-    async def update_user_data(self, user_id, data):
-        """Atualiza dados do usuário no MongoDB"""
+    async def transact(self, user_id, inc=None, set_fields=None, guards=None, upsert=False):
+        """Aplica uma transação atômica no usuário com um único find_one_and_update.
+
+        ``inc`` credita/debita campos, ``set_fields`` grava valores e ``guards``
+        são condições extras do filtro (saldo mínimo, cooldown). Retorna o
+        documento atualizado, None se alguma condição falhou, ou False em erro.
+        """
         try:
             if not await self.ensure_connection():
-                print("❌ Conexão com MongoDB não está disponível para atualização")
+                print("❌ Conexão com MongoDB não está disponível para transação")
                 return False
-                
+            
             user_id = str(user_id)
-            await self.users_collection.update_one(
-                {"user_id": user_id},
-                {"$set": data},
-                upsert=True
-            )
-            return True
+            query = {"user_id": user_id}
+            if guards:
+                query.update(guards)
+            
+            update = {}
+            if inc:
+                # Mantém o patrimônio (carteira + banco) junto com o saldo
+                inc = dict(inc)
+                wealth = inc.get("balance", 0) + inc.get("bank", 0)
+                if wealth:
+                    inc["patrimonio"] = inc.get("patrimonio", 0) + wealth
+                update["$inc"] = inc
+            if set_fields:
+                update["$set"] = set_fields
+            if upsert:
+                # Usuário novo: cria com os valores padrão dos campos não alterados
+                touched = set(inc or {}) | set(set_fields or {})
+                update["$setOnInsert"] = {
+                    field: value for field, value in self.get_default_user_data(user_id).items()
+                    if field != "user_id" and not any(t == field or t.startswith(field + ".") for t in touched)
+                }
+            
+            try:
+                user_data = await self.users_collection.find_one_and_update(
+                    query, update, upsert=upsert, return_document=ReturnDocument.AFTER
+                )
+            except DuplicateKeyError:
+                # O usuário existe mas a condição falhou; o upsert tentou criar outro
+                user_data = None
+            
+            # Documento atualizado vai direto para o cache; condição falha = estado desconhecido
+            if user_data is not None:
+                self.bot.database.profiles.set('users', user_id, user_data)
+            else:
+                self.bot.database.profiles.invalidate('users', user_id)
+            return user_data
         except Exception as e:
-            print(f"❌ Erro ao atualizar dados do usuário: {e}")
+            print(f"❌ Erro na transação do usuário: {e}")
+            self.bot.database.profiles.invalidate('users', str(user_id))
             return False
 
+    def patrimonio_expression(self):
+        """Expressão de agregação: carteira + banco"""
+        return {"$add": [{"$ifNull": ["$balance", 0]}, {"$ifNull": ["$bank", 0]}]}
+
+    async def backfill_patrimonio(self):
+        """Preenche o campo patrimonio em usuários antigos (uma única atualização em lote)"""
+        result = await self.users_collection.update_many(
+            {"patrimonio": {"$exists": False}},
+            [{"$set": {"patrimonio": self.patrimonio_expression()}}]
+        )
+        if result.modified_count:
+            print(f"📊 Patrimônio calculado para {result.modified_count} usuários")
+
+    async def build_economy_summary(self):
+        """Monta o resumo da economia: totais, percentis, ranking e itens"""
+        facet = await self.users_collection.aggregate([
+            {"$facet": {
+                "totals": [
+                    {"$group": {
+                        "_id": None,
+                        "users": {"$sum": 1},
+                        "money_supply": {"$sum": "$patrimonio"},
+                        "wallet": {"$sum": {"$ifNull": ["$balance", 0]}},
+                        "bank": {"$sum": {"$ifNull": ["$bank", 0]}}
+                    }}
+                ],
+                "inventory": [
+                    {"$project": {"items": {"$objectToArray": {"$ifNull": ["$inventory", {}]}}}},
+                    {"$unwind": "$items"},
+                    {"$group": {"_id": "$items.k", "count": {"$sum": "$items.v"}, "owners": {"$sum": 1}}},
+                    {"$sort": {"count": -1}}
+                ]
+            }}
+        ]).to_list(length=1)
+        
+        totals = facet[0]["totals"][0] if facet and facet[0]["totals"] else {}
+        users = totals.get("users", 0)
+        
+        # Ranking e percentis pelo índice em patrimonio (sem ordenar em memória)
+        top = await self.users_collection.find(
+            {}, {"_id": 0, "user_id": 1, "patrimonio": 1}
+        ).sort("patrimonio", -1).limit(RANK_SIZE).to_list(length=RANK_SIZE)
+        
+        percentiles = []
+        for p in STATS_PERCENTILES:
+            if not users:
+                break
+            # p-ésimo percentil = posição p% da lista ordenada (do maior para o menor)
+            position = int((100 - p) / 100 * (users - 1))
+            row = await self.users_collection.find(
+                {}, {"_id": 0, "patrimonio": 1}
+            ).sort("patrimonio", -1).skip(position).limit(1).to_list(length=1)
+            if row:
+                percentiles.append({"p": p, "value": row[0].get("patrimonio", 0)})
+        
+        return {
+            "_id": "summary",
+            "users": users,
+            "money_supply": totals.get("money_supply", 0),
+            "wallet": totals.get("wallet", 0),
+            "bank": totals.get("bank", 0),
+            "percentiles": percentiles,
+            "top": top,
+            "inventory": [
+                {"item": row["_id"], "count": row["count"], "owners": row["owners"]}
+                for row in (facet[0]["inventory"] if facet else [])
+            ],
+            "updated_at": datetime.now()
+        }
+
+    @tasks.loop(minutes=ECONOMY_STATS_INTERVAL)
+    async def refresh_economy_stats(self):
+        """Atualiza o resumo materializado da economia"""
+        try:
+            if not await self.ensure_connection():
+                return
+            summary = await self.build_economy_summary()
+            await self.stats_collection.replace_one({"_id": "summary"}, summary, upsert=True)
+            self.economy_summary = summary
+        except Exception as e:
+            print(f"❌ Erro ao atualizar estatísticas da economia: {e}")
+
+    @refresh_economy_stats.before_loop
+    async def before_refresh_economy_stats(self):
+        await self.bot.wait_until_ready()
+
+    def cooldown_guard(self, field, cooldown, now):
+        """Condição de filtro: campo vazio ou último uso há mais de ``cooldown`` segundos"""
+        threshold = (now - timedelta(seconds=cooldown)).isoformat()
+        return {"$or": [{field: None}, {field: {"$lte": threshold}}]}
+
+    def cooldown_remaining(self, last_used, cooldown, now):
+        """Tempo restante de cooldown (timedelta), ou None se já pode usar"""
+        if not last_used:
+            return None
+        remaining = timedelta(seconds=cooldown) - (now - datetime.fromisoformat(last_used))
+        return remaining if remaining > timedelta(0) else None
+
     def format_money(self, amount):
         """Formata valor em reais"""
         return f"R$ {amount:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
@@ -198,7 +454,7 @@ class Economia(commands.Cog):
             user = ctx.author
         
         data = await self.get_user_data(user.id)
-        is_vip_user = await self.is_vip(user.id, ctx.guild.id)
+        is_vip_user = self.is_vip(user.id, ctx.guild.id)
         
         embed = discord.Embed(
             title=f"💰 Saldo de {user.display_name}",
@@ -219,175 +475,235 @@ class Economia(commands.Cog):
     @commands.command(name='diario', aliases=['daily'])
     async def daily(self, ctx):
         """Recompensa diária"""
-        user_data = await self.get_user_data(ctx.author.id)
-        now = datetime.now()
-        is_vip_user = await self.is_vip(ctx.author.id, ctx.guild.id)
-        
-        if user_data["last_daily"]:
-            last_daily = datetime.fromisoformat(user_data["last_daily"])
-            if now - last_daily < timedelta(days=1):
-                time_left = timedelta(days=1) - (now - last_daily)
+        # Um comando por vez por usuário: spam espera e vê o estado já atualizado
+        async with self.user_locks(str(ctx.author.id)):
+            now = datetime.now()
+            is_vip_user = self.is_vip(ctx.author.id, ctx.guild.id)
+            
+            reward = self.daily_reward
+            if is_vip_user:
+                reward = int(reward * self.vip_daily_multiplier)
+            
+            # Crédito + cooldown em uma única operação atômica
+            result = await self.transact(
+                ctx.author.id,
+                inc={"balance": reward},
+                set_fields={"last_daily": now.isoformat()},
+                guards=self.cooldown_guard("last_daily", self.daily_cooldown, now),
+                upsert=True
+            )
+            
+            if result is False:
+                return await ctx.send("❌ Erro ao processar recompensa. Tente novamente.")
+            
+            if result is None:
+                user_data = await self.get_user_data(ctx.author.id)
+                time_left = self.cooldown_remaining(user_data["last_daily"], self.daily_cooldown, now) or timedelta(0)
                 hours = int(time_left.total_seconds() // 3600)
                 minutes = int((time_left.total_seconds() % 3600) // 60)
-                
+            
                 embed = discord.Embed(
                     title="⏰ Recompensa Diária",
                     description=f"Você já coletou hoje! Volte em {hours}h {minutes}m",
                     color=0xff0000
                 )
                 return await ctx.send(embed=embed)
-        
-        reward = self.daily_reward
-        if is_vip_user:
-            reward = int(reward * self.vip_daily_multiplier)
-        
-        # Atualiza dados no MongoDB
-        update_data = {
-            "balance": user_data["balance"] + reward,
-            "last_daily": now.isoformat()
-        }
-        success = await self.update_user_data(ctx.author.id, update_data)
-        
-        if not success:
-            return await ctx.send("❌ Erro ao processar recompensa. Tente novamente.")
-        
-        embed = discord.Embed(
-            title="🎁 Recompensa Diária",
-            description=f"Você recebeu {self.format_money(reward)}!",
-            color=0xFFD700 if is_vip_user else 0x00ff00
-        )
-        
-        if is_vip_user:
-            embed.add_field(name="👑 Bônus VIP", value=f"2x recompensa aplicada!", inline=False)
-        
-        await ctx.send(embed=embed)
+            
+            embed = discord.Embed(
+                title="🎁 Recompensa Diária",
+                description=f"Você recebeu {self.format_money(reward)}!",
+                color=0xFFD700 if is_vip_user else 0x00ff00
+            )
+            
+            if is_vip_user:
+                embed.add_field(name="👑 Bônus VIP", value=f"2x recompensa aplicada!", inline=False)
+            
+            await ctx.send(embed=embed)
 
     @commands.command(name='trabalhar', aliases=['work'])
     async def work(self, ctx):
         """Trabalhar para ganhar dinheiro"""
-        user_data = await self.get_user_data(ctx.author.id)
-        now = datetime.now()
-        is_vip_user = await self.is_vip(ctx.author.id, ctx.guild.id)
-        
-        if not user_data["job"]:
-            available_jobs = list(self.jobs.keys())
-            new_job = random.choice(available_jobs)
+        # Um comando por vez por usuário: spam espera e vê o estado já atualizado
+        async with self.user_locks(str(ctx.author.id)):
+            user_data = await self.get_user_data(ctx.author.id)
+            now = datetime.now()
+            is_vip_user = self.is_vip(ctx.author.id, ctx.guild.id)
             
-            await self.update_user_data(ctx.author.id, {"job": new_job})
-            user_data["job"] = new_job
+            update_data = {"last_work": now.isoformat()}
+            new_job = None
             
-            embed = discord.Embed(
-                title="💼 Novo Emprego",
-                description=f"Você conseguiu um emprego como {new_job}!",
-                color=0x00ff00
+            if not user_data["job"]:
+                available_jobs = list(self.jobs.keys())
+                new_job = random.choice(available_jobs)
+            
+                # Gravado junto com o pagamento, na mesma operação (o aviso só
+                # é enviado depois que a transação passar pelo cooldown)
+                update_data["job"] = new_job
+                user_data["job"] = new_job
+            
+            time_left = self.cooldown_remaining(user_data["last_work"], self.work_cooldown, now)
+            if time_left:
+                return await self.send_work_cooldown(ctx, time_left)
+            
+            job = user_data["job"]
+            min_salary, max_salary = self.jobs[job]["salary"]
+            
+            # Bônus VIP: chance de ganhar mais
+            if is_vip_user and random.randint(1, 100) <= 30:
+                max_salary = int(max_salary * 1.5)
+            
+            earnings = random.randint(min_salary, max_salary)
+            
+            if is_vip_user:
+                earnings = int(earnings * self.vip_work_multiplier)
+            
+            # Crédito + cooldown em uma única operação atômica
+            result = await self.transact(
+                ctx.author.id,
+                inc={"balance": earnings},
+                set_fields=update_data,
+                guards=self.cooldown_guard("last_work", self.work_cooldown, now),
+                upsert=True
             )
-            await ctx.send(embed=embed)
-        
-        if user_data["last_work"]:
-            last_work = datetime.fromisoformat(user_data["last_work"])
-            if now - last_work < timedelta(seconds=self.work_cooldown):
-                time_left = timedelta(seconds=self.work_cooldown) - (now - last_work)
-                minutes = int(time_left.total_seconds() // 60)
-                
+            
+            if result is False:
+                return await ctx.send("❌ Erro ao processar trabalho. Tente novamente.")
+            
+            if result is None:
+                # Outro !trabalhar foi processado entre a leitura e a gravação
+                return await self.send_work_cooldown(ctx, timedelta(seconds=self.work_cooldown))
+            
+            if new_job:
                 embed = discord.Embed(
-                    title="⏰ Cooldown",
-                    description=f"Você precisa descansar! Volte em {minutes} minutos.",
-                    color=0xff0000
+                    title="💼 Novo Emprego",
+                    description=f"Você conseguiu um emprego como {new_job}!",
+                    color=0x00ff00
                 )
-                return await ctx.send(embed=embed)
-        
-        job = user_data["job"]
-        min_salary, max_salary = self.jobs[job]["salary"]
-        
-        # Bônus VIP: chance de ganhar mais
-        if is_vip_user and random.randint(1, 100) <= 30:
-            max_salary = int(max_salary * 1.5)
-        
-        earnings = random.randint(min_salary, max_salary)
-        
-        if is_vip_user:
-            earnings = int(earnings * self.vip_work_multiplier)
-        
-        # Atualiza dados no MongoDB
-        update_data = {
-            "balance": user_data["balance"] + earnings,
-            "last_work": now.isoformat()
-        }
-        success = await self.update_user_data(ctx.author.id, update_data)
-        
-        if not success:
-            return await ctx.send("❌ Erro ao processar trabalho. Tente novamente.")
-        
+                await ctx.send(embed=embed)
+            
+            embed = discord.Embed(
+                title="💼 Trabalho Concluído",
+                description=f"Você trabalhou como {job} e ganhou {self.format_money(earnings)}!",
+                color=0xFFD700 if is_vip_user else 0x00ff00
+            )
+            
+            if is_vip_user:
+                embed.add_field(name="👑 Bônus VIP", value="1.5x salário + chance de bônus!", inline=False)
+            
+            await ctx.send(embed=embed)
+
+    async def send_work_cooldown(self, ctx, time_left):
+        minutes = int(time_left.total_seconds() // 60)
         embed = discord.Embed(
-            title="💼 Trabalho Concluído",
-            description=f"Você trabalhou como {job} e ganhou {self.format_money(earnings)}!",
-            color=0xFFD700 if is_vip_user else 0x00ff00
+            title="⏰ Cooldown",
+            description=f"Você precisa descansar! Volte em {minutes} minutos.",
+            color=0xff0000
         )
-        
-        if is_vip_user:
-            embed.add_field(name="👑 Bônus VIP", value="1.5x salário + chance de bônus!", inline=False)
-        
         await ctx.send(embed=embed)
 
     @commands.command(name='loja', aliases=['shop'])
     async def shop(self, ctx):
         """Mostra itens da loja"""
         shop_data = await self.get_shop_data()
-        embed = discord.Embed(title="🛒 Loja", color=0x0099ff)
-        
-        for item, data in shop_data.items():
-            embed.add_field(
-                name=item.title(),
-                value=f"{data['desc']}\n**Preço:** {self.format_money(data['price'])}",
-                inline=True
-            )
-        
-        embed.set_footer(text="Use !comprar <item> para comprar")
-        await ctx.send(embed=embed)
+        await ctx.send(embed=self.get_shop_embed(shop_data))
 
     @commands.command(name='comprar', aliases=['buy'])
     async def buy(self, ctx, *, item_name: str):
         """Comprar um item da loja"""
-        user_data = await self.get_user_data(ctx.author.id)
-        shop_data = await self.get_shop_data()
-        item_name = item_name.lower()
-        
-        if item_name not in shop_data:
-            return await ctx.send("❌ Item não encontrado!")
-        
-        price = shop_data[item_name]["price"]
-        
-        if user_data["balance"] < price:
-            return await ctx.send("❌ Saldo insuficiente!")
-        
-        # Atualiza inventário
-        inventory = user_data.get("inventory", {})
-        if item_name not in inventory:
-            inventory[item_name] = 0
-        inventory[item_name] += 1
-        
-        # Atualiza dados no MongoDB
-        update_data = {
-            "balance": user_data["balance"] - price,
-            "inventory": inventory
-        }
-        success = await self.update_user_data(ctx.author.id, update_data)
+        # Um comando por vez por usuário: spam espera e vê o estado já atualizado
+        async with self.user_locks(str(ctx.author.id)):
+            shop_data = await self.get_shop_data()
+            item_name = item_name.lower()
+            
+            if item_name not in shop_data:
+                return await ctx.send("❌ Item não encontrado!")
+            
+            price = shop_data[item_name]["price"]
+            
+            # Débito com verificação de saldo + item no inventário, atomicamente
+            result = await self.transact(
+                ctx.author.id,
+                inc={"balance": -price, f"inventory.{item_name}": 1},
+                guards={"balance": {"$gte": price}}
+            )
+            
+            if result is False:
+                return await ctx.send("❌ Erro ao processar compra. Tente novamente.")
+            
+            if result is None:
+                return await ctx.send("❌ Saldo insuficiente!")
+            
+            embed = discord.Embed(
+                title="🛒 Compra Realizada",
+                description=f"Você comprou {item_name} por {self.format_money(price)}!",
+                color=0x00ff00
+            )
+            await ctx.send(embed=embed)
+
+    def percentile_label(self, p):
+        return "Mediana" if p == 50 else f"P{p}"
+
+    @commands.command(name='rank', aliases=['ricos'])
+    async def rank(self, ctx, pagina: int = 1):
+        """Ranking dos usuários mais ricos"""
+        summary = self.economy_summary
+        if not summary or not summary.get("top"):
+            return await ctx.send("📊 O ranking ainda está sendo calculado. Tente novamente em instantes.")
+        
+        top = summary["top"]
+        max_pages = (len(top) - 1) // RANK_PAGE_SIZE + 1
+        if pagina < 1 or pagina > max_pages:
+            pagina = 1
+        start = (pagina - 1) * RANK_PAGE_SIZE
+        
+        lines = []
+        for i, row in enumerate(top[start:start + RANK_PAGE_SIZE], start + 1):
+            medal = {1: "🥇", 2: "🥈", 3: "🥉"}.get(i, "")
+            lines.append(f"{medal} **#{i}** <@{row['user_id']}> — {self.format_money(row.get('patrimonio', 0))}")
+        
+        embed = discord.Embed(title="🏆 Mais Ricos", description="\n".join(lines), color=0xFFD700)
+        embed.set_footer(text=f"Página {pagina}/{max_pages} | Atualizado às {summary['updated_at'].strftime('%H:%M')}")
+        await ctx.send(embed=embed)
+
+    @commands.command(name='estatisticas', aliases=['ecostats'])
+    async def economy_stats(self, ctx):
+        """Estatísticas gerais da economia"""
+        summary = self.economy_summary
+        if not summary:
+            return await ctx.send("📊 As estatísticas ainda estão sendo calculadas. Tente novamente em instantes.")
+        
+        embed = discord.Embed(title="📊 Estatísticas da Economia", color=0x0099ff)
+        embed.add_field(name="💰 Dinheiro em Circulação", value=self.format_money(summary["money_supply"]), inline=False)
+        embed.add_field(name="👛 Carteiras", value=self.format_money(summary["wallet"]), inline=True)
+        embed.add_field(name="🏦 Bancos", value=self.format_money(summary["bank"]), inline=True)
+        embed.add_field(name="👥 Usuários", value=str(summary["users"]), inline=True)
+        
+        if summary["percentiles"]:
+            embed.add_field(
+                name="📈 Patrimônio (percentis)",
+                value="\n".join(
+                    f"{self.percentile_label(row['p'])}: {self.format_money(row['value'])}"
+                    for row in summary["percentiles"]
+                ),
+                inline=False
+            )
         
-        if not success:
-            return await ctx.send("❌ Erro ao processar compra. Tente novamente.")
+        if summary["inventory"]:
+            embed.add_field(
+                name="🎒 Itens Comprados",
+                value="\n".join(
+                    f"{row['item'].title()}: **{row['count']}** ({row['owners']} donos)"
+                    for row in summary["inventory"][:10]
+                ),
+                inline=False
+            )
         
-        embed = discord.Embed(
-            title="🛒 Compra Realizada",
-            description=f"Você comprou {item_name} por {self.format_money(price)}!",
-            color=0x00ff00
-        )
+        embed.set_footer(text=f"Atualizado às {summary['updated_at'].strftime('%H:%M')}")
         await ctx.send(embed=embed)
 
     async def cog_unload(self):
-        """Fecha a conexão com MongoDB quando o cog é descarregado"""
-        if self.client:
-            self.client.close()
-            print("🔌 Conexão com MongoDB (Economia) fechada")
+        """Para a atualização das estatísticas quando o cog é removido"""
+        self.refresh_economy_stats.cancel()
 
 async def setup(bot):
     await bot.add_cog(Economia(bot))
\ No newline at end of file
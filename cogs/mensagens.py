@@ -1,10 +1,10 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 import json
 import os
-from datetime import datetime
-import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from utils.scheduler import DeadlineScheduler
 
 class Mensagens(commands.Cog):
     def __init__(self, bot):
@@ -15,28 +15,24 @@ class Mensagens(commands.Cog):
         self.collection = None
         self._connection_ready = False
         self.mensagens = {}
-        self.tarefas_ativas = {}
+        # Um único agendador (heap) para todas as mensagens, com o próximo
+        # envio persistido no MongoDB em 'proximo_envio'
+        self.envio_scheduler = DeadlineScheduler(self.enviar_mensagens, name="agendador de mensagens")
+        self.envio_scheduler.start()
         
         # Inicializa a conexão com MongoDB
         self.bot.loop.create_task(self.init_database())
         self.load_data()
     
     async def init_database(self):
-        """Inicializa a conexão com MongoDB"""
+        """Inicializa as coleções usando a conexão compartilhada do bot"""
         try:
-            mongo_uri = os.getenv("MONGO_URI")
-            
-            if not mongo_uri:
-                print("❌ MONGO_URI não encontrada nas variáveis de ambiente!")
+            # Pool de conexões único, criado em main.CustomBot
+            if not await self.bot.database.ensure_connection():
                 return
             
-            print("🔄 Conectando ao MongoDB...")
-            self.client = AsyncIOMotorClient(mongo_uri)
-            
-            # Testa a conexão
-            await self.client.admin.command('ping')
-            
-            self.db = self.client['discord_bot']
+            self.client = self.bot.database.client
+            self.db = self.bot.database.db
             self.collection = self.db['mensagens_automaticas']
             self._connection_ready = True
             
@@ -44,7 +40,7 @@ class Mensagens(commands.Cog):
             
             # Carrega dados do MongoDB após conexão
             await self.load_from_mongodb()
-            self.iniciar_tarefas()
+            await self.agendar_mensagens()
             
         except Exception as e:
             print(f"❌ Erro ao conectar MongoDB: {e}")
@@ -66,9 +62,13 @@ class Mensagens(commands.Cog):
             self.save_data()
     
     def save_data(self):
-        """Salva dados no arquivo JSON (fallback)"""
+        """Salva dados no arquivo JSON (fallback); o agendamento fica só no MongoDB"""
+        dados_json = {
+            nome: {campo: valor for campo, valor in dados.items() if campo != 'proximo_envio'}
+            for nome, dados in self.mensagens.items()
+        }
         with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(self.mensagens, f, indent=2, ensure_ascii=False)
+            json.dump(dados_json, f, indent=2, ensure_ascii=False)
 
     async def load_from_mongodb(self):
         """Carrega todas as mensagens do MongoDB"""
@@ -101,7 +101,8 @@ class Mensagens(commands.Cog):
                 'autor_id': dados['autor_id'],
                 'data_criacao': dados['data_criacao'],
                 'ativo': dados['ativo'],
-                'envios': dados['envios']
+                'envios': dados['envios'],
+                'proximo_envio': dados.get('proximo_envio')
             }
             
             await self.collection.replace_one(
@@ -128,57 +129,78 @@ class Mensagens(commands.Cog):
             print(f"❌ Erro ao deletar do MongoDB: {e}")
             return False
 
-    async def update_envios_mongodb(self, nome, envios):
-        """Atualiza apenas o contador de envios no MongoDB"""
-        try:
-            if not await self.ensure_connection():
-                return
-                
-            await self.collection.update_one(
-                {'_id': nome},
-                {'$set': {'envios': envios}}
-            )
-            
-        except Exception as e:
-            print(f"❌ Erro ao atualizar envios: {e}")
-    
-    def iniciar_tarefas(self):
-        """Inicia todas as tarefas automáticas salvas"""
+    def calcular_proximo_envio(self, dados, now):
+        """Próximo envio após ``now`` mantendo a cadência original.
+
+        Envios perdidos (bot desligado) não se acumulam: a mensagem é enviada
+        uma vez e o prazo avança direto para o próximo múltiplo do intervalo.
+        """
+        intervalo = timedelta(hours=dados['intervalo'])
+        proximo = dados.get('proximo_envio') or now
+        if proximo <= now:
+            proximo += intervalo * ((now - proximo) // intervalo + 1)
+        return proximo
+
+    async def agendar_mensagens(self):
+        """Coloca as mensagens ativas no agendador (envios atrasados saem logo em seguida)"""
+        now = datetime.now()
+        novos_prazos = []
+        atrasadas = 0
+        
         for nome, dados in self.mensagens.items():
-            if dados.get('ativo', True):
-                self.criar_tarefa(nome, dados)
-    
-    def criar_tarefa(self, nome, dados):
-        """Cria uma tarefa automática para enviar mensagens"""
-        async def enviar_mensagem_automatica():
-            while True:
+            if not dados.get('ativo', True):
+                continue
+            
+            if not dados.get('proximo_envio'):
+                # Mensagens antigas sem prazo salvo começam a contar agora
+                dados['proximo_envio'] = now + timedelta(hours=dados['intervalo'])
+                novos_prazos.append(UpdateOne({'_id': nome}, {'$set': {'proximo_envio': dados['proximo_envio']}}))
+            elif dados['proximo_envio'] <= now:
+                atrasadas += 1
+            
+            self.envio_scheduler.schedule(nome, dados['proximo_envio'])
+        
+        if novos_prazos:
+            try:
+                await self.collection.bulk_write(novos_prazos, ordered=False)
+            except Exception as e:
+                print(f"❌ Erro ao salvar agendamento das mensagens: {e}")
+        
+        print(f"⏰ {len(self.envio_scheduler)} mensagens automáticas agendadas ({atrasadas} atrasadas)")
+
+    async def enviar_mensagens(self, nomes):
+        """Envia as mensagens vencidas (chamado pelo agendador) e grava tudo em um bulk_write"""
+        await self.bot.wait_until_ready()
+        now = datetime.now()
+        operacoes = []
+        
+        for nome in nomes:
+            dados = self.mensagens.get(nome)
+            if not dados or not dados.get('ativo', True):
+                continue
+            
+            atualizacao = {}
+            canal = self.bot.get_channel(dados['canal_id'])
+            if canal:
                 try:
-                    await asyncio.sleep(dados['intervalo'] * 3600)
-                    
-                    if nome not in self.mensagens or not self.mensagens[nome].get('ativo', True):
-                        break
-                    
-                    canal = self.bot.get_channel(dados['canal_id'])
-                    if canal:
-                        await canal.send(dados['mensagem'])
-                        
-                        self.mensagens[nome]['envios'] = self.mensagens[nome].get('envios', 0) + 1
-                        self.save_data()
-                        
-                        await self.update_envios_mongodb(nome, self.mensagens[nome]['envios'])
-                
+                    await canal.send(dados['mensagem'])
+                    dados['envios'] = dados.get('envios', 0) + 1
+                    atualizacao['$inc'] = {'envios': 1}
                 except Exception as e:
                     print(f"❌ Erro mensagem automática '{nome}': {e}")
-                    break
+            
+            dados['proximo_envio'] = self.calcular_proximo_envio(dados, now)
+            atualizacao['$set'] = {'proximo_envio': dados['proximo_envio']}
+            self.envio_scheduler.schedule(nome, dados['proximo_envio'])
+            operacoes.append(UpdateOne({'_id': nome}, atualizacao))
         
-        tarefa = asyncio.create_task(enviar_mensagem_automatica())
-        self.tarefas_ativas[nome] = tarefa
-    
-    def parar_tarefa(self, nome):
-        """Para uma tarefa específica"""
-        if nome in self.tarefas_ativas:
-            self.tarefas_ativas[nome].cancel()
-            del self.tarefas_ativas[nome]
+        if not operacoes or not await self.ensure_connection():
+            return
+        
+        try:
+            await self.collection.bulk_write(operacoes, ordered=False)
+        except Exception as e:
+            print(f"❌ Erro ao atualizar envios: {e}")
     
     @commands.command(name='adicionarmensagem', aliases=['addmsg'])
     @commands.has_permissions(manage_messages=True)
@@ -214,17 +236,16 @@ class Mensagens(commands.Cog):
             'autor_id': ctx.author.id,
             'data_criacao': datetime.now().strftime('%d/%m/%Y %H:%M'),
             'ativo': True,
-            'envios': 0
+            'envios': 0,
+            'proximo_envio': datetime.now() + timedelta(hours=horas)
         }
         
         self.mensagens[nome] = dados_mensagem
         self.save_data()
         
-        # Salva no MongoDB
+        # Salva no MongoDB (com o próximo envio) e agenda
         success = await self.save_to_mongodb(nome, dados_mensagem)
-        
-        # Inicia a tarefa
-        self.criar_tarefa(nome, dados_mensagem)
+        self.envio_scheduler.schedule(nome, dados_mensagem['proximo_envio'])
         
         embed = discord.Embed(
             title="✅ Mensagem Automática Adicionada",
@@ -272,7 +293,7 @@ class Mensagens(commands.Cog):
             await ctx.send(embed=embed)
             return
         
-        self.parar_tarefa(nome_encontrado)
+        self.envio_scheduler.cancel(nome_encontrado)
         del self.mensagens[nome_encontrado]
         self.save_data()
         
@@ -323,6 +344,9 @@ class Mensagens(commands.Cog):
             preview = dados['mensagem'][:80] + "..." if len(dados['mensagem']) > 80 else dados['mensagem']
             lista_mensagens.append(f"📌 **{preview}**")
             lista_mensagens.append(f"   └ ⏰ A cada {dados['intervalo']}h | 📍 {canal_nome} | 📊 {dados['envios']} envios")
+            proximo = self.envio_scheduler.deadline(nome)
+            if proximo:
+                lista_mensagens.append(f"   └ ⏭️ Próximo envio: <t:{int(proximo.timestamp())}:R>")
             lista_mensagens.append("")
         
         if lista_mensagens:
@@ -401,6 +425,7 @@ class Mensagens(commands.Cog):
                     color=discord.Color.red()
                 )
                 self._connection_ready = False
+                self.bot.database.mark_unavailable()
         else:
             embed = discord.Embed(
                 title="❌ Banco de Dados Desconectado",
@@ -432,13 +457,8 @@ class Mensagens(commands.Cog):
             await ctx.send(embed=embed)
     
     async def cog_unload(self):
-        """Para todas as tarefas quando o cog é descarregado"""
-        for tarefa in self.tarefas_ativas.values():
-            tarefa.cancel()
-        
-        if self.client:
-            self.client.close()
-            print("🔌 Conexão MongoDB fechada - Sistema de Mensagens")
+        """Para o agendador quando o cog é descarregado"""
+        self.envio_scheduler.stop()
 
 async def setup(bot):
     await bot.add_cog(Mensagens(bot))
\ No newline at end of file
@@ -1,9 +1,16 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 import asyncio
 from datetime import datetime, timedelta
-import os
-from motor.motor_asyncio import AsyncIOMotorClient
+from typing import Optional
+from pymongo.errors import BulkWriteError
+from utils.scheduler import DeadlineScheduler
+
+# Itens por página em !avisos e !historicomod
+WARNINGS_PER_PAGE = 10
+LOGS_PER_PAGE = 10
+# Nova tentativa (segundos) para mutes vencidos que não puderam ser removidos
+MUTE_EXPIRY_RETRY_SECONDS = 60
 
 class ModerationSystem(commands.Cog):
     def __init__(self, bot):
@@ -12,34 +19,44 @@ class ModerationSystem(commands.Cog):
         self.db = None
         self.mod_data = None
         self.mod_config = None
+        self.mod_warnings = None
+        self.mod_mutes = None
+        self.mod_logs = None
         self._connection_ready = False
+        # Prazos de unmute em um heap: dorme até o próximo, sem varrer o banco
+        self.mute_scheduler = DeadlineScheduler(self.expire_mutes, name="agendador de mutes")
+        self.mute_scheduler.start()
         self.bot.loop.create_task(self.init_database())
-        self.check_mutes.start()
 
     async def init_database(self):
-        """Inicializa a conexão com MongoDB"""
+        """Inicializa as coleções usando a conexão compartilhada do bot"""
         try:
-            mongo_uri = os.getenv("MONGO_URI")
-            if not mongo_uri:
-                print("❌ MONGO_URI não encontrada!")
+            # Pool de conexões único, criado em main.CustomBot
+            if not await self.bot.database.ensure_connection():
                 return
             
-            print("🔄 Conectando ao MongoDB...")
-            self.client = AsyncIOMotorClient(mongo_uri)
-            await self.client.admin.command('ping')
-            
-            self.db = self.client['discord_bot']
-            self.mod_data = self.db['moderation_data']
+            self.client = self.bot.database.client
+            self.db = self.bot.database.db
+            self.mod_data = self.db['moderation_data']  # formato antigo, só para migração
             self.mod_config = self.db['moderation_config']
+            self.mod_warnings = self.db['moderation_warnings']
+            self.mod_mutes = self.db['moderation_mutes']
+            self.mod_logs = self.db['moderation_logs']
             self._connection_ready = True
             
             # Criar índices
             await self.mod_data.create_index("guild_id")
             await self.mod_config.create_index("guild_id")
-            
-            print("✅ Conectado ao MongoDB!")
+            await self.mod_warnings.create_index([("guild_id", 1), ("user_id", 1), ("timestamp", 1)])
+            await self.mod_mutes.create_index([("guild_id", 1), ("user_id", 1)], unique=True)
+            await self.mod_mutes.create_index("expires")
+            await self.mod_logs.create_index([("guild_id", 1), ("timestamp", -1)])
+            await self.mod_logs.create_index([("guild_id", 1), ("user_id", 1), ("timestamp", -1)])
+            
+            await self.migrate_legacy_data()
+            await self.load_pending_mutes()
         except Exception as e:
-            print(f"❌ Erro ao conectar: {e}")
+            print(f"❌ Erro ao inicializar moderação: {e}")
             self._connection_ready = False
 
     async def ensure_connection(self):
@@ -48,34 +65,219 @@ class ModerationSystem(commands.Cog):
             await self.init_database()
         return self._connection_ready
 
-    async def get_guild_data(self, guild_id):
-        """Obtém dados de moderação"""
+    async def migrate_legacy_data(self):
+        """Migração única do formato antigo (um documento por servidor com listas aninhadas)"""
+        async for legacy in self.mod_data.find({'migrated': {'$ne': True}}):
+            guild_id = legacy['guild_id']
+            legacy_id = str(legacy['_id'])
+            try:
+                # _id determinístico: rodar a migração de novo não duplica nada
+                warnings = []
+                for user_id, user_warnings in legacy.get('warnings', {}).items():
+                    for i, warning in enumerate(user_warnings):
+                        warnings.append({
+                            '_id': f"{legacy_id}_w_{user_id}_{i}",
+                            'guild_id': guild_id,
+                            'user_id': str(user_id),
+                            'moderator_id': warning.get('moderator'),
+                            'reason': warning.get('reason'),
+                            'timestamp': self.parse_timestamp(warning.get('timestamp'))
+                        })
+
+                logs = []
+                for i, entry in enumerate(legacy.get('logs', [])):
+                    logs.append({
+                        '_id': f"{legacy_id}_l_{i}",
+                        'guild_id': guild_id,
+                        'user_id': str(entry.get('target_id')),
+                        'moderator_id': entry.get('moderator_id'),
+                        'action': entry.get('action'),
+                        'reason': entry.get('reason'),
+                        'duration': entry.get('duration'),
+                        'timestamp': self.parse_timestamp(entry.get('timestamp'))
+                    })
+
+                await self.insert_migrated(self.mod_warnings, warnings)
+                await self.insert_migrated(self.mod_logs, logs)
+
+                for mute_key, mute in legacy.get('mutes', {}).items():
+                    await self.mod_mutes.update_one(
+                        {'guild_id': guild_id, 'user_id': mute_key.split('_')[1]},
+                        {'$setOnInsert': {
+                            'expires': self.parse_timestamp(mute.get('expires')),
+                            'reason': mute.get('reason'),
+                            'moderator_id': None,
+                            'timestamp': datetime.now()
+                        }},
+                        upsert=True
+                    )
+
+                await self.mod_data.update_one(
+                    {'_id': legacy['_id']},
+                    {'$set': {'migrated': True, 'migrated_at': datetime.now()},
+                     '$unset': {'warnings': '', 'mutes': '', 'logs': ''}}
+                )
+                print(f"✅ Moderação migrada para o novo formato: servidor {guild_id} ({len(warnings)} avisos, {len(logs)} logs)")
+            except Exception as e:
+                print(f"❌ Erro ao migrar moderação do servidor {guild_id}: {e}")
+
+    async def insert_migrated(self, collection, documents):
+        """insert_many que ignora documentos já migrados (_id duplicado)"""
+        if not documents:
+            return
+        try:
+            await collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+
+    def parse_timestamp(self, value):
+        """Converte timestamps ISO do formato antigo em datetime"""
+        if isinstance(value, datetime):
+            return value
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return datetime.now()
+
+    async def add_warning(self, guild_id, user_id, reason, moderator_id):
+        """Registra um aviso e retorna o total de avisos do usuário"""
         if not await self.ensure_connection():
-            return {'guild_id': str(guild_id), 'warnings': {}, 'mutes': {}, 'logs': []}
+            return 0
         
-        guild_id = str(guild_id)
-        data = await self.mod_data.find_one({"guild_id": guild_id})
+        await self.mod_warnings.insert_one({
+            'guild_id': str(guild_id),
+            'user_id': str(user_id),
+            'moderator_id': moderator_id,
+            'reason': reason,
+            'timestamp': datetime.now()
+        })
+        return await self.count_warnings(guild_id, user_id)
+
+    async def count_warnings(self, guild_id, user_id=None):
+        """Conta os avisos de um usuário (ou do servidor inteiro)"""
+        if not await self.ensure_connection():
+            return 0
         
-        if not data:
-            default_data = {'guild_id': guild_id, 'warnings': {}, 'mutes': {}, 'logs': []}
-            await self.mod_data.insert_one(default_data)
-            return default_data
-        return data
+        query = {'guild_id': str(guild_id)}
+        if user_id is not None:
+            query['user_id'] = str(user_id)
+        return await self.mod_warnings.count_documents(query)
 
-    async def save_guild_data(self, guild_id, data):
-        """Salva dados de moderação"""
+    async def get_warnings(self, guild_id, user_id, page=1):
+        """Retorna uma página de avisos do usuário, do mais antigo ao mais novo"""
+        if not await self.ensure_connection():
+            return []
+        
+        cursor = self.mod_warnings.find(
+            {'guild_id': str(guild_id), 'user_id': str(user_id)},
+            {'_id': 0, 'reason': 1, 'moderator_id': 1, 'timestamp': 1}
+        ).sort([('timestamp', 1), ('_id', 1)]).skip((page - 1) * WARNINGS_PER_PAGE).limit(WARNINGS_PER_PAGE)
+        return await cursor.to_list(length=WARNINGS_PER_PAGE)
+
+    async def delete_warning(self, guild_id, user_id, index=None):
+        """Remove o aviso de número ``index`` (ou o mais recente) e o retorna"""
+        if not await self.ensure_connection():
+            return None
+        
+        query = {'guild_id': str(guild_id), 'user_id': str(user_id)}
+        if index is None:
+            cursor = self.mod_warnings.find(query, {'reason': 1}).sort([('timestamp', -1), ('_id', -1)]).limit(1)
+        else:
+            cursor = self.mod_warnings.find(query, {'reason': 1}).sort([('timestamp', 1), ('_id', 1)]).skip(index - 1).limit(1)
+        
+        warnings = await cursor.to_list(length=1)
+        if not warnings:
+            return None
+        
+        await self.mod_warnings.delete_one({'_id': warnings[0]['_id']})
+        return warnings[0]
+
+    async def get_warning_ranking(self, guild_id, page=1):
+        """Retorna uma página de (user_id, quantidade de avisos), do maior para o menor"""
+        if not await self.ensure_connection():
+            return []
+        
+        pipeline = [
+            {'$match': {'guild_id': str(guild_id)}},
+            {'$group': {'_id': '$user_id', 'count': {'$sum': 1}}},
+            {'$sort': {'count': -1, '_id': 1}},
+            {'$skip': (page - 1) * WARNINGS_PER_PAGE},
+            {'$limit': WARNINGS_PER_PAGE}
+        ]
+        return await self.mod_warnings.aggregate(pipeline).to_list(length=WARNINGS_PER_PAGE)
+
+    async def set_mute(self, guild_id, user_id, expires, reason, moderator_id):
+        """Registra (ou substitui) o mute ativo do usuário"""
         if not await self.ensure_connection():
             return False
         
-        guild_id = str(guild_id)
-        data['guild_id'] = guild_id
-        await self.mod_data.replace_one({"guild_id": guild_id}, data, upsert=True)
+        await self.mod_mutes.update_one(
+            {'guild_id': str(guild_id), 'user_id': str(user_id)},
+            {'$set': {
+                'expires': expires,
+                'reason': reason,
+                'moderator_id': moderator_id,
+                'timestamp': datetime.now()
+            }},
+            upsert=True
+        )
+        self.mute_scheduler.schedule((str(guild_id), str(user_id)), expires)
         return True
 
-    async def get_guild_config(self, guild_id):
-        """Obtém configurações do servidor"""
+    async def load_pending_mutes(self):
+        """Carrega os mutes ativos (índice em expires) no agendador"""
+        count = 0
+        async for mute in self.mod_mutes.find({}, {'_id': 0, 'guild_id': 1, 'user_id': 1, 'expires': 1}).sort('expires', 1):
+            self.mute_scheduler.schedule((mute['guild_id'], mute['user_id']), mute['expires'])
+            count += 1
+        if count:
+            print(f"🔇 {count} mutes ativos agendados")
+
+    async def remove_mute(self, guild_id, user_id):
+        """Remove o mute ativo do usuário"""
+        self.mute_scheduler.cancel((str(guild_id), str(user_id)))
         if not await self.ensure_connection():
+            return False
+        
+        result = await self.mod_mutes.delete_one({'guild_id': str(guild_id), 'user_id': str(user_id)})
+        return result.deleted_count > 0
+
+    async def count_mutes(self, guild_id):
+        """Conta os mutes ativos do servidor"""
+        if not await self.ensure_connection():
+            return 0
+        return await self.mod_mutes.count_documents({'guild_id': str(guild_id)})
+
+    async def get_mod_logs(self, guild_id, user_id=None, page=1):
+        """Retorna uma página do histórico de moderação, do mais novo ao mais antigo"""
+        if not await self.ensure_connection():
+            return []
+        
+        query = {'guild_id': str(guild_id)}
+        if user_id is not None:
+            query['user_id'] = str(user_id)
+        
+        cursor = self.mod_logs.find(
+            query,
+            {'_id': 0, 'action': 1, 'user_id': 1, 'moderator_id': 1, 'reason': 1, 'duration': 1, 'timestamp': 1}
+        ).sort([('timestamp', -1), ('_id', -1)]).skip((page - 1) * LOGS_PER_PAGE).limit(LOGS_PER_PAGE)
+        return await cursor.to_list(length=LOGS_PER_PAGE)
+
+    async def get_guild_config(self, guild_id):
+        """Obtém configurações do servidor (cache compartilhado com invalidação no save)"""
+        try:
+            return await self.bot.database.config_cache.get(
+                'moderation_config', guild_id, lambda: self.load_guild_config(guild_id)
+            )
+        except Exception as e:
+            print(f"❌ Erro ao buscar configuração de moderação: {e}")
             return {'guild_id': str(guild_id), 'mute_role_id': None, 'log_channel_id': None, 'max_warnings': 3, 'auto_punish': True}
+
+    async def load_guild_config(self, guild_id):
+        """Carrega as configurações do servidor do MongoDB"""
+        if not await self.ensure_connection():
+            raise ConnectionError("Conexão com MongoDB não está disponível")
         
         guild_id = str(guild_id)
         config = await self.mod_config.find_one({"guild_id": guild_id})
@@ -88,29 +290,37 @@ class ModerationSystem(commands.Cog):
 
     async def save_guild_config(self, guild_id, config):
         """Salva configurações"""
+        guild_id = str(guild_id)
         if not await self.ensure_connection():
+            # O chamador pode ter alterado o dict em cache: descarta a versão não salva
+            self.bot.database.config_cache.invalidate('moderation_config', guild_id)
             return False
         
-        guild_id = str(guild_id)
         config['guild_id'] = guild_id
-        await self.mod_config.replace_one({"guild_id": guild_id}, config, upsert=True)
+        try:
+            await self.mod_config.replace_one({"guild_id": guild_id}, config, upsert=True)
+        except Exception:
+            self.bot.database.config_cache.invalidate('moderation_config', guild_id)
+            raise
+        self.bot.database.config_cache.set('moderation_config', guild_id, config)
         return True
 
     async def log_action(self, guild, action, moderator, target, reason=None, duration=None):
         config = await self.get_guild_config(guild.id)
-        guild_data = await self.get_guild_data(guild.id)
         
-        log_entry = {
-            'action': action,
-            'moderator_id': moderator.id,
-            'target_id': target.id,
-            'reason': reason,
-            'duration': duration,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        guild_data['logs'].append(log_entry)
-        await self.save_guild_data(guild.id, guild_data)
+        if await self.ensure_connection():
+            try:
+                await self.mod_logs.insert_one({
+                    'guild_id': str(guild.id),
+                    'user_id': str(target.id),
+                    'moderator_id': moderator.id,
+                    'action': action,
+                    'reason': reason,
+                    'duration': duration,
+                    'timestamp': datetime.now()
+                })
+            except Exception as e:
+                print(f"❌ Erro ao registrar ação de moderação: {e}")
         
         if config['log_channel_id']:
             channel = guild.get_channel(config['log_channel_id'])
@@ -131,22 +341,8 @@ class ModerationSystem(commands.Cog):
     @commands.command(name='aviso')
     @commands.has_permissions(administrator=True)
     async def warn_user(self, ctx, member: discord.Member, *, reason="Não especificado"):
-        guild_data = await self.get_guild_data(ctx.guild.id)
         config = await self.get_guild_config(ctx.guild.id)
-        
-        user_id = str(member.id)
-        if user_id not in guild_data['warnings']:
-            guild_data['warnings'][user_id] = []
-        
-        warning = {
-            'reason': reason,
-            'moderator': ctx.author.id,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        guild_data['warnings'][user_id].append(warning)
-        warning_count = len(guild_data['warnings'][user_id])
-        await self.save_guild_data(ctx.guild.id, guild_data)
+        warning_count = await self.add_warning(ctx.guild.id, member.id, reason, ctx.author.id)
         
         embed = discord.Embed(
             title="⚠️ Aviso Aplicado",
@@ -167,12 +363,10 @@ class ModerationSystem(commands.Cog):
                 if mute_role:
                     await member.add_roles(mute_role)
                     
-                    mute_key = f"{ctx.guild.id}_{member.id}"
-                    guild_data['mutes'][mute_key] = {
-                        'expires': (datetime.now() + timedelta(hours=1)).isoformat(),
-                        'reason': f"Auto-mute por {config['max_warnings']} avisos"
-                    }
-                    await self.save_guild_data(ctx.guild.id, guild_data)
+                    await self.set_mute(
+                        ctx.guild.id, member.id, datetime.now() + timedelta(hours=1),
+                        f"Auto-mute por {config['max_warnings']} avisos", ctx.author.id
+                    )
                     
                     embed = discord.Embed(
                         title="🔇 Auto-Mute Aplicado",
@@ -197,10 +391,9 @@ class ModerationSystem(commands.Cog):
     @commands.command(name='removeraviso')
     @commands.has_permissions(administrator=True)
     async def remove_warning(self, ctx, member: discord.Member, index: int = None):
-        guild_data = await self.get_guild_data(ctx.guild.id)
-        user_id = str(member.id)
+        warning_count = await self.count_warnings(ctx.guild.id, member.id)
         
-        if user_id not in guild_data['warnings'] or not guild_data['warnings'][user_id]:
+        if not warning_count:
             embed = discord.Embed(
                 title="❌ Erro",
                 description=f"{member.mention} não possui avisos!",
@@ -209,20 +402,20 @@ class ModerationSystem(commands.Cog):
             await ctx.send(embed=embed)
             return
         
-        if index is None:
-            removed_warning = guild_data['warnings'][user_id].pop()
-        else:
-            if index < 1 or index > len(guild_data['warnings'][user_id]):
-                embed = discord.Embed(
-                    title="❌ Erro",
-                    description="Número do aviso inválido!",
-                    color=discord.Color.red()
-                )
-                await ctx.send(embed=embed)
-                return
-            removed_warning = guild_data['warnings'][user_id].pop(index - 1)
+        if index is not None and (index < 1 or index > warning_count):
+            embed = discord.Embed(
+                title="❌ Erro",
+                description="Número do aviso inválido!",
+                color=discord.Color.red()
+            )
+            await ctx.send(embed=embed)
+            return
         
-        await self.save_guild_data(ctx.guild.id, guild_data)
+        removed_warning = await self.delete_warning(ctx.guild.id, member.id, index)
+        if not removed_warning:
+            embed = discord.Embed(title="❌ Erro", description="Não foi possível remover o aviso!", color=discord.Color.red())
+            await ctx.send(embed=embed)
+            return
         
         embed = discord.Embed(
             title="✅ Aviso Removido",
@@ -230,19 +423,19 @@ class ModerationSystem(commands.Cog):
             color=discord.Color.green()
         )
         embed.add_field(name="Motivo Removido", value=removed_warning['reason'], inline=False)
-        embed.add_field(name="Avisos Restantes", value=len(guild_data['warnings'][user_id]), inline=True)
+        embed.add_field(name="Avisos Restantes", value=warning_count - 1, inline=True)
         
         await ctx.send(embed=embed)
         await self.log_action(ctx.guild, "unwarn", ctx.author, member)
 
     @commands.command(name='avisos')
     @commands.has_permissions(administrator=True)
-    async def list_warnings(self, ctx, member: discord.Member = None):
-        guild_data = await self.get_guild_data(ctx.guild.id)
+    async def list_warnings(self, ctx, member: Optional[discord.Member] = None, pagina: int = 1):
+        pagina = max(1, pagina)
         
         if member:
-            user_id = str(member.id)
-            if user_id not in guild_data['warnings'] or not guild_data['warnings'][user_id]:
+            warning_count = await self.count_warnings(ctx.guild.id, member.id)
+            if not warning_count:
                 embed = discord.Embed(
                     title="📋 Avisos",
                     description=f"{member.mention} não possui avisos!",
@@ -251,15 +444,20 @@ class ModerationSystem(commands.Cog):
                 await ctx.send(embed=embed)
                 return
             
+            total_pages = (warning_count - 1) // WARNINGS_PER_PAGE + 1
+            pagina = min(pagina, total_pages)
+            warnings = await self.get_warnings(ctx.guild.id, member.id, pagina)
+            
             embed = discord.Embed(
                 title=f"📋 Avisos de {member.display_name}",
                 color=discord.Color.orange()
             )
             
-            for i, warning in enumerate(guild_data['warnings'][user_id], 1):
-                moderator = self.bot.get_user(warning['moderator'])
+            first = (pagina - 1) * WARNINGS_PER_PAGE + 1
+            for i, warning in enumerate(warnings, first):
+                moderator = self.bot.get_user(warning['moderator_id']) if warning.get('moderator_id') else None
                 mod_name = moderator.name if moderator else "Desconhecido"
-                date = datetime.fromisoformat(warning['timestamp']).strftime("%d/%m/%Y %H:%M")
+                date = warning['timestamp'].strftime("%d/%m/%Y %H:%M")
                 
                 embed.add_field(
                     name=f"Aviso #{i}",
@@ -268,15 +466,11 @@ class ModerationSystem(commands.Cog):
                 )
             
             embed.set_thumbnail(url=member.display_avatar.url)
+            embed.set_footer(text=f"Página {pagina}/{total_pages} • {warning_count} avisos")
         else:
-            all_warnings = []
-            for user_id, warnings in guild_data['warnings'].items():
-                if warnings:
-                    user = ctx.guild.get_member(int(user_id))
-                    if user:
-                        all_warnings.append((user, len(warnings)))
-            
-            if not all_warnings:
+            ranking = await self.get_warning_ranking(ctx.guild.id, pagina)
+            
+            if not ranking:
                 embed = discord.Embed(
                     title="📋 Avisos do Servidor",
                     description="Nenhum aviso encontrado!",
@@ -285,21 +479,45 @@ class ModerationSystem(commands.Cog):
                 await ctx.send(embed=embed)
                 return
             
-            all_warnings.sort(key=lambda x: x[1], reverse=True)
-            
             embed = discord.Embed(
                 title="📋 Avisos do Servidor",
                 color=discord.Color.orange()
             )
             
             warning_text = ""
-            for user, count in all_warnings[:10]:
-                warning_text += f"{user.mention}: **{count}** avisos\n"
+            for entry in ranking:
+                warning_text += f"<@{entry['_id']}>: **{entry['count']}** avisos\n"
             
             embed.description = warning_text
+            embed.set_footer(text=f"Página {pagina} • !avisos <página> para ver mais")
         
         await ctx.send(embed=embed)
 
+    @commands.command(name='historicomod')
+    @commands.has_permissions(administrator=True)
+    async def mod_history(self, ctx, member: Optional[discord.Member] = None, pagina: int = 1):
+        pagina = max(1, pagina)
+        logs = await self.get_mod_logs(ctx.guild.id, member.id if member else None, pagina)
+        
+        title = f"📜 Histórico de {member.display_name}" if member else "📜 Histórico de Moderação"
+        if not logs:
+            embed = discord.Embed(title=title, description="Nenhuma ação encontrada!", color=discord.Color.green())
+            await ctx.send(embed=embed)
+            return
+        
+        embed = discord.Embed(title=title, color=discord.Color.orange())
+        for entry in logs:
+            date = entry['timestamp'].strftime("%d/%m/%Y %H:%M")
+            value = f"**Usuário:** <@{entry['user_id']}>\n**Moderador:** <@{entry['moderator_id']}>"
+            if entry.get('reason'):
+                value += f"\n**Motivo:** {entry['reason']}"
+            if entry.get('duration'):
+                value += f"\n**Duração:** {entry['duration']}"
+            embed.add_field(name=f"{entry['action'].upper()} • {date}", value=value, inline=False)
+        
+        embed.set_footer(text=f"Página {pagina}")
+        await ctx.send(embed=embed)
+
     async def get_mute_role(self, guild):
         config = await self.get_guild_config(guild.id)
         if config['mute_role_id']:
@@ -345,13 +563,7 @@ class ModerationSystem(commands.Cog):
         try:
             await member.add_roles(mute_role)
             
-            guild_data = await self.get_guild_data(ctx.guild.id)
-            mute_key = f"{ctx.guild.id}_{member.id}"
-            guild_data['mutes'][mute_key] = {
-                'expires': (datetime.now() + duration).isoformat(),
-                'reason': reason
-            }
-            await self.save_guild_data(ctx.guild.id, guild_data)
+            await self.set_mute(ctx.guild.id, member.id, datetime.now() + duration, reason, ctx.author.id)
             
             embed = discord.Embed(title="🔇 Usuário Mutado", description=f"{member.mention} foi mutado!", color=discord.Color.red())
             embed.add_field(name="Duração", value=tempo, inline=True)
@@ -387,11 +599,7 @@ class ModerationSystem(commands.Cog):
         try:
             await member.remove_roles(mute_role)
             
-            guild_data = await self.get_guild_data(ctx.guild.id)
-            mute_key = f"{ctx.guild.id}_{member.id}"
-            if mute_key in guild_data['mutes']:
-                del guild_data['mutes'][mute_key]
-                await self.save_guild_data(ctx.guild.id, guild_data)
+            await self.remove_mute(ctx.guild.id, member.id)
             
             embed = discord.Embed(title="🔊 Usuário Desmutado", description=f"{member.mention} foi desmutado!", color=discord.Color.green())
             embed.set_thumbnail(url=member.display_avatar.url)
@@ -492,7 +700,6 @@ class ModerationSystem(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def config_moderation(self, ctx):
         config = await self.get_guild_config(ctx.guild.id)
-        guild_data = await self.get_guild_data(ctx.guild.id)
         
         embed = discord.Embed(title="⚙️ Configurações de Moderação", color=discord.Color.blue())
         
@@ -507,15 +714,15 @@ class ModerationSystem(commands.Cog):
         embed.add_field(name="⚠️ Max Avisos", value=config['max_warnings'], inline=True)
         embed.add_field(name="🤖 Auto Punir", value="✅ Ativo" if config['auto_punish'] else "❌ Inativo", inline=True)
         
-        total_warnings = sum(len(warnings) for warnings in guild_data['warnings'].values())
-        active_mutes = len(guild_data['mutes'])
+        total_warnings = await self.count_warnings(ctx.guild.id)
+        active_mutes = await self.count_mutes(ctx.guild.id)
         
         embed.add_field(name="📊 Avisos Totais", value=total_warnings, inline=True)
         embed.add_field(name="🔇 Mutes Ativos", value=active_mutes, inline=True)
         
         embed.add_field(
             name="📝 Comandos",
-            value="`!aviso` `!removeraviso` `!avisos` `!mutar` `!desmutar` `!banir` `!expulsar` `!limparmensagem`",
+            value="`!aviso` `!removeraviso` `!avisos` `!historicomod` `!mutar` `!desmutar` `!banir` `!expulsar` `!limparmensagem`",
             inline=False
         )
         
@@ -539,37 +746,63 @@ class ModerationSystem(commands.Cog):
             pass
         return None
 
-    @tasks.loop(minutes=1)
-    async def check_mutes(self):
-        """Verifica mutes expirados"""
-        for guild in self.bot.guilds:
-            guild_data = await self.get_guild_data(guild.id)
-            expired_mutes = []
-            
-            for mute_key, mute_data in guild_data['mutes'].items():
-                expire_time = datetime.fromisoformat(mute_data['expires'])
-                if datetime.now() >= expire_time:
-                    expired_mutes.append(mute_key)
-                    
-                    try:
-                        user_id = int(mute_key.split('_')[1])
-                        member = guild.get_member(user_id)
-                        mute_role = await self.get_mute_role(guild)
-                        
-                        if member and mute_role and mute_role in member.roles:
-                            await member.remove_roles(mute_role)
-                    except:
-                        pass
-            
-            for mute_key in expired_mutes:
-                del guild_data['mutes'][mute_key]
-            
-            if expired_mutes:
-                await self.save_guild_data(guild.id, guild_data)
+    def retry_mutes(self, keys):
+        """Reagenda chaves que o agendador já entregou, mas não foram processadas"""
+        retry_at = datetime.now() + timedelta(seconds=MUTE_EXPIRY_RETRY_SECONDS)
+        for key in keys:
+            self.mute_scheduler.schedule(key, retry_at)
 
-    @check_mutes.before_loop
-    async def before_check_mutes(self):
+    async def expire_mutes(self, keys):
+        """Remove os mutes vencidos (chamado pelo agendador com as chaves (guild_id, user_id))"""
         await self.bot.wait_until_ready()
+        if not await self.ensure_connection():
+            self.retry_mutes(keys)
+            return
+        now = datetime.now()
+        
+        by_guild = {}
+        for guild_id, user_id in keys:
+            by_guild.setdefault(guild_id, []).append(user_id)
+        
+        for guild_id, user_ids in by_guild.items():
+            guild = self.bot.get_guild(int(guild_id))
+            if guild is None or guild.unavailable:
+                # Servidor fora do ar: mantém os mutes e tenta de novo mais tarde
+                self.retry_mutes((guild_id, user_id) for user_id in user_ids)
+                continue
+            
+            try:
+                mute_role = await self.get_mute_role(guild)
+            except Exception as e:
+                print(f"❌ Erro ao buscar cargo de mute: {e}")
+                self.retry_mutes((guild_id, user_id) for user_id in user_ids)
+                continue
+            expired, failed = [], []
+            for user_id in user_ids:
+                try:
+                    member = guild.get_member(int(user_id))
+                    if member and mute_role and mute_role in member.roles:
+                        await member.remove_roles(mute_role, reason="Mute expirado")
+                    expired.append(user_id)
+                except discord.Forbidden:
+                    # Sem permissão não adianta repetir: encerra o mute mesmo assim
+                    expired.append(user_id)
+                except Exception as e:
+                    print(f"❌ Erro ao remover cargo de mute de {user_id}: {e}")
+                    failed.append(user_id)
+            
+            self.retry_mutes((guild_id, user_id) for user_id in failed)
+            if not expired:
+                continue
+            try:
+                await self.mod_mutes.delete_many({
+                    'guild_id': guild_id,
+                    'user_id': {'$in': expired},
+                    'expires': {'$lte': now}
+                })
+            except Exception as e:
+                print(f"❌ Erro ao remover mutes expirados: {e}")
+                self.retry_mutes((guild_id, user_id) for user_id in expired)
 
     @warn_user.error
     @mute_user.error
@@ -585,10 +818,8 @@ class ModerationSystem(commands.Cog):
             await ctx.send(embed=embed)
 
     async def cog_unload(self):
-        """Fecha conexão MongoDB quando o cog é removido"""
-        if self.client:
-            self.client.close()
-            print("🔌 Conexão com MongoDB fechada")
+        """Para o agendador de mutes quando o cog é removido"""
+        self.mute_scheduler.stop()
 
 async def setup(bot):
     await bot.add_cog(ModerationSystem(bot))
\ No newline at end of file
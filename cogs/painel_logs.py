@@ -1,15 +1,46 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
+import asyncio
 import datetime
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
+import re
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from utils.message_store import MessageStore, get_message_store_options
 
-# Adiciona o load_dotenv aqui
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass  # Se não tiver python-dotenv instalado, ignora
+# Fila de logs por servidor: eventos agrupados em mensagens com vários embeds
+LOG_QUEUE_SIZE = 500
+LOG_EMBEDS_PER_MESSAGE = 10
+LOG_MESSAGE_MAX_CHARS = 6000
+LOG_COALESCE_SECONDS = 1.0
+LOG_WORKER_IDLE_SECONDS = 60
+# Tempo máximo para esvaziar as filas ao descarregar o cog (o resto é descartado)
+LOG_DRAIN_TIMEOUT = 5
+
+# Histórico no MongoDB gravado com insert_many por tamanho ou tempo
+LOG_DB_BATCH_SIZE = 100
+LOG_DB_FLUSH_INTERVAL = 5
+LOG_DB_MAX_PENDING = 5000
+
+# Campos de log_data que identificam o usuário do evento (copiados para user_id)
+LOG_USER_FIELDS = ("author_id", "member_id", "user_id", "inviter_id", "tester_id")
+LOG_TYPES = (
+    "message_delete", "message_edit", "member_join", "member_remove", "member_ban",
+    "member_unban", "role_update", "nickname_update", "channel_create", "channel_delete",
+    "channel_update", "guild_update", "invite_create", "invite_delete", "test_log"
+)
+LOG_SEARCH_PAGE_SIZE = 10
+
+# Ban/unban: eventos próximos são atribuídos com uma única busca no audit log
+AUDIT_BURST_DELAY = 2.0
+AUDIT_FETCH_MAX = 500
+AUDIT_MAX_AGE = datetime.timedelta(minutes=5)
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def get_logs_retention_days():
+    """Dias que o histórico de logs é mantido (0 desativa a expiração)"""
+    return int(os.getenv("LOGS_RETENTION_DAYS", "90"))
 
 class AdvancedLogs(commands.Cog):
     def __init__(self, bot):
@@ -19,60 +50,96 @@ class AdvancedLogs(commands.Cog):
         self.config_collection = None
         self.logs_collection = None
         self._connection_ready = False
+        
+        # guild_id -> asyncio.Queue / task de envio / eventos descartados
+        self.log_queues = {}
+        self.log_workers = {}
+        self.dropped_logs = {}
+        # Entradas de histórico aguardando insert_many
+        self.pending_entries = []
+        self.dropped_entries = 0
+        
+        # (guild_id, ação) -> eventos de ban/unban aguardando o audit log
+        self.audit_pending = {}
+        self.audit_tasks = {}
+        
+        # Conteúdo recente por canal: logs de edição/remoção de mensagens fora do cache
+        self.message_store = MessageStore(**get_message_store_options())
+        
         # Inicializa a conexão com MongoDB
         self.bot.loop.create_task(self.init_database())
+        self.flush_log_entries.start()
 
     async def init_database(self):
-        """Inicializa a conexão com MongoDB"""
+        """Inicializa as coleções usando a conexão compartilhada do bot"""
         try:
-            # URL de conexão do MongoDB (vem de variável de ambiente)
-            mongo_uri = os.getenv("MONGO_URI") or os.getenv("MONGODB_URI")
-            
-            if not mongo_uri:
-                print("❌ MONGO_URI ou MONGODB_URI não encontrada nas variáveis de ambiente!")
+            # Pool de conexões único, criado em main.CustomBot
+            if not await self.bot.database.ensure_connection():
                 return
             
-            print("🔄 Conectando ao MongoDB (Logs System)...")
-            self.client = AsyncIOMotorClient(mongo_uri)
-            
-            # Testa a conexão
-            await self.client.admin.command('ping')
-            
-            self.db = self.client['discord_bot']
+            self.client = self.bot.database.client
+            self.db = self.bot.database.db
             self.config_collection = self.db['logs_config']
             self.logs_collection = self.db['logs_history']
             self._connection_ready = True
             
-            print("✅ Conectado ao MongoDB (Logs System) com sucesso!")
+            await self.create_indexes()
             
         except Exception as e:
-            print(f"❌ Erro ao conectar com MongoDB (Logs): {e}")
+            print(f"❌ Erro ao inicializar MongoDB (Logs): {e}")
             self._connection_ready = False
 
+    async def create_indexes(self):
+        """Índices de busca do histórico e índice TTL de retenção"""
+        try:
+            await self.logs_collection.create_index([("guild_id", 1), ("log_type", 1), ("timestamp", -1)])
+            await self.logs_collection.create_index([("guild_id", 1), ("user_id", 1), ("timestamp", -1)])
+            await self.logs_collection.create_index([("guild_id", 1), ("timestamp", -1)])
+            
+            retention_days = get_logs_retention_days()
+            if retention_days > 0:
+                ttl = retention_days * 86400
+                try:
+                    await self.logs_collection.create_index("timestamp", name="timestamp_ttl", expireAfterSeconds=ttl)
+                except OperationFailure:
+                    # Índice já existe com outra retenção: ajusta sem recriar
+                    await self.db.command(
+                        "collMod", "logs_history",
+                        index={"name": "timestamp_ttl", "expireAfterSeconds": ttl}
+                    )
+                print(f"📊 Histórico de logs mantido por {retention_days} dias")
+            else:
+                # Retenção desligada: remove o TTL criado por uma configuração anterior
+                indexes = await self.logs_collection.index_information()
+                if "timestamp_ttl" in indexes:
+                    await self.logs_collection.drop_index("timestamp_ttl")
+                    print("📊 Expiração do histórico de logs desativada (índice TTL removido)")
+        except Exception as e:
+            print(f"❌ Erro ao criar índices de logs: {e}")
+
     async def ensure_connection(self):
         """Garante que a conexão com MongoDB está ativa"""
         if not self._connection_ready:
             await self.init_database()
         return self._connection_ready
 
-    async def cog_unload(self):
-        """Fecha a conexão com o MongoDB quando o cog é descarregado"""
-        if self.client:
-            self.client.close()
-            print("🔌 Conexão com MongoDB (Logs) fechada")
-    
     async def get_log_channel(self, guild_id):
-        """Obtém o canal de logs configurado para o servidor"""
+        """Obtém o canal de logs configurado para o servidor (cache compartilhado)"""
         try:
-            if not await self.ensure_connection():
-                print("❌ Conexão com MongoDB não está disponível")
-                return None
-                
-            config = await self.config_collection.find_one({"guild_id": str(guild_id)})
-            return config.get('log_channel') if config else None
+            return await self.bot.database.config_cache.get(
+                'logs_config', guild_id, lambda: self.load_log_channel(guild_id)
+            )
         except Exception as e:
             print(f"❌ Erro ao buscar canal de log: {e}")
             return None
+
+    async def load_log_channel(self, guild_id):
+        """Carrega do MongoDB o canal de logs configurado para o servidor"""
+        if not await self.ensure_connection():
+            raise ConnectionError("Conexão com MongoDB não está disponível")
+            
+        config = await self.config_collection.find_one({"guild_id": str(guild_id)})
+        return config.get('log_channel') if config else None
     
     async def save_log_config(self, guild_id, channel_id):
         """Salva a configuração do canal de logs"""
@@ -90,46 +157,156 @@ class AdvancedLogs(commands.Cog):
                 upsert=True
             )
             print(f"✅ Canal de logs salvo: {channel_id} para guild {guild_id}")
+            self.bot.database.config_cache.set('logs_config', guild_id, channel_id)
             return True
         except Exception as e:
             print(f"❌ Erro ao salvar configuração de log: {e}")
+            self.bot.database.config_cache.invalidate('logs_config', guild_id)
+            return False
+    
+    def save_log_entry(self, guild_id, log_type, data, timestamp=None):
+        """Coloca uma entrada de log no buffer do histórico (gravado em lote)"""
+        if len(self.pending_entries) >= LOG_DB_MAX_PENDING:
+            self.dropped_entries += 1
             return False
+        
+        user_id = next((data[field] for field in LOG_USER_FIELDS if data.get(field)), None)
+        self.pending_entries.append({
+            "guild_id": str(guild_id),
+            "log_type": log_type,
+            "user_id": str(user_id) if user_id else None,
+            "timestamp": timestamp or datetime.datetime.utcnow(),
+            "data": data
+        })
+        if len(self.pending_entries) >= LOG_DB_BATCH_SIZE:
+            self.bot.loop.create_task(self.flush_pending_entries())
+        return True
     
-    async def save_log_entry(self, guild_id, log_type, data):
-        """Salva uma entrada de log no histórico"""
+    async def flush_pending_entries(self):
+        """Grava o buffer do histórico com um único insert_many"""
+        if not self.pending_entries:
+            return
+        
+        entries, self.pending_entries = self.pending_entries, []
         try:
             if not await self.ensure_connection():
-                return False
-                
-            log_entry = {
-                "guild_id": str(guild_id),
-                "log_type": log_type,
-                "timestamp": datetime.datetime.utcnow(),
-                "data": data
-            }
-            await self.logs_collection.insert_one(log_entry)
-            return True
+                raise ConnectionError("Conexão com MongoDB não está disponível")
+            await self.logs_collection.insert_many(entries, ordered=False)
         except Exception as e:
-            print(f"❌ Erro ao salvar entrada de log: {e}")
-            return False
+            print(f"❌ Erro ao salvar {len(entries)} entradas de log: {e}")
+            # Devolve ao buffer até o limite; o excedente é descartado e contado
+            room = max(0, LOG_DB_MAX_PENDING - len(self.pending_entries))
+            self.dropped_entries += max(0, len(entries) - room)
+            self.pending_entries[:0] = entries[:room]
+        
+        if self.dropped_entries:
+            print(f"⚠️ {self.dropped_entries} entradas de log descartadas (buffer do histórico cheio)")
+            self.dropped_entries = 0
+    
+    @tasks.loop(seconds=LOG_DB_FLUSH_INTERVAL)
+    async def flush_log_entries(self):
+        """Grava periodicamente o histórico acumulado"""
+        await self.flush_pending_entries()
     
     async def send_log(self, guild, embed, log_type=None, log_data=None):
-        """Envia o log para o canal configurado"""
+        """Enfileira o log do servidor (enviado em lote pelo worker do servidor)"""
         channel_id = await self.get_log_channel(guild.id)
-        if channel_id:
-            channel = guild.get_channel(channel_id)
-            if channel:
+        if not channel_id:
+            return
+        
+        queue = self.log_queues.get(guild.id)
+        if queue is None:
+            queue = self.log_queues[guild.id] = asyncio.Queue(maxsize=LOG_QUEUE_SIZE)
+        
+        try:
+            queue.put_nowait((embed, log_type, log_data, datetime.datetime.utcnow()))
+        except asyncio.QueueFull:
+            # Contrapressão: a fila está cheia (raid/evento em massa), descarta e conta
+            self.dropped_logs[guild.id] = self.dropped_logs.get(guild.id, 0) + 1
+            return
+        
+        worker = self.log_workers.get(guild.id)
+        if worker is None or worker.done():
+            self.log_workers[guild.id] = self.bot.loop.create_task(self.log_worker(guild.id, queue))
+    
+    async def log_worker(self, guild_id, queue):
+        """Agrupa os eventos do servidor e envia até 10 embeds por mensagem"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                first = await asyncio.wait_for(queue.get(), timeout=LOG_WORKER_IDLE_SECONDS)
+            except asyncio.TimeoutError:
+                # Servidor sem eventos: encerra o worker (recriado no próximo log)
+                self.log_queues.pop(guild_id, None)
+                self.log_workers.pop(guild_id, None)
+                return
+            
+            batch = [first]
+            deadline = loop.time() + LOG_COALESCE_SECONDS
+            while len(batch) < LOG_QUEUE_SIZE:
+                try:
+                    batch.append(queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0 or len(batch) >= LOG_EMBEDS_PER_MESSAGE:
+                    break
                 try:
-                    await channel.send(embed=embed)
-                    # Salva o log no MongoDB
-                    if log_type and log_data:
-                        await self.save_log_entry(guild.id, log_type, log_data)
-                except discord.Forbidden:
-                    print(f"❌ Sem permissão para enviar logs no canal {channel.name}")
-                except discord.NotFound:
-                    print(f"❌ Canal de logs não encontrado: {channel_id}")
-                except Exception as e:
-                    print(f"❌ Erro ao enviar log: {e}")
+                    batch.append(await asyncio.wait_for(queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self.deliver_logs(guild_id, batch)
+            except Exception as e:
+                print(f"❌ Erro ao enviar logs: {e}")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+    
+    def split_log_messages(self, batch):
+        """Divide os eventos em mensagens de até 10 embeds e 6000 caracteres"""
+        messages, current, size = [], [], 0
+        for item in batch:
+            embed_size = len(item[0])
+            if current and (len(current) >= LOG_EMBEDS_PER_MESSAGE or size + embed_size > LOG_MESSAGE_MAX_CHARS):
+                messages.append(current)
+                current, size = [], 0
+            current.append(item)
+            size += embed_size
+        if current:
+            messages.append(current)
+        return messages
+    
+    async def deliver_logs(self, guild_id, batch):
+        """Envia um lote de eventos ao canal de logs e guarda o histórico"""
+        guild = self.bot.get_guild(guild_id)
+        channel_id = await self.get_log_channel(guild_id)
+        channel = guild.get_channel(channel_id) if guild and channel_id else None
+        if not channel:
+            print(f"❌ Canal de logs não encontrado: {channel_id}")
+            return
+        
+        for items in self.split_log_messages(batch):
+            dropped = self.dropped_logs.pop(guild_id, 0)
+            content = f"⚠️ {dropped} evento(s) de log descartado(s) (fila cheia)" if dropped else None
+            try:
+                await channel.send(content=content, embeds=[item[0] for item in items])
+            except discord.Forbidden:
+                print(f"❌ Sem permissão para enviar logs no canal {channel.name}")
+                return
+            except discord.NotFound:
+                print(f"❌ Canal de logs não encontrado: {channel_id}")
+                return
+            except Exception as e:
+                print(f"❌ Erro ao enviar log: {e}")
+                continue
+            
+            # Salva os logs no MongoDB (em lote)
+            for _, log_type, log_data, timestamp in items:
+                if log_type and log_data:
+                    self.save_log_entry(guild_id, log_type, log_data, timestamp)
     
     @commands.command(name='canaldelogs')
     @commands.has_permissions(administrator=True)
@@ -195,6 +372,7 @@ class AdvancedLogs(commands.Cog):
                     color=discord.Color.red()
                 )
                 self._connection_ready = False
+                self.bot.database.mark_unavailable()
         else:
             embed = discord.Embed(
                 title="❌ Banco de Dados Desconectado (Logs)",
@@ -206,68 +384,233 @@ class AdvancedLogs(commands.Cog):
             
         await ctx.send(embed=embed)
     
+    def encode_cursor(self, entry):
+        """Cursor de paginação (keyset): timestamp em ms + _id do último resultado"""
+        millis = (entry["timestamp"] - EPOCH) // datetime.timedelta(milliseconds=1)
+        return f"{millis}.{entry['_id']}"
+    
+    def decode_cursor(self, cursor):
+        millis, object_id = cursor.split(".", 1)
+        return EPOCH + datetime.timedelta(milliseconds=int(millis)), ObjectId(object_id)
+    
+    def summarize_log(self, entry):
+        """Resumo de uma linha do evento para a listagem"""
+        data = entry.get("data") or {}
+        for field in ("content", "content_after", "reason", "channel_name", "channel_name_after", "invite_code", "nick_after", "name_after"):
+            if data.get(field):
+                text = str(data[field]).replace("\n", " ")
+                return text[:80] + ("…" if len(text) > 80 else "")
+        return ""
+    
+    @commands.command(name='buscarlogs')
+    @commands.has_permissions(administrator=True)
+    async def search_logs(self, ctx, *filtros):
+        """Busca no histórico de logs por usuário, tipo e período"""
+        query = {"guild_id": str(ctx.guild.id)}
+        cursor_token = None
+        
+        for filtro in filtros:
+            user_match = re.fullmatch(r"<@!?(\d+)>|(\d{15,20})", filtro)
+            period_match = re.fullmatch(r"(\d+)([mhd])", filtro.lower())
+            if user_match:
+                query["user_id"] = user_match.group(1) or user_match.group(2)
+            elif filtro.lower() in LOG_TYPES:
+                query["log_type"] = filtro.lower()
+            elif period_match:
+                value, unit = int(period_match.group(1)), period_match.group(2)
+                delta = {"m": datetime.timedelta(minutes=value), "h": datetime.timedelta(hours=value), "d": datetime.timedelta(days=value)}[unit]
+                query["timestamp"] = {"$gte": datetime.datetime.utcnow() - delta}
+            elif filtro.lower().startswith("apos:"):
+                cursor_token = filtro[5:]
+            else:
+                embed = discord.Embed(
+                    title="❌ Filtro inválido",
+                    description=f"`{filtro}` não é um usuário, tipo ou período válido.\n\n"
+                                "**Uso:** `!buscarlogs [@usuário] [tipo] [período]`\n"
+                                "**Período:** `30m`, `12h`, `7d`\n"
+                                f"**Tipos:** {', '.join(f'`{t}`' for t in LOG_TYPES)}",
+                    color=discord.Color.red()
+                )
+                return await ctx.send(embed=embed)
+        
+        if not await self.ensure_connection():
+            return await ctx.send("❌ Banco de dados indisponível.")
+        
+        if cursor_token:
+            try:
+                last_timestamp, last_id = self.decode_cursor(cursor_token)
+            except Exception:
+                return await ctx.send("❌ Cursor de página inválido.")
+            # Keyset: continua exatamente após o último resultado da página anterior
+            query["$or"] = [
+                {"timestamp": {"$lt": last_timestamp}},
+                {"timestamp": last_timestamp, "_id": {"$lt": last_id}}
+            ]
+        
+        try:
+            results = await self.logs_collection.find(
+                query,
+                {"log_type": 1, "user_id": 1, "timestamp": 1, "data": 1}
+            ).sort([("timestamp", -1), ("_id", -1)]).limit(LOG_SEARCH_PAGE_SIZE + 1).to_list(length=LOG_SEARCH_PAGE_SIZE + 1)
+        except Exception as e:
+            print(f"❌ Erro ao buscar logs: {e}")
+            return await ctx.send("❌ Erro ao buscar logs.")
+        
+        has_more = len(results) > LOG_SEARCH_PAGE_SIZE
+        results = results[:LOG_SEARCH_PAGE_SIZE]
+        
+        if not results:
+            embed = discord.Embed(title="🔎 Busca de Logs", description="Nenhum log encontrado.", color=discord.Color.orange())
+            return await ctx.send(embed=embed)
+        
+        lines = []
+        for entry in results:
+            line = f"<t:{int((entry['timestamp'] - EPOCH).total_seconds())}:f> **{entry['log_type']}**"
+            if entry.get("user_id"):
+                line += f" <@{entry['user_id']}>"
+            summary = self.summarize_log(entry)
+            if summary:
+                line += f"\n└ {discord.utils.escape_markdown(summary)}"
+            lines.append(line)
+        
+        embed = discord.Embed(title="🔎 Busca de Logs", description="\n".join(lines), color=discord.Color.blue())
+        if has_more:
+            filtros_base = " ".join(f for f in filtros if not f.lower().startswith("apos:"))
+            embed.add_field(
+                name="➡️ Próxima página",
+                value=f"`!buscarlogs {filtros_base + ' ' if filtros_base else ''}apos:{self.encode_cursor(results[-1])}`",
+                inline=False
+            )
+        await ctx.send(embed=embed)
+    
     # LOGS DE MENSAGENS
     @commands.Cog.listener()
-    async def on_message_delete(self, message):
-        if message.author.bot or not message.guild:
+    async def on_message(self, message):
+        if message.guild and not message.author.bot:
+            self.message_store.add(message)
+    
+    def set_author_from_record(self, embed, guild, record):
+        """Autor do embed a partir do membro atual (se ainda estiver no servidor)"""
+        member = guild.get_member(record.author_id)
+        if member:
+            embed.set_author(name=member.display_name, icon_url=member.display_avatar.url)
+        else:
+            embed.set_author(name=record.author_name)
+    
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        # Usa o cache do discord.py se existir, senão o armazenamento próprio
+        record = self.message_store.pop(payload.channel_id, payload.message_id)
+        message = payload.cached_message
+        if not payload.guild_id:
+            return
+        if message is None and record is None:
             return
         
+        guild = self.bot.get_guild(payload.guild_id)
+        channel = guild.get_channel(payload.channel_id) if guild else None
+        if channel is None:
+            return
+        
+        if message is not None:
+            if message.author.bot:
+                return
+            author_id, author_name = message.author.id, str(message.author)
+            content = message.content
+            attachments = len(message.attachments)
+        else:
+            if record.author_bot:
+                return
+            author_id, author_name = record.author_id, record.author_name
+            content = record.content
+            attachments = record.attachments
+        
         embed = discord.Embed(
             title="🗑️ Mensagem Deletada",
             color=discord.Color.red(),
             timestamp=datetime.datetime.utcnow()
         )
-        embed.add_field(name="Autor", value=f"{message.author} ({message.author.id})", inline=True)
-        embed.add_field(name="Canal", value=message.channel.mention, inline=True)
-        embed.add_field(name="Conteúdo", value=message.content[:1000] or "Sem conteúdo de texto", inline=False)
-        if message.attachments:
-            embed.add_field(name="Anexos", value=f"{len(message.attachments)} arquivo(s)", inline=True)
+        embed.add_field(name="Autor", value=f"{author_name} ({author_id})", inline=True)
+        embed.add_field(name="Canal", value=channel.mention, inline=True)
+        embed.add_field(name="Conteúdo", value=content[:1000] or "Sem conteúdo de texto", inline=False)
+        if attachments:
+            embed.add_field(name="Anexos", value=f"{attachments} arquivo(s)", inline=True)
         
-        # Verifica se o avatar existe antes de usar
-        avatar_url = message.author.avatar.url if message.author.avatar else message.author.default_avatar.url
-        embed.set_author(name=message.author.display_name, icon_url=avatar_url)
+        if message is not None:
+            embed.set_author(name=message.author.display_name, icon_url=message.author.display_avatar.url)
+        else:
+            self.set_author_from_record(embed, guild, record)
         
         log_data = {
-            "author_id": message.author.id,
-            "author_name": str(message.author),
-            "channel_id": message.channel.id,
-            "channel_name": message.channel.name,
-            "content": message.content,
-            "attachments_count": len(message.attachments) if message.attachments else 0,
-            "message_id": message.id
+            "author_id": author_id,
+            "author_name": author_name,
+            "channel_id": channel.id,
+            "channel_name": channel.name,
+            "content": content,
+            "attachments_count": attachments,
+            "message_id": payload.message_id
         }
         
-        await self.send_log(message.guild, embed, "message_delete", log_data)
+        await self.send_log(guild, embed, "message_delete", log_data)
     
     @commands.Cog.listener()
-    async def on_message_edit(self, before, after):
-        if before.author.bot or not before.guild or before.content == after.content:
+    async def on_raw_message_edit(self, payload):
+        # Edições só de embed (preview de link) não trazem "content"
+        if not payload.guild_id or "content" not in payload.data:
+            return
+        
+        new_content = payload.data["content"]
+        message = payload.cached_message
+        record = self.message_store.get(payload.channel_id, payload.message_id)
+        if message is None and record is None:
+            return
+        
+        old_content = message.content if message is not None else record.content
+        if record is not None:
+            self.message_store.update_content(payload.channel_id, payload.message_id, new_content)
+        if old_content == new_content:
+            return
+        
+        guild = self.bot.get_guild(payload.guild_id)
+        channel = guild.get_channel(payload.channel_id) if guild else None
+        if channel is None:
             return
         
+        if message is not None:
+            if message.author.bot:
+                return
+            author_id, author_name = message.author.id, str(message.author)
+        else:
+            if record.author_bot:
+                return
+            author_id, author_name = record.author_id, record.author_name
+        
         embed = discord.Embed(
             title="✏️ Mensagem Editada",
             color=discord.Color.orange(),
             timestamp=datetime.datetime.utcnow()
         )
-        embed.add_field(name="Autor", value=f"{before.author} ({before.author.id})", inline=True)
-        embed.add_field(name="Canal", value=before.channel.mention, inline=True)
-        embed.add_field(name="Antes", value=before.content[:500] or "Sem conteúdo", inline=False)
-        embed.add_field(name="Depois", value=after.content[:500] or "Sem conteúdo", inline=False)
+        embed.add_field(name="Autor", value=f"{author_name} ({author_id})", inline=True)
+        embed.add_field(name="Canal", value=channel.mention, inline=True)
+        embed.add_field(name="Antes", value=old_content[:500] or "Sem conteúdo", inline=False)
+        embed.add_field(name="Depois", value=new_content[:500] or "Sem conteúdo", inline=False)
         
-        avatar_url = before.author.avatar.url if before.author.avatar else before.author.default_avatar.url
-        embed.set_author(name=before.author.display_name, icon_url=avatar_url)
+        if message is not None:
+            embed.set_author(name=message.author.display_name, icon_url=message.author.display_avatar.url)
+        else:
+            self.set_author_from_record(embed, guild, record)
         
         log_data = {
-            "author_id": before.author.id,
-            "author_name": str(before.author),
-            "channel_id": before.channel.id,
-            "channel_name": before.channel.name,
-            "content_before": before.content,
-            "content_after": after.content,
-            "message_id": before.id
+            "author_id": author_id,
+            "author_name": author_name,
+            "channel_id": channel.id,
+            "channel_name": channel.name,
+            "content_before": old_content,
+            "content_after": new_content,
+            "message_id": payload.message_id
         }
         
-        await self.send_log(before.guild, embed, "message_edit", log_data)
+        await self.send_log(guild, embed, "message_edit", log_data)
     
     # LOGS DE MEMBROS
     @commands.Cog.listener()
@@ -339,23 +682,8 @@ class AdvancedLogs(commands.Cog):
             "reason": None
         }
         
-        # Tenta pegar o motivo do ban
-        try:
-            async for entry in guild.audit_logs(action=discord.AuditLogAction.ban, limit=1):
-                if entry.target.id == user.id:
-                    embed.add_field(name="Moderador", value=entry.user, inline=True)
-                    log_data["moderator"] = str(entry.user)
-                    log_data["moderator_id"] = entry.user.id
-                    if entry.reason:
-                        embed.add_field(name="Motivo", value=entry.reason, inline=False)
-                        log_data["reason"] = entry.reason
-                    break
-        except discord.Forbidden:
-            embed.add_field(name="Moderador", value="Sem permissão para ver audit logs", inline=True)
-        except Exception as e:
-            print(f"❌ Erro ao buscar audit logs: {e}")
-        
-        await self.send_log(guild, embed, "member_ban", log_data)
+        # Moderador e motivo vêm da busca em lote no audit log
+        self.queue_audit_lookup(guild, discord.AuditLogAction.ban, user.id, embed, "member_ban", log_data)
     
     @commands.Cog.listener()
     async def on_member_unban(self, guild, user):
@@ -376,23 +704,54 @@ class AdvancedLogs(commands.Cog):
             "reason": None
         }
         
-        # Tenta pegar quem desbaniu
+        # Quem desbaniu vem da busca em lote no audit log
+        self.queue_audit_lookup(guild, discord.AuditLogAction.unban, user.id, embed, "member_unban", log_data)
+    
+    def queue_audit_lookup(self, guild, action, target_id, embed, log_type, log_data):
+        """Agrupa eventos de ban/unban próximos para uma única busca no audit log"""
+        key = (guild.id, action)
+        self.audit_pending.setdefault(key, []).append((target_id, embed, log_type, log_data))
+        if key not in self.audit_tasks:
+            self.audit_tasks[key] = self.bot.loop.create_task(self.resolve_audit_burst(guild, action))
+    
+    async def resolve_audit_burst(self, guild, action):
+        """Busca o audit log uma vez, indexa por alvo e atribui todos os eventos do lote"""
+        key = (guild.id, action)
+        await asyncio.sleep(AUDIT_BURST_DELAY)
+        events = self.audit_pending.pop(key, [])
+        self.audit_tasks.pop(key, None)
+        if not events:
+            return
+        
+        entries = {}
+        forbidden = False
+        oldest_allowed = discord.utils.utcnow() - AUDIT_MAX_AGE
         try:
-            async for entry in guild.audit_logs(action=discord.AuditLogAction.unban, limit=1):
-                if entry.target.id == user.id:
-                    embed.add_field(name="Moderador", value=entry.user, inline=True)
-                    log_data["moderator"] = str(entry.user)
-                    log_data["moderator_id"] = entry.user.id
-                    if entry.reason:
-                        embed.add_field(name="Motivo", value=entry.reason, inline=False)
-                        log_data["reason"] = entry.reason
+            # Entradas vêm da mais nova para a mais antiga: fica a mais recente de cada alvo
+            limit = min(AUDIT_FETCH_MAX, len(events) + 10)
+            async for entry in guild.audit_logs(action=action, limit=limit):
+                if entry.created_at < oldest_allowed:
                     break
+                if entry.target is not None and entry.target.id not in entries:
+                    entries[entry.target.id] = entry
         except discord.Forbidden:
-            embed.add_field(name="Moderador", value="Sem permissão para ver audit logs", inline=True)
+            forbidden = True
         except Exception as e:
             print(f"❌ Erro ao buscar audit logs: {e}")
         
-        await self.send_log(guild, embed, "member_unban", log_data)
+        for target_id, embed, log_type, log_data in events:
+            entry = entries.get(target_id)
+            if forbidden:
+                embed.add_field(name="Moderador", value="Sem permissão para ver audit logs", inline=True)
+            elif entry is not None:
+                embed.add_field(name="Moderador", value=entry.user, inline=True)
+                log_data["moderator"] = str(entry.user)
+                log_data["moderator_id"] = entry.user.id if entry.user else None
+                if entry.reason:
+                    embed.add_field(name="Motivo", value=entry.reason, inline=False)
+                    log_data["reason"] = entry.reason
+            
+            await self.send_log(guild, embed, log_type, log_data)
     
     # LOGS DE CARGOS
     @commands.Cog.listener()
@@ -473,6 +832,8 @@ class AdvancedLogs(commands.Cog):
     
     @commands.Cog.listener()
     async def on_guild_channel_delete(self, channel):
+        self.message_store.remove_channel(channel.id)
+        
         embed = discord.Embed(
             title="🗑️ Canal Deletado",
             color=discord.Color.red(),
@@ -616,7 +977,7 @@ class AdvancedLogs(commands.Cog):
         
         embed.add_field(
             name="🔧 Comandos de Configuração",
-            value="`!canaldelogs #canal` - Define o canal para logs\n`!testelog` - Testa o sistema de logs\n`!statusdblogs` - Verifica conexão com BD",
+            value="`!canaldelogs #canal` - Define o canal para logs\n`!testelog` - Testa o sistema de logs\n`!statusdblogs` - Verifica conexão com BD\n`!buscarlogs [@usuário] [tipo] [período]` - Busca no histórico",
             inline=False
         )
         
@@ -641,5 +1002,30 @@ class AdvancedLogs(commands.Cog):
         embed.set_footer(text="Todos os logs são salvos no banco de dados para consulta posterior")
         await ctx.send(embed=embed)
 
+    async def cog_unload(self):
+        """Esvazia as filas de log, para os workers e grava o histórico pendente"""
+        self.flush_log_entries.cancel()
+        for task in self.audit_tasks.values():
+            task.cancel()
+        self.audit_tasks.clear()
+        
+        # Dá aos workers um prazo curto para entregar o que já está na fila
+        queues = list(self.log_queues.values())
+        if queues:
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(queue.join() for queue in queues)),
+                    timeout=LOG_DRAIN_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                pending = sum(queue.qsize() for queue in queues)
+                print(f"⚠️ {pending} evento(s) de log descartado(s) ao descarregar o cog")
+        
+        for worker in self.log_workers.values():
+            worker.cancel()
+        self.log_workers.clear()
+        self.log_queues.clear()
+        await self.flush_pending_entries()
+
 async def setup(bot):
     await bot.add_cog(AdvancedLogs(bot))
\ No newline at end of file
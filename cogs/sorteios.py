@@ -1,10 +1,23 @@
 import discord
-from discord.ext import commands
-import os
+from discord.ext import commands, tasks
+import heapq
 import random
-from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
-import asyncio
+import re
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from utils.scheduler import DeadlineScheduler
+
+EMOJI_SORTEIO = '🎁'
+# Intervalo (segundos) para gravar as entradas/saídas de participantes em lote
+PARTICIPANTES_FLUSH_INTERVAL = 5
+# Limite de vencedores por sorteio e de sorteios exibidos em !sorteios
+MAX_VENCEDORES = 20
+# Entradas máximas de um VIP (vip:N) em sorteios com bônus
+MAX_PESO_VIP = 10
+# Nova tentativa de encerramento quando o sorteio automático falha
+RETRY_ENCERRAMENTO_SECONDS = 60
+MAX_SORTEIOS_LISTADOS = 25
+UNIDADES_DURACAO = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days'}
 
 class Sorteio(commands.Cog):
     def __init__(self, bot):
@@ -14,34 +27,42 @@ class Sorteio(commands.Cog):
         self.sorteios_collection = None
         self.configuracoes_collection = None
         self._connection_ready = False
+        # mensagem_id -> set de user_ids, mantido pelos eventos de reação
+        self.participantes = {}
+        # mensagem_id -> {user_id: True (entrou) / False (saiu)} ainda não gravados
+        self.participacoes_pendentes = {}
+        # Sorteios carregados do banco cujas reações ainda não foram relidas: quem
+        # reagiu com o bot offline só aparece lendo a mensagem antes do sorteio
+        self.nao_reconciliados = set()
+        # Um único agendador (heap) encerra os sorteios com prazo de todos os servidores
+        self.fim_scheduler = DeadlineScheduler(self.encerrar_sorteios_vencidos, name="agendador de sorteios")
+        self.fim_scheduler.start()
         # Inicializa a conexão com MongoDB
         self.bot.loop.create_task(self.init_database())
+        self.flush_participantes.start()
     
     async def init_database(self):
-        """Inicializa a conexão com MongoDB"""
+        """Inicializa as coleções usando a conexão compartilhada do bot"""
         try:
-            # URL de conexão do MongoDB (vem de variável de ambiente)
-            mongo_uri = os.getenv("MONGO_URI") or os.getenv('MONGODB_URL', 'mongodb://localhost:27017/')
-            
-            if not mongo_uri:
-                print("❌ MONGO_URI não encontrada nas variáveis de ambiente!")
+            # Pool de conexões único, criado em main.CustomBot
+            if not await self.bot.database.ensure_connection():
                 return
             
-            print("🔄 Conectando ao MongoDB (Sorteios)...")
-            self.client = AsyncIOMotorClient(mongo_uri)
-            
-            # Testa a conexão
-            await self.client.admin.command('ping')
-            
-            self.db = self.client['discord_bot']
+            self.client = self.bot.database.client
+            self.db = self.bot.database.db
             self.sorteios_collection = self.db['sorteios']
             self.configuracoes_collection = self.db['configuracoes']
             self._connection_ready = True
             
-            print("✅ Conectado ao MongoDB (Sorteios) com sucesso!")
+            # Sorteios são identificados pela mensagem; vários por servidor
+            await self.sorteios_collection.create_index('mensagem_id')
+            await self.sorteios_collection.create_index([('guild_id', 1), ('ativo', 1)])
+            await self.sorteios_collection.create_index([('ativo', 1), ('ends_at', 1)])
+            await self.load_participantes()
+            await self.load_pending_sorteios()
             
         except Exception as e:
-            print(f"❌ Erro ao conectar com MongoDB (Sorteios): {e}")
+            print(f"❌ Erro ao inicializar MongoDB (Sorteios): {e}")
             self._connection_ready = False
 
     async def ensure_connection(self):
@@ -50,25 +71,40 @@ class Sorteio(commands.Cog):
             await self.init_database()
         return self._connection_ready
     
-    async def get_sorteio(self, guild_id):
-        """Busca sorteio do servidor no MongoDB"""
+    async def get_sorteio(self, guild_id, mensagem_id=None):
+        """Busca um sorteio do servidor pelo ID da mensagem (ou o ativo mais recente)"""
         try:
             if not await self.ensure_connection():
                 return None
-            return await self.sorteios_collection.find_one({'guild_id': str(guild_id)})
+            if mensagem_id:
+                return await self.sorteios_collection.find_one({'guild_id': str(guild_id), 'mensagem_id': mensagem_id})
+            return await self.sorteios_collection.find_one(
+                {'guild_id': str(guild_id), 'ativo': True},
+                sort=[('_id', -1)]
+            )
         except Exception as e:
             print(f"❌ Erro ao buscar sorteio: {e}")
             return None
     
-    async def save_sorteio(self, guild_id, data):
-        """Salva ou atualiza sorteio no MongoDB"""
+    async def get_sorteios_ativos(self, guild_id):
+        """Lista os sorteios ativos do servidor (mais antigos primeiro)"""
+        try:
+            if not await self.ensure_connection():
+                return []
+            cursor = self.sorteios_collection.find({'guild_id': str(guild_id), 'ativo': True}).sort('_id', 1)
+            return await cursor.to_list(length=MAX_SORTEIOS_LISTADOS)
+        except Exception as e:
+            print(f"❌ Erro ao listar sorteios: {e}")
+            return []
+    
+    async def save_sorteio(self, data):
+        """Salva ou atualiza um sorteio no MongoDB (chave: mensagem_id)"""
         try:
             if not await self.ensure_connection():
                 return False
-            data['guild_id'] = str(guild_id)
             await self.sorteios_collection.replace_one(
-                {'guild_id': str(guild_id)}, 
-                data, 
+                {'mensagem_id': data['mensagem_id']},
+                data,
                 upsert=True
             )
             return True
@@ -76,16 +112,144 @@ class Sorteio(commands.Cog):
             print(f"❌ Erro ao salvar sorteio: {e}")
             return False
     
-    async def delete_sorteio(self, guild_id):
-        """Remove sorteio do MongoDB"""
+    async def fechar_sorteio(self, sorteio, participantes, campos=None):
+        """Marca o sorteio como encerrado; retorna False se outro fluxo já o encerrou
+        
+        Falhas de conexão/gravação levantam exceção e mantêm o estado em memória
+        e o agendamento, para que o encerramento possa ser tentado de novo.
+        """
+        if not await self.ensure_connection():
+            raise ConnectionError("Conexão com MongoDB não está disponível")
+        atualizacao = {
+            'ativo': False,
+            'participantes': list(participantes),
+            'encerrado_em': datetime.now()
+        }
+        atualizacao.update(campos or {})
+        # O filtro em ativo garante que só um encerramento anuncia o resultado
+        result = await self.sorteios_collection.update_one(
+            {'_id': sorteio['_id'], 'ativo': True},
+            {'$set': atualizacao}
+        )
+        
+        # Encerrado (por este ou outro fluxo): libera o estado em memória
+        mensagem_id = sorteio.get('mensagem_id')
+        self.fim_scheduler.cancel(mensagem_id)
+        self.participantes.pop(mensagem_id, None)
+        self.participacoes_pendentes.pop(mensagem_id, None)
+        self.nao_reconciliados.discard(mensagem_id)
+        return result.modified_count == 1
+    
+    async def load_pending_sorteios(self):
+        """Agenda o fim dos sorteios ativos com prazo (índice em ativo + ends_at)"""
+        count = 0
+        async for sorteio in self.sorteios_collection.find(
+            {'ativo': True, 'ends_at': {'$ne': None}},
+            {'_id': 0, 'mensagem_id': 1, 'ends_at': 1}
+        ).sort('ends_at', 1):
+            self.fim_scheduler.schedule(sorteio['mensagem_id'], sorteio['ends_at'])
+            count += 1
+        if count:
+            print(f"🎁 {count} sorteios com encerramento agendado")
+    
+    async def load_participantes(self):
+        """Carrega os participantes dos sorteios ativos para a memória"""
+        async for sorteio in self.sorteios_collection.find(
+            {'ativo': True, 'mensagem_id': {'$exists': True}},
+            {'_id': 0, 'mensagem_id': 1, 'participantes': 1}
+        ):
+            participantes = self.participantes.setdefault(sorteio['mensagem_id'], set())
+            participantes.update(sorteio.get('participantes', []))
+            self.nao_reconciliados.add(sorteio['mensagem_id'])
+    
+    def registrar_participacao(self, mensagem_id, user_id, entrou):
+        """Atualiza o set em memória e marca a mudança para a próxima gravação"""
+        if entrou:
+            self.participantes[mensagem_id].add(user_id)
+        else:
+            self.participantes[mensagem_id].discard(user_id)
+        # Entrar e sair no mesmo intervalo se anulam: vale o último evento
+        self.participacoes_pendentes.setdefault(mensagem_id, {})[user_id] = entrou
+    
+    async def gravar_participantes(self):
+        """Grava as mudanças pendentes com $addToSet/$pull em um único bulk_write"""
+        if not self.participacoes_pendentes:
+            return
+        
+        pendentes, self.participacoes_pendentes = self.participacoes_pendentes, {}
+        operacoes = []
+        for mensagem_id, mudancas in pendentes.items():
+            entraram = [user_id for user_id, entrou in mudancas.items() if entrou]
+            sairam = [user_id for user_id, entrou in mudancas.items() if not entrou]
+            if entraram:
+                operacoes.append(UpdateOne(
+                    {'mensagem_id': mensagem_id},
+                    {'$addToSet': {'participantes': {'$each': entraram}}}
+                ))
+            if sairam:
+                operacoes.append(UpdateOne(
+                    {'mensagem_id': mensagem_id},
+                    {'$pull': {'participantes': {'$in': sairam}}}
+                ))
+        
         try:
             if not await self.ensure_connection():
-                return False
-            await self.sorteios_collection.delete_one({'guild_id': str(guild_id)})
-            return True
+                raise ConnectionError("Conexão com MongoDB não está disponível")
+            await self.sorteios_collection.bulk_write(operacoes, ordered=False)
         except Exception as e:
-            print(f"❌ Erro ao deletar sorteio: {e}")
-            return False
+            print(f"❌ Erro ao salvar participantes: {e}")
+            # Devolve ao buffer sem sobrescrever eventos mais novos
+            for mensagem_id, mudancas in pendentes.items():
+                atuais = self.participacoes_pendentes.setdefault(mensagem_id, {})
+                for user_id, entrou in mudancas.items():
+                    atuais.setdefault(user_id, entrou)
+    
+    @tasks.loop(seconds=PARTICIPANTES_FLUSH_INTERVAL)
+    async def flush_participantes(self):
+        """Grava periodicamente as participações acumuladas"""
+        await self.gravar_participantes()
+    
+    async def reconciliar_participantes(self, canal, mensagem_id):
+        """Reconstrói os participantes lendo a reação pela API (fallback lento)"""
+        participantes = set()
+        try:
+            msg = await canal.fetch_message(mensagem_id)
+            for reaction in msg.reactions:
+                if str(reaction.emoji) == EMOJI_SORTEIO:
+                    async for user in reaction.users():
+                        if not user.bot:
+                            participantes.add(user.id)
+                    break
+        except Exception as e:
+            print(f"❌ Erro ao ler reações do sorteio {mensagem_id}: {e}")
+            return participantes
+        
+        self.participantes[mensagem_id] = participantes
+        self.participacoes_pendentes.pop(mensagem_id, None)
+        self.nao_reconciliados.discard(mensagem_id)
+        try:
+            if await self.ensure_connection():
+                await self.sorteios_collection.update_one(
+                    {'mensagem_id': mensagem_id},
+                    {'$set': {'participantes': list(participantes)}}
+                )
+        except Exception as e:
+            print(f"❌ Erro ao salvar participantes: {e}")
+        return participantes
+    
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload):
+        if payload.message_id not in self.participantes or str(payload.emoji) != EMOJI_SORTEIO:
+            return
+        if payload.member is None or payload.member.bot:
+            return
+        self.registrar_participacao(payload.message_id, payload.user_id, True)
+    
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload):
+        if payload.message_id not in self.participantes or str(payload.emoji) != EMOJI_SORTEIO:
+            return
+        self.registrar_participacao(payload.message_id, payload.user_id, False)
     
     async def get_configuracao(self, guild_id):
         """Busca configuração do servidor no MongoDB"""
@@ -114,28 +278,193 @@ class Sorteio(commands.Cog):
             print(f"❌ Erro ao salvar configuração: {e}")
             return False
     
+    def parse_opcoes(self, texto):
+        """Separa as opções do prêmio: duração (2h), vencedores (3v), nível
+        mínimo de XP (nivel:5) e entradas de VIP (vip:3)"""
+        opcoes = {'duracao': None, 'vencedores': 1, 'nivel_minimo': 0, 'peso_vip': 1}
+        while True:
+            partes = texto.split(maxsplit=1)
+            if not partes:
+                break
+            token = partes[0].lower()
+            duracao_match = re.fullmatch(r"(\d+)([smhd])", token)
+            vencedores_match = re.fullmatch(r"(\d+)v", token)
+            requisito_match = re.fullmatch(r"(nivel|vip):(\d+)", token)
+            if duracao_match and opcoes['duracao'] is None:
+                opcoes['duracao'] = timedelta(**{UNIDADES_DURACAO[duracao_match.group(2)]: int(duracao_match.group(1))})
+            elif vencedores_match:
+                opcoes['vencedores'] = int(vencedores_match.group(1))
+            elif requisito_match:
+                campo = 'nivel_minimo' if requisito_match.group(1) == 'nivel' else 'peso_vip'
+                opcoes[campo] = int(requisito_match.group(2))
+            else:
+                break
+            texto = partes[1] if len(partes) > 1 else ''
+        return opcoes, texto.strip()
+    
+    def descrever_requisitos(self, sorteio):
+        requisitos = []
+        if sorteio.get('nivel_minimo', 0) > 1:
+            requisitos.append(f"Nível {sorteio['nivel_minimo']}+")
+        if sorteio.get('peso_vip', 1) > 1:
+            requisitos.append(f"VIP conta {sorteio['peso_vip']}x")
+        return " • ".join(requisitos)
+    
+    def get_canal_sorteio(self, sorteio, configs):
+        """Canal onde o sorteio foi publicado (sorteios antigos usam o configurado)"""
+        return self.bot.get_channel(sorteio.get('canal_id') or configs.get('canal_sorteio'))
+    
+    async def verificar_canal_comando(self, ctx, configs):
+        """Envia o aviso e retorna False se o comando foi usado fora do canal configurado"""
+        canal_comando_id = configs.get('canal_comando')
+        if canal_comando_id and ctx.channel.id != canal_comando_id:
+            canal_comando = self.bot.get_channel(canal_comando_id)
+            embed = discord.Embed(
+                title="❌ Canal Incorreto",
+                description=f"Use este comando no canal {canal_comando.mention if canal_comando else 'configurado'}.",
+                color=0xff4444
+            )
+            await ctx.send(embed=embed)
+            return False
+        return True
+    
+    async def obter_participantes(self, sorteio, canal):
+        """Participantes em memória; a leitura pela API é usada quando o set ainda
+        não existe ou foi carregado do banco e não foi relido desde o início do bot
+        (reações feitas com o bot offline ou antes do acompanhamento por eventos)"""
+        mensagem_id = sorteio.get('mensagem_id')
+        participantes = self.participantes.get(mensagem_id) if mensagem_id else None
+        if mensagem_id and canal and (not participantes or mensagem_id in self.nao_reconciliados):
+            lidos = await self.reconciliar_participantes(canal, mensagem_id)
+            # Se a leitura falhou, mantém o set em memória em vez de um resultado parcial
+            if not participantes or mensagem_id not in self.nao_reconciliados:
+                participantes = lidos
+        return participantes or set()
+    
+    async def sortear_vencedores(self, sorteio, participantes):
+        """Sorteia vencedores distintos entre os participantes elegíveis.
+
+        O nível mínimo é resolvido com uma única consulta $in no XPSystem e o
+        bônus VIP com o índice em memória do VIPSystem. Com pesos, a escolha
+        sem reposição usa chaves exponenciais (Efraimidis-Spirakis) e um heap
+        de tamanho k: O(n log k). Retorna (vencedores_ids, total_elegiveis).
+        """
+        guild_id = sorteio['guild_id']
+        quantidade = sorteio.get('vencedores', 1)
+        elegiveis = list(participantes)
+        
+        nivel_minimo = sorteio.get('nivel_minimo', 0)
+        xp_cog = self.bot.get_cog('XPSystem')
+        if nivel_minimo > 1 and xp_cog and elegiveis:
+            niveis = await xp_cog.get_levels(guild_id, elegiveis)
+            elegiveis = [user_id for user_id in elegiveis if niveis.get(str(user_id), 1) >= nivel_minimo]
+        
+        peso_vip = sorteio.get('peso_vip', 1)
+        vip_cog = self.bot.get_cog('VIPSystem')
+        vips = vip_cog.get_active_vips(guild_id) if peso_vip > 1 and vip_cog else set()
+        
+        if not vips:
+            return random.sample(elegiveis, min(quantidade, len(elegiveis))), len(elegiveis)
+        
+        vencedores = heapq.nsmallest(
+            quantidade,
+            elegiveis,
+            key=lambda user_id: random.expovariate(peso_vip if str(user_id) in vips else 1)
+        )
+        return vencedores, len(elegiveis)
+    
+    def embed_vencedores(self, premio, vencedores_ids, total, elegiveis):
+        mencoes = ", ".join(f"<@{user_id}>" for user_id in vencedores_ids)
+        embed = discord.Embed(
+            title="🎊 TEMOS UM VENCEDOR!" if len(vencedores_ids) == 1 else "🎊 TEMOS VENCEDORES!",
+            description=f"🎉 Parabéns {mencoes}!\n\n**Prêmio:** {premio}",
+            color=0xffd700
+        )
+        if elegiveis < total:
+            embed.set_footer(text=f"Sorteado entre {elegiveis} elegíveis de {total} participantes")
+        else:
+            embed.set_footer(text=f"Sorteado entre {total} participantes")
+        return embed
+    
+    async def finalizar_sorteio(self, sorteio):
+        """Sorteia os vencedores, encerra e anuncia um sorteio que chegou ao prazo"""
+        configs = await self.get_configuracao(sorteio['guild_id'])
+        canal = self.get_canal_sorteio(sorteio, configs)
+        
+        await self.gravar_participantes()
+        participantes = await self.obter_participantes(sorteio, canal)
+        vencedores_ids, elegiveis = await self.sortear_vencedores(sorteio, participantes)
+        
+        if not await self.fechar_sorteio(sorteio, participantes, {'vencedores_ids': vencedores_ids}):
+            return
+        if not canal:
+            return
+        
+        if vencedores_ids:
+            await canal.send(embed=self.embed_vencedores(sorteio['premio'], vencedores_ids, len(participantes), elegiveis))
+        else:
+            embed = discord.Embed(
+                title="🔒 Sorteio Encerrado",
+                description=f"O sorteio do prêmio **{sorteio['premio']}** terminou sem participantes elegíveis.",
+                color=0xff6666
+            )
+            await canal.send(embed=embed)
+    
+    async def encerrar_sorteios_vencidos(self, mensagem_ids):
+        """Encerra os sorteios vencidos (chamado pelo agendador com os IDs das mensagens)"""
+        await self.bot.wait_until_ready()
+        # Continua ativo: tenta de novo em vez de esperar o próximo restart
+        retry = datetime.now() + timedelta(seconds=RETRY_ENCERRAMENTO_SECONDS)
+        try:
+            if not await self.ensure_connection():
+                raise ConnectionError("Conexão com MongoDB não está disponível")
+            sorteios = await self.sorteios_collection.find(
+                {'mensagem_id': {'$in': mensagem_ids}, 'ativo': True}
+            ).to_list(length=None)
+        except Exception as e:
+            print(f"❌ Erro ao buscar sorteios vencidos: {e}")
+            for mensagem_id in mensagem_ids:
+                self.fim_scheduler.schedule(mensagem_id, retry)
+            return
+        
+        for sorteio in sorteios:
+            try:
+                await self.finalizar_sorteio(sorteio)
+            except Exception as e:
+                print(f"❌ Erro ao encerrar sorteio {sorteio.get('mensagem_id')}: {e}")
+                self.fim_scheduler.schedule(sorteio['mensagem_id'], retry)
+    
     @commands.command(name='comecarsorteio', aliases=['startgw'])
     @commands.has_permissions(administrator=True)
-    async def comecar_sorteio(self, ctx, *, premio):
-        """Inicia um novo sorteio"""
+    async def comecar_sorteio(self, ctx, *, opcoes):
+        """Inicia um novo sorteio. Uso: !comecarsorteio [duração] [Nv] [nivel:N] [vip:N] <prêmio>"""
         guild_id = str(ctx.guild.id)
+        opcoes, premio = self.parse_opcoes(opcoes)
+        vencedores = opcoes['vencedores']
         
         if not premio:
             embed = discord.Embed(
                 title="❌ Erro",
-                description="Você precisa especificar um prêmio.\n**Uso:** `!comecarsorteio <prêmio>`",
+                description="Você precisa especificar um prêmio.\n**Uso:** `!comecarsorteio [duração] [Nv] [nivel:N] [vip:N] <prêmio>`\n**Exemplo:** `!comecarsorteio 2h 3v nivel:5 vip:2 Nitro`",
                 color=0xff4444
             )
             await ctx.send(embed=embed)
             return
         
-        # Verifica se já existe um sorteio ativo
-        sorteio_ativo = await self.get_sorteio(guild_id)
-        if sorteio_ativo and sorteio_ativo.get('ativo'):
+        if not 1 <= vencedores <= MAX_VENCEDORES:
             embed = discord.Embed(
-                title="⚠️ Sorteio Já Ativo",
-                description="Já existe um sorteio em andamento.\nUse `!encerrarsorteio` para encerrar antes de começar outro.",
-                color=0xffaa00
+                title="❌ Erro",
+                description=f"O número de vencedores deve ficar entre 1 e {MAX_VENCEDORES}.",
+                color=0xff4444
+            )
+            await ctx.send(embed=embed)
+            return
+        
+        if not 1 <= opcoes['peso_vip'] <= MAX_PESO_VIP:
+            embed = discord.Embed(
+                title="❌ Erro",
+                description=f"As entradas de VIP (`vip:N`) devem ficar entre 1 e {MAX_PESO_VIP}.",
+                color=0xff4444
             )
             await ctx.send(embed=embed)
             return
@@ -143,7 +472,6 @@ class Sorteio(commands.Cog):
         # Verifica se os canais estão configurados
         configs = await self.get_configuracao(guild_id)
         canal_sorteio_id = configs.get('canal_sorteio')
-        canal_comando_id = configs.get('canal_comando')
         
         if not canal_sorteio_id:
             embed = discord.Embed(
@@ -155,59 +483,79 @@ class Sorteio(commands.Cog):
             return
         
         # Verifica se está no canal correto
-        if canal_comando_id and ctx.channel.id != canal_comando_id:
-            canal_comando = self.bot.get_channel(canal_comando_id)
+        if not await self.verificar_canal_comando(ctx, configs):
+            return
+        
+        canal_sorteio = self.bot.get_channel(canal_sorteio_id)
+        if not canal_sorteio:
             embed = discord.Embed(
-                title="❌ Canal Incorreto",
-                description=f"Use este comando no canal {canal_comando.mention if canal_comando else 'configurado'}.",
+                title="❌ Canal do Sorteio Não Encontrado",
+                description="O canal do sorteio foi removido ou não encontrado.",
                 color=0xff4444
             )
             await ctx.send(embed=embed)
             return
         
-        # Cria o sorteio
+        ends_at = datetime.now() + opcoes['duracao'] if opcoes['duracao'] else None
+        
+        # Envia mensagem no canal do sorteio
+        embed = discord.Embed(
+            title="🎉 SORTEIO INICIADO!",
+            description=f"**Prêmio:** {premio}\n\nReaja com {EMOJI_SORTEIO} para participar!",
+            color=0x00ff7f
+        )
+        embed.add_field(name="🏆 Vencedores", value=str(vencedores), inline=True)
+        embed.add_field(
+            name="⏰ Termina",
+            value=f"<t:{int(ends_at.timestamp())}:R>" if ends_at else "Encerramento manual",
+            inline=True
+        )
+        requisitos = self.descrever_requisitos(opcoes)
+        if requisitos:
+            embed.add_field(name="📋 Requisitos", value=requisitos, inline=False)
+        embed.set_footer(text=f"Iniciado por {ctx.author.display_name}")
+        
+        msg = await canal_sorteio.send(embed=embed)
+        
+        # Começa a acompanhar as reações antes de adicionar a do bot
+        self.participantes[msg.id] = set()
+        await msg.add_reaction(EMOJI_SORTEIO)
+        
         sorteio_data = {
+            'guild_id': guild_id,
+            'mensagem_id': msg.id,
+            'canal_id': canal_sorteio.id,
             'premio': premio,
             'ativo': True,
             'participantes': [],
+            'vencedores': vencedores,
+            'nivel_minimo': opcoes['nivel_minimo'],
+            'peso_vip': opcoes['peso_vip'],
+            'ends_at': ends_at,
             'criador': ctx.author.display_name,
             'criador_id': ctx.author.id,
             'data_inicio': datetime.now().strftime('%d/%m/%Y %H:%M')
         }
+        await self.save_sorteio(sorteio_data)
         
-        # Envia mensagem no canal do sorteio
-        canal_sorteio = self.bot.get_channel(canal_sorteio_id)
-        if canal_sorteio:
-            embed = discord.Embed(
-                title="🎉 SORTEIO INICIADO!",
-                description=f"**Prêmio:** {premio}\n\nReaja com 🎁 para participar!",
-                color=0x00ff7f
-            )
-            embed.set_footer(text=f"Iniciado por {ctx.author.display_name}")
-            
-            msg = await canal_sorteio.send(embed=embed)
-            await msg.add_reaction('🎁')
-            
-            # Salva ID da mensagem
-            sorteio_data['mensagem_id'] = msg.id
-        
-        await self.save_sorteio(guild_id, sorteio_data)
+        if ends_at:
+            self.fim_scheduler.schedule(msg.id, ends_at)
         
         # Confirmação no canal de comando
         embed = discord.Embed(
             title="✅ Sorteio Iniciado",
-            description=f"Sorteio do prêmio **{premio}** foi iniciado!",
+            description=f"Sorteio do prêmio **{premio}** foi iniciado!\n**ID:** `{msg.id}`",
             color=0x00ff7f
         )
         await ctx.send(embed=embed)
     
     @commands.command(name='vencedor', aliases=['winner'])
     @commands.has_permissions(administrator=True)
-    async def sortear_vencedor(self, ctx):
-        """Sorteia um vencedor do sorteio ativo"""
+    async def sortear_vencedor(self, ctx, mensagem_id: int = None):
+        """Sorteia os vencedores de um sorteio ativo (o mais recente se o ID não for informado)"""
         guild_id = str(ctx.guild.id)
         
-        sorteio = await self.get_sorteio(guild_id)
+        sorteio = await self.get_sorteio(guild_id, mensagem_id)
         if not sorteio or not sorteio.get('ativo'):
             embed = discord.Embed(
                 title="❌ Nenhum Sorteio Ativo",
@@ -219,22 +567,10 @@ class Sorteio(commands.Cog):
         
         # Verifica canal de comando
         configs = await self.get_configuracao(guild_id)
-        canal_comando_id = configs.get('canal_comando')
-        
-        if canal_comando_id and ctx.channel.id != canal_comando_id:
-            canal_comando = self.bot.get_channel(canal_comando_id)
-            embed = discord.Embed(
-                title="❌ Canal Incorreto",
-                description=f"Use este comando no canal {canal_comando.mention if canal_comando else 'configurado'}.",
-                color=0xff4444
-            )
-            await ctx.send(embed=embed)
+        if not await self.verificar_canal_comando(ctx, configs):
             return
         
-        # Pega participantes da reação
-        canal_sorteio_id = configs.get('canal_sorteio')
-        canal_sorteio = self.bot.get_channel(canal_sorteio_id)
-        
+        canal_sorteio = self.get_canal_sorteio(sorteio, configs)
         if not canal_sorteio:
             embed = discord.Embed(
                 title="❌ Canal do Sorteio Não Encontrado",
@@ -244,23 +580,7 @@ class Sorteio(commands.Cog):
             await ctx.send(embed=embed)
             return
         
-        try:
-            msg_id = sorteio.get('mensagem_id')
-            if msg_id:
-                msg = await canal_sorteio.fetch_message(msg_id)
-                participantes = []
-                
-                for reaction in msg.reactions:
-                    if str(reaction.emoji) == '🎁':
-                        async for user in reaction.users():
-                            if not user.bot:
-                                participantes.append(user)
-                        break
-            else:
-                participantes = []
-        except:
-            participantes = []
-        
+        participantes = await self.obter_participantes(sorteio, canal_sorteio)
         if not participantes:
             embed = discord.Embed(
                 title="❌ Sem Participantes",
@@ -270,35 +590,49 @@ class Sorteio(commands.Cog):
             await ctx.send(embed=embed)
             return
         
-        # Sorteia vencedor
-        vencedor = random.choice(participantes)
-        premio = sorteio['premio']
+        # Sorteia vencedores entre os elegíveis e anuncia no canal do sorteio
+        try:
+            vencedores_ids, elegiveis = await self.sortear_vencedores(sorteio, participantes)
+        except Exception as e:
+            print(f"❌ Erro ao verificar requisitos do sorteio: {e}")
+            embed = discord.Embed(
+                title="❌ Erro",
+                description="Não foi possível verificar os requisitos dos participantes. Tente novamente.",
+                color=0xff4444
+            )
+            await ctx.send(embed=embed)
+            return
         
-        # Anuncia no canal do sorteio
-        embed_vencedor = discord.Embed(
-            title="🎊 TEMOS UM VENCEDOR!",
-            description=f"🎉 Parabéns {vencedor.mention}!\n\n**Prêmio:** {premio}",
-            color=0xffd700
-        )
-        embed_vencedor.set_footer(text=f"Sorteado entre {len(participantes)} participantes")
+        if not vencedores_ids:
+            embed = discord.Embed(
+                title="❌ Sem Participantes Elegíveis",
+                description=f"Nenhum dos {len(participantes)} participantes cumpre os requisitos ({self.descrever_requisitos(sorteio)}).",
+                color=0xff4444
+            )
+            await ctx.send(embed=embed)
+            return
         
-        await canal_sorteio.send(embed=embed_vencedor)
+        await canal_sorteio.send(embed=self.embed_vencedores(sorteio['premio'], vencedores_ids, len(participantes), elegiveis))
         
         # Confirmação no canal de comando
+        nomes = []
+        for user_id in vencedores_ids:
+            membro = ctx.guild.get_member(user_id)
+            nomes.append(membro.display_name if membro else str(user_id))
         embed = discord.Embed(
-            title="🎊 Vencedor Sorteado",
-            description=f"**Vencedor:** {vencedor.display_name}\n**Participantes:** {len(participantes)}",
+            title="🎊 Vencedor Sorteado" if len(vencedores_ids) == 1 else "🎊 Vencedores Sorteados",
+            description=f"**Vencedor(es):** {', '.join(nomes)}\n**Participantes:** {len(participantes)} ({elegiveis} elegíveis)",
             color=0xffd700
         )
         await ctx.send(embed=embed)
     
     @commands.command(name='encerrarsorteio', aliases=['endgw'])
     @commands.has_permissions(administrator=True)
-    async def encerrar_sorteio(self, ctx):
-        """Encerra o sorteio ativo"""
+    async def encerrar_sorteio(self, ctx, mensagem_id: int = None):
+        """Encerra um sorteio ativo (o mais recente se o ID não for informado)"""
         guild_id = str(ctx.guild.id)
         
-        sorteio = await self.get_sorteio(guild_id)
+        sorteio = await self.get_sorteio(guild_id, mensagem_id)
         if not sorteio or not sorteio.get('ativo'):
             embed = discord.Embed(
                 title="❌ Nenhum Sorteio Ativo",
@@ -310,28 +644,35 @@ class Sorteio(commands.Cog):
         
         # Verifica canal de comando
         configs = await self.get_configuracao(guild_id)
-        canal_comando_id = configs.get('canal_comando')
+        if not await self.verificar_canal_comando(ctx, configs):
+            return
         
-        if canal_comando_id and ctx.channel.id != canal_comando_id:
-            canal_comando = self.bot.get_channel(canal_comando_id)
+        # Encerra o sorteio (grava as participações pendentes antes)
+        await self.gravar_participantes()
+        premio = sorteio['premio']
+        canal_sorteio = self.get_canal_sorteio(sorteio, configs)
+        participantes = await self.obter_participantes(sorteio, canal_sorteio)
+        try:
+            encerrado = await self.fechar_sorteio(sorteio, participantes)
+        except Exception as e:
+            print(f"❌ Erro ao encerrar sorteio: {e}")
             embed = discord.Embed(
-                title="❌ Canal Incorreto",
-                description=f"Use este comando no canal {canal_comando.mention if canal_comando else 'configurado'}.",
+                title="❌ Erro",
+                description="Não foi possível encerrar o sorteio agora. Tente novamente em instantes.",
+                color=0xff4444
+            )
+            await ctx.send(embed=embed)
+            return
+        if not encerrado:
+            embed = discord.Embed(
+                title="❌ Nenhum Sorteio Ativo",
+                description="Este sorteio já foi encerrado.",
                 color=0xff4444
             )
             await ctx.send(embed=embed)
             return
-        
-        # Encerra o sorteio
-        premio = sorteio['premio']
-        sorteio['ativo'] = False
-        await self.save_sorteio(guild_id, sorteio)
         
         # Anuncia encerramento no canal do sorteio
-        configs = await self.get_configuracao(guild_id)
-        canal_sorteio_id = configs.get('canal_sorteio')
-        canal_sorteio = self.bot.get_channel(canal_sorteio_id)
-        
         if canal_sorteio:
             embed_encerrado = discord.Embed(
                 title="🔒 Sorteio Encerrado",
@@ -348,6 +689,34 @@ class Sorteio(commands.Cog):
         )
         await ctx.send(embed=embed)
     
+    @commands.command(name='sorteios', aliases=['gwlist'])
+    @commands.has_permissions(administrator=True)
+    async def listar_sorteios(self, ctx):
+        """Lista os sorteios ativos do servidor"""
+        sorteios = await self.get_sorteios_ativos(ctx.guild.id)
+        if not sorteios:
+            embed = discord.Embed(
+                title="🎁 Sorteios Ativos",
+                description="Não há sorteio em andamento.\nUse `!comecarsorteio <prêmio>` para iniciar um.",
+                color=0xffaa00
+            )
+            await ctx.send(embed=embed)
+            return
+        
+        embed = discord.Embed(title="🎁 Sorteios Ativos", color=0x9966ff)
+        for sorteio in sorteios:
+            mensagem_id = sorteio.get('mensagem_id')
+            participantes = self.participantes.get(mensagem_id, sorteio.get('participantes', []))
+            ends_at = sorteio.get('ends_at')
+            termina = f"<t:{int(ends_at.timestamp())}:R>" if ends_at else "manual"
+            valor = f"🆔 `{mensagem_id}` | 🏆 {sorteio.get('vencedores', 1)} | 👥 {len(participantes)} | ⏰ {termina}"
+            requisitos = self.descrever_requisitos(sorteio)
+            if requisitos:
+                valor += f"\n📋 {requisitos}"
+            embed.add_field(name=sorteio['premio'][:256], value=valor, inline=False)
+        embed.set_footer(text=f"Use o ID com !vencedor ou !encerrarsorteio • {len(sorteios)} sorteios")
+        await ctx.send(embed=embed)
+    
     @commands.command(name='canaldecomando', aliases=['cmdchannel'])
     @commands.has_permissions(administrator=True)
     async def canal_comando(self, ctx, canal: discord.TextChannel):
@@ -406,12 +775,12 @@ class Sorteio(commands.Cog):
                 color=0xff4444
             )
             await ctx.send(embed=embed)
-
+    
     async def cog_unload(self):
-        """Fecha a conexão com MongoDB quando o cog é descarregado"""
-        if self.client:
-            self.client.close()
-            print("🔌 Conexão com MongoDB (Sorteios) fechada")
+        """Para o agendador e a gravação periódica e salva as participações pendentes"""
+        self.fim_scheduler.stop()
+        self.flush_participantes.cancel()
+        await self.gravar_participantes()
 
 async def setup(bot):
     await bot.add_cog(Sorteio(bot))
\ No newline at end of file
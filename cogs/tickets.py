@@ -1,8 +1,6 @@
 import discord
 from discord.ext import commands
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
 
 class TicketSystem(commands.Cog):
     def __init__(self, bot):
@@ -15,29 +13,19 @@ class TicketSystem(commands.Cog):
         self.bot.loop.create_task(self.init_database())
 
     async def init_database(self):
-        """Inicializa a conexão com MongoDB"""
+        """Inicializa as coleções usando a conexão compartilhada do bot"""
         try:
-            # URL de conexão do MongoDB (vem de variável de ambiente)
-            mongo_uri = os.getenv("MONGO_URI")
-            
-            if not mongo_uri:
-                print("❌ MONGO_URI não encontrada nas variáveis de ambiente!")
+            # Pool de conexões único, criado em main.CustomBot
+            if not await self.bot.database.ensure_connection():
                 return
             
-            print("🔄 Conectando ao MongoDB...")
-            self.client = AsyncIOMotorClient(mongo_uri)
-            
-            # Testa a conexão
-            await self.client.admin.command('ping')
-            
-            self.db = self.client['discord_bot']
+            self.client = self.bot.database.client
+            self.db = self.bot.database.db
             self.collection = self.db['ticket_config']
             self._connection_ready = True
             
-            print("✅ Conectado ao MongoDB com sucesso!")
-            
         except Exception as e:
-            print(f"❌ Erro ao conectar com MongoDB: {e}")
+            print(f"❌ Erro ao inicializar MongoDB: {e}")
             self._connection_ready = False
 
     async def ensure_connection(self):
@@ -47,19 +35,23 @@ class TicketSystem(commands.Cog):
         return self._connection_ready
 
     async def get_guild_config(self, guild_id):
-        """Obtém a configuração de um servidor específico do MongoDB"""
+        """Obtém a configuração de um servidor específico (cache compartilhado com invalidação no save)"""
         try:
-            if not await self.ensure_connection():
-                print("❌ Conexão com MongoDB não está disponível")
-                return {}
-                
-            config = await self.collection.find_one({"guild_id": str(guild_id)})
-            return config.get('config', {}) if config else {}
-            
+            return await self.bot.database.config_cache.get(
+                'ticket_config', guild_id, lambda: self.load_guild_config(guild_id)
+            )
         except Exception as e:
             print(f"❌ Erro ao buscar configuração: {e}")
             return {}
 
+    async def load_guild_config(self, guild_id):
+        """Carrega a configuração de um servidor específico do MongoDB"""
+        if not await self.ensure_connection():
+            raise ConnectionError("Conexão com MongoDB não está disponível")
+            
+        config = await self.collection.find_one({"guild_id": str(guild_id)})
+        return config.get('config', {}) if config else {}
+
     async def set_guild_config(self, guild_id, key, value):
         """Define uma configuração para um servidor específico no MongoDB"""
         try:
@@ -77,10 +69,16 @@ class TicketSystem(commands.Cog):
             )
             
             print(f"✅ Configuração salva: {key} = {value} para guild {guild_id}")
+            
+            # Write-through: atualiza a entrada em cache, se existir
+            cached = self.bot.database.config_cache.peek('ticket_config', guild_id)
+            if cached is not None:
+                cached[key] = value
             return True
                 
         except Exception as e:
             print(f"❌ Erro ao salvar configuração: {e}")
+            self.bot.database.config_cache.invalidate('ticket_config', guild_id)
             return False
 
     @commands.command(name='ticket')
@@ -281,11 +279,5 @@ class TicketSystem(commands.Cog):
 
         await ctx.send(embed=embed)
 
-    async def cog_unload(self):
-        """Fecha a conexão com MongoDB quando o cog é descarregado"""
-        if self.client:
-            self.client.close()
-            print("🔌 Conexão com MongoDB fechada")
-
 async def setup(bot):
     await bot.add_cog(TicketSystem(bot))
\ No newline at end of file
@@ -1,15 +1,17 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 import asyncio
 from datetime import datetime, timedelta
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
 import logging
+from utils.scheduler import DeadlineScheduler
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Nova tentativa (segundos) para expirações que falharam
+VIP_EXPIRY_RETRY_SECONDS = 60
+
 class VIPSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -19,26 +21,25 @@ class VIPSystem(commands.Cog):
         self.config_collection = None
         self._connection_ready = False
         
+        # Índice em memória guild_id -> {user_id: expiry}: fonte única para XP/Economia
+        self.vip_index = {}
+        
+        # Prazos de expiração em um heap: cada VIP expira no momento certo
+        self.expiry_scheduler = DeadlineScheduler(self.expire_vips, name="agendador de VIPs")
+        self.expiry_scheduler.start()
+        
         # Inicializa a conexão com MongoDB
         self.bot.loop.create_task(self.init_database())
         
     async def init_database(self):
-        """Inicializa a conexão com MongoDB"""
+        """Inicializa as coleções usando a conexão compartilhada do bot"""
         try:
-            # URL de conexão do MongoDB (vem de variável de ambiente)
-            mongo_uri = os.getenv("MONGO_URI")
-            
-            if not mongo_uri:
-                print("❌ MONGO_URI não encontrada nas variáveis de ambiente!")
+            # Pool de conexões único, criado em main.CustomBot
+            if not await self.bot.database.ensure_connection():
                 return
             
-            print("🔄 Conectando ao MongoDB (VIP System)...")
-            self.client = AsyncIOMotorClient(mongo_uri)
-            
-            # Testa a conexão
-            await self.client.admin.command('ping')
-            
-            self.db = self.client['discord_bot']
+            self.client = self.bot.database.client
+            self.db = self.bot.database.db
             self.vip_collection = self.db['vip_data']
             self.config_collection = self.db['vip_config']
             self._connection_ready = True
@@ -48,9 +49,8 @@ class VIPSystem(commands.Cog):
             # Cria índices para melhor performance
             await self.create_indexes()
             
-            # Inicia loop de verificação
-            if not self.check_vip_expiry.is_running():
-                self.check_vip_expiry.start()
+            # Carrega o índice VIP e agenda as expirações
+            await self.load_vip_index()
             
         except Exception as e:
             print(f"❌ Erro ao conectar VIP System com MongoDB: {e}")
@@ -85,6 +85,55 @@ class VIPSystem(commands.Cog):
         except Exception as e:
             print(f"📊 Erro ao criar índices VIP: {e}")
 
+    async def load_vip_index(self):
+        """Carrega os VIPs (ordenados pelo índice em expiry) no índice em memória e no agendador"""
+        try:
+            count = 0
+            cursor = self.vip_collection.find(
+                {}, {"_id": 0, "user_id": 1, "guild_id": 1, "expiry": 1}
+            ).sort("expiry", 1)
+            async for vip_data in cursor:
+                self.index_vip(vip_data['guild_id'], vip_data['user_id'], vip_data['expiry'])
+                count += 1
+            print(f"👑 {count} VIPs carregados no índice")
+        except Exception as e:
+            print(f"❌ Erro ao carregar índice VIP: {e}")
+
+    def index_vip(self, guild_id, user_id, expiry):
+        """Registra o VIP no índice em memória e agenda a expiração"""
+        guild_id, user_id = str(guild_id), str(user_id)
+        self.vip_index.setdefault(guild_id, {})[user_id] = expiry
+        self.expiry_scheduler.schedule((guild_id, user_id), expiry)
+
+    def unindex_vip(self, guild_id, user_id):
+        """Remove o VIP do índice em memória e cancela a expiração"""
+        guild_id, user_id = str(guild_id), str(user_id)
+        guild_vips = self.vip_index.get(guild_id)
+        if guild_vips is not None:
+            guild_vips.pop(user_id, None)
+            if not guild_vips:
+                del self.vip_index[guild_id]
+        self.expiry_scheduler.cancel((guild_id, user_id))
+
+    def get_vip_expiry(self, user_id, guild_id):
+        """Retorna a expiração do VIP ativo (consulta O(1) em memória), ou None"""
+        expiry = self.vip_index.get(str(guild_id), {}).get(str(user_id))
+        if expiry is not None and datetime.now() < expiry:
+            return expiry
+        return None
+
+    def get_active_vips(self, guild_id):
+        """Retorna o set de user_ids (str) com VIP ativo no servidor, sem acessar o banco"""
+        now = datetime.now()
+        return {
+            user_id for user_id, expiry in self.vip_index.get(str(guild_id), {}).items()
+            if now < expiry
+        }
+
+    def is_vip_cached(self, user_id, guild_id):
+        """Verifica se um usuário é VIP sem acessar o banco"""
+        return self.get_vip_expiry(user_id, guild_id) is not None
+
     async def get_vip_data(self, user_id, guild_id):
         """Obtém dados VIP de um usuário do MongoDB"""
         try:
@@ -126,6 +175,7 @@ class VIPSystem(commands.Cog):
                 upsert=True
             )
             
+            self.index_vip(guild_id, user_id, expiry)
             print(f"✅ VIP salvo: User {user_id} - Guild {guild_id}")
             return True
                 
@@ -144,6 +194,8 @@ class VIPSystem(commands.Cog):
                 "user_id": str(user_id),
                 "guild_id": str(guild_id)
             })
+            # Só depois do delete: se ele falhar, o índice continua igual ao banco
+            self.unindex_vip(guild_id, user_id)
             
             if result.deleted_count > 0:
                 print(f"✅ VIP removido: User {user_id} - Guild {guild_id}")
@@ -157,27 +209,31 @@ class VIPSystem(commands.Cog):
             return False
 
     async def get_vip_config(self, guild_id):
-        """Obtém configurações VIP do servidor do MongoDB"""
+        """Obtém configurações VIP do servidor (cache compartilhado com invalidação no save)"""
         try:
-            if not await self.ensure_connection():
-                print("❌ Conexão com MongoDB não está disponível")
-                return self.get_default_config(guild_id)
-                
-            config = await self.config_collection.find_one({"guild_id": str(guild_id)})
-            
-            if not config:
-                # Configuração padrão
-                default_config = self.get_default_config(guild_id)
-                await self.save_vip_config(guild_id, default_config)
-                print(f"📋 Configuração VIP padrão criada para Guild {guild_id}")
-                return default_config
-                
-            return config
-            
+            return await self.bot.database.config_cache.get(
+                'vip_config', guild_id, lambda: self.load_vip_config(guild_id)
+            )
         except Exception as e:
             print(f"❌ Erro ao buscar configuração VIP: {e}")
             return self.get_default_config(guild_id)
 
+    async def load_vip_config(self, guild_id):
+        """Carrega as configurações VIP do servidor do MongoDB"""
+        if not await self.ensure_connection():
+            raise ConnectionError("Conexão com MongoDB não está disponível")
+            
+        config = await self.config_collection.find_one({"guild_id": str(guild_id)})
+        
+        if not config:
+            # Configuração padrão
+            default_config = self.get_default_config(guild_id)
+            await self.save_vip_config(guild_id, default_config)
+            print(f"📋 Configuração VIP padrão criada para Guild {guild_id}")
+            return default_config
+            
+        return config
+
     def get_default_config(self, guild_id):
         """Retorna configuração padrão"""
         return {
@@ -209,10 +265,12 @@ class VIPSystem(commands.Cog):
             )
             
             print(f"✅ Configuração VIP salva para Guild {guild_id}")
+            self.bot.database.config_cache.set('vip_config', guild_id, config_data)
             return True
                 
         except Exception as e:
             print(f"❌ Erro ao salvar configuração VIP: {e}")
+            self.bot.database.config_cache.invalidate('vip_config', guild_id)
             return False
 
     async def get_vip_role(self, guild):
@@ -225,11 +283,7 @@ class VIPSystem(commands.Cog):
 
     async def is_vip(self, user_id, guild_id):
         """Verifica se um usuário é VIP"""
-        vip_data = await self.get_vip_data(user_id, guild_id)
-        if vip_data:
-            expiry_date = vip_data['expiry']
-            return datetime.now() < expiry_date
-        return False
+        return self.is_vip_cached(user_id, guild_id)
 
     async def get_vip_multiplier(self, guild_id, type_bonus="xp"):
         """Obtém multiplicador VIP para XP, economia, etc."""
@@ -275,6 +329,7 @@ class VIPSystem(commands.Cog):
                     color=discord.Color.red()
                 )
                 self._connection_ready = False
+                self.bot.database.mark_unavailable()
         else:
             embed = discord.Embed(
                 title="❌ Banco de Dados VIP Desconectado",
@@ -516,10 +571,9 @@ class VIPSystem(commands.Cog):
         if not member:
             member = ctx.author
             
-        vip_data = await self.get_vip_data(member.id, ctx.guild.id)
+        expiry = self.get_vip_expiry(member.id, ctx.guild.id)
         
-        if vip_data and datetime.now() < vip_data['expiry']:
-            expiry = vip_data['expiry']
+        if expiry:
             days_left = (expiry - datetime.now()).days
             hours_left = (expiry - datetime.now()).seconds // 3600
             
@@ -540,48 +594,94 @@ class VIPSystem(commands.Cog):
         
         await ctx.send(embed=embed)
 
-    @tasks.loop(hours=1)
-    async def check_vip_expiry(self):
-        """Verifica VIPs expirados a cada hora"""
-        try:
-            if not self._connection_ready:
-                return
-                
-            # Busca VIPs expirados no MongoDB
-            expired_vips = []
-            cursor = self.vip_collection.find({
-                "expiry": {"$lte": datetime.now()}
-            })
-            
-            async for vip_data in cursor:
-                expired_vips.append(vip_data)
-                
-                # Remove cargo VIP se possível
-                try:
-                    guild = self.bot.get_guild(int(vip_data['guild_id']))
-                    if guild:
-                        member = guild.get_member(int(vip_data['user_id']))
-                        vip_role = await self.get_vip_role(guild)
-                        
-                        if member and vip_role and vip_role in member.roles:
-                            await member.remove_roles(vip_role)
-                            print(f"Cargo VIP removido de {member.name} (expirado)")
-                except:
-                    pass  # Ignora erros de permissão
-            
-            # Remove VIPs expirados do MongoDB
-            if expired_vips:
-                result = await self.vip_collection.delete_many({
-                    "expiry": {"$lte": datetime.now()}
-                })
-                print(f"Removidos {result.deleted_count} VIPs expirados")
-                
-        except Exception as e:
-            print(f"❌ Erro ao verificar VIPs expirados: {e}")
+    def retry_expiry(self, keys):
+        """Reagenda chaves que o agendador já entregou, mas não foram processadas"""
+        retry_at = datetime.now() + timedelta(seconds=VIP_EXPIRY_RETRY_SECONDS)
+        for key in keys:
+            self.expiry_scheduler.schedule(key, retry_at)
 
-    @check_vip_expiry.before_loop
-    async def before_check_vip_expiry(self):
+    async def expire_vips(self, keys):
+        """Remove os VIPs vencidos (chamado pelo agendador com as chaves (guild_id, user_id))"""
         await self.bot.wait_until_ready()
+        if not await self.ensure_connection():
+            self.retry_expiry(keys)
+            return
+        
+        now = datetime.now()
+        by_guild = {}
+        for guild_id, user_id in keys:
+            by_guild.setdefault(guild_id, []).append(user_id)
+        
+        for guild_id, user_ids in by_guild.items():
+            try:
+                await self.expire_guild_vips(guild_id, user_ids, now)
+            except Exception as e:
+                print(f"❌ Erro ao remover VIPs expirados: {e}")
+                self.retry_expiry([(guild_id, user_id) for user_id in user_ids])
+
+    async def expire_guild_vips(self, guild_id, user_ids, now):
+        """Expira os VIPs vencidos de um servidor e sincroniza o índice com o banco"""
+        # Estado atual no banco das chaves vencidas em memória
+        cursor = self.vip_collection.find(
+            {"guild_id": guild_id, "user_id": {"$in": user_ids}},
+            {"_id": 1, "user_id": 1, "expiry": 1}
+        )
+        documents = await cursor.to_list(length=None)
+        expired_vips = [vip_data for vip_data in documents if vip_data['expiry'] <= now]
+        
+        # VIP renovado no meio tempo segue agendado pelo prazo do banco; sem
+        # documento, a entrada do índice estava obsoleta
+        found = set()
+        for vip_data in documents:
+            found.add(vip_data['user_id'])
+            if vip_data['expiry'] > now:
+                self.index_vip(guild_id, vip_data['user_id'], vip_data['expiry'])
+        for user_id in user_ids:
+            if user_id not in found:
+                self.unindex_vip(guild_id, user_id)
+        
+        if not expired_vips:
+            return
+        
+        # Remove cargo VIP (um lookup de configuração por servidor)
+        guild = self.bot.get_guild(int(guild_id))
+        vip_role = await self.get_vip_role(guild) if guild else None
+        if vip_role:
+            for vip_data in expired_vips:
+                member = guild.get_member(int(vip_data['user_id']))
+                if member and vip_role in member.roles:
+                    try:
+                        await member.remove_roles(vip_role, reason="VIP expirado")
+                        print(f"Cargo VIP removido de {member.name} (expirado)")
+                    except:
+                        pass  # Ignora erros de permissão
+        
+        # Remove exatamente os documentos processados
+        expired_ids = [vip_data['_id'] for vip_data in expired_vips]
+        result = await self.vip_collection.delete_many({
+            "_id": {"$in": expired_ids},
+            "expiry": {"$lte": now}
+        })
+        
+        # Tira do índice só o que saiu do banco (um VIP renovado entre a
+        # consulta e o delete continua)
+        removed = expired_vips
+        if result.deleted_count < len(expired_vips):
+            remaining = await self.vip_collection.find(
+                {"_id": {"$in": expired_ids}},
+                {"_id": 1, "user_id": 1, "expiry": 1}
+            ).to_list(length=None)
+            remaining_ids = {vip_data['_id'] for vip_data in remaining}
+            removed = [vip_data for vip_data in expired_vips if vip_data['_id'] not in remaining_ids]
+            for vip_data in remaining:
+                if vip_data['expiry'] > now:
+                    self.index_vip(guild_id, vip_data['user_id'], vip_data['expiry'])
+                else:
+                    self.retry_expiry([(guild_id, vip_data['user_id'])])
+        
+        for vip_data in removed:
+            self.unindex_vip(guild_id, vip_data['user_id'])
+        print(f"Removidos {result.deleted_count} VIPs expirados (Guild {guild_id})")
 
     # Métodos auxiliares para outros sistemas usarem
     async def apply_vip_bonus_xp(self, user_id, guild_id, base_xp):
@@ -636,12 +736,7 @@ class VIPSystem(commands.Cog):
 
     async def cog_unload(self):
         """Cleanup quando o cog é descarregado"""
-        if self.check_vip_expiry.is_running():
-            self.check_vip_expiry.cancel()
-        
-        if self.client:
-            self.client.close()
-            print("🔌 Conexão VIP System com MongoDB fechada")
+        self.expiry_scheduler.stop()
 
 async def setup(bot):
     await bot.add_cog(VIPSystem(bot))
\ No newline at end of file
@@ -1,8 +1,6 @@
 import discord
 from discord.ext import commands
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
 import logging
 
 class WelcomeSystem(commands.Cog):
@@ -16,29 +14,19 @@ class WelcomeSystem(commands.Cog):
         self.bot.loop.create_task(self.init_database())
 
     async def init_database(self):
-        """Inicializa a conexão com MongoDB"""
+        """Inicializa as coleções usando a conexão compartilhada do bot"""
         try:
-            # URL de conexão do MongoDB (vem de variável de ambiente)
-            mongo_uri = os.getenv("MONGO_URI")
-            
-            if not mongo_uri:
-                print("❌ MONGO_URI não encontrada nas variáveis de ambiente!")
+            # Pool de conexões único, criado em main.CustomBot
+            if not await self.bot.database.ensure_connection():
                 return
             
-            print("🔄 Conectando ao MongoDB...")
-            self.client = AsyncIOMotorClient(mongo_uri)
-            
-            # Testa a conexão
-            await self.client.admin.command('ping')
-            
-            self.db = self.client['discord_bot']
+            self.client = self.bot.database.client
+            self.db = self.bot.database.db
             self.collection = self.db['welcome_config']
             self._connection_ready = True
             
-            print("✅ Conectado ao MongoDB com sucesso!")
-            
         except Exception as e:
-            print(f"❌ Erro ao conectar com MongoDB: {e}")
+            print(f"❌ Erro ao inicializar MongoDB: {e}")
             self._connection_ready = False
 
     async def ensure_connection(self):
@@ -48,19 +36,23 @@ class WelcomeSystem(commands.Cog):
         return self._connection_ready
 
     async def get_guild_config(self, guild_id):
-        """Obtém a configuração de um servidor específico do MongoDB"""
+        """Obtém a configuração de um servidor específico (cache compartilhado com invalidação no save)"""
         try:
-            if not await self.ensure_connection():
-                print("❌ Conexão com MongoDB não está disponível")
-                return {}
-                
-            config = await self.collection.find_one({"guild_id": str(guild_id)})
-            return config.get('config', {}) if config else {}
-            
+            return await self.bot.database.config_cache.get(
+                'welcome_config', guild_id, lambda: self.load_guild_config(guild_id)
+            )
         except Exception as e:
             print(f"❌ Erro ao buscar configuração: {e}")
             return {}
 
+    async def load_guild_config(self, guild_id):
+        """Carrega a configuração de um servidor específico do MongoDB"""
+        if not await self.ensure_connection():
+            raise ConnectionError("Conexão com MongoDB não está disponível")
+            
+        config = await self.collection.find_one({"guild_id": str(guild_id)})
+        return config.get('config', {}) if config else {}
+
     async def set_guild_config(self, guild_id, key, value):
         """Define uma configuração para um servidor específico no MongoDB"""
         try:
@@ -78,10 +70,16 @@ class WelcomeSystem(commands.Cog):
             )
             
             print(f"✅ Configuração salva: {key} = {value} para guild {guild_id}")
+            
+            # Write-through: atualiza a entrada em cache, se existir
+            cached = self.bot.database.config_cache.peek('welcome_config', guild_id)
+            if cached is not None:
+                cached[key] = value
             return True
                 
         except Exception as e:
             print(f"❌ Erro ao salvar configuração: {e}")
+            self.bot.database.config_cache.invalidate('welcome_config', guild_id)
             return False
 
     @commands.command(name='canalconfig')
@@ -536,6 +534,7 @@ class WelcomeSystem(commands.Cog):
                     color=discord.Color.red()
                 )
                 self._connection_ready = False
+                self.bot.database.mark_unavailable()
         else:
             embed = discord.Embed(
                 title="❌ Banco de Dados Desconectado",
@@ -547,11 +546,5 @@ class WelcomeSystem(commands.Cog):
             
         await ctx.send(embed=embed)
 
-    async def cog_unload(self):
-        """Fecha a conexão com MongoDB quando o cog é descarregado"""
-        if self.client:
-            self.client.close()
-            print("🔌 Conexão com MongoDB fechada")
-
 async def setup(bot):
     await bot.add_cog(WelcomeSystem(bot))
\ No newline at end of file
@@ -1,33 +1,75 @@
 import discord
 from discord.ext import commands, tasks
 import asyncio
+import copy
 from datetime import datetime, timedelta
 import math
 import random
-import os
-from motor.motor_asyncio import AsyncIOMotorClient
+import time
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from utils.cache import MISSING
+from utils.locks import SingleFlight
+
+# Intervalo (segundos) entre gravações em lote do ledger de XP
+XP_FLUSH_INTERVAL = 15
+
+# Snapshot do !topxp: top N membros por servidor, atualizado periodicamente
+LEADERBOARD_SIZE = 100
+LEADERBOARD_PAGE_SIZE = 10
+LEADERBOARD_REFRESH_INTERVAL = 60
+# Snapshots não consultados por esse tempo (segundos) são descartados
+LEADERBOARD_IDLE_TIMEOUT = 600
 
 class XPSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.message_cooldowns = {}
         
-        # Configuração do MongoDB usando variável de ambiente
-        mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
-        self.mongo_client = AsyncIOMotorClient(mongo_uri)
-        self.db = self.mongo_client['discord_bot']
-        self.xp_collection = self.db['xp_data']
-        self.config_collection = self.db['xp_config']
+        # Ledger de XP em memória (write-behind): user_key -> deltas pendentes
+        self.xp_ledger = {}
+        # Ledgers sendo gravados agora (o total deles ainda não está no banco)
+        self.flushing_ledgers = []
+        # Snapshots do ranking por guild_id
+        self.leaderboards = {}
+        # Leituras simultâneas do mesmo user_key viram uma única consulta
+        self.user_reads = SingleFlight()
+        
+        # Conexão MongoDB compartilhada (pool único criado em main.CustomBot);
+        # as coleções só existem depois de ensure_connection (sem URI, db é None)
+        self.mongo_client = None
+        self.db = None
+        self.xp_collection = None
+        self.config_collection = None
         
         # Verificar conexão no startup
         self.bot.loop.create_task(self.test_db_connection())
+        self.flush_xp_ledger.start()
+        self.refresh_leaderboards.start()
+
+    async def ensure_connection(self):
+        """Garante que a conexão compartilhada está ativa e prepara as coleções"""
+        # O ping é feito uma única vez pela camada compartilhada
+        if not await self.bot.database.ensure_connection():
+            return False
+        
+        if self.xp_collection is None:
+            self.mongo_client = self.bot.database.client
+            self.db = self.bot.database.db
+            self.xp_collection = self.db['xp_data']
+            self.config_collection = self.db['xp_config']
+        return True
 
     async def test_db_connection(self):
         """Testa a conexão com o banco de dados"""
         try:
-            # Tenta fazer uma operação simples para verificar a conexão
-            await self.mongo_client.admin.command('ping')
-            print("✅ Conexão com MongoDB estabelecida com sucesso!")
+            if not await self.ensure_connection():
+                return
+            
+            # Índice do ranking: páginas do !topxp sem ordenar em memória
+            await self.xp_collection.create_index([('guild_id', 1), ('xp', -1)])
+            # Consultas em lote por membros do servidor (ex.: requisitos de sorteio)
+            await self.xp_collection.create_index([('guild_id', 1), ('user_id', 1)])
             
             # Lista as coleções existentes
             collections = await self.db.list_collection_names()
@@ -37,29 +79,12 @@ class XPSystem(commands.Cog):
             print(f"❌ Erro ao conectar com MongoDB: {e}")
 
     async def get_guild_config(self, guild_id):
-        """Obtém configuração da guild"""
+        """Obtém configuração da guild (cache compartilhado com invalidação no save)"""
         guild_id = str(guild_id)
         try:
-            config = await self.config_collection.find_one({'guild_id': guild_id})
-            
-            if not config:
-                default_config = {
-                    'guild_id': guild_id,
-                    'base_xp': 15,
-                    'xp_per_message': 25,
-                    'xp_per_level': 100,
-                    'cooldown': 60,
-                    'vip_cooldown': 30,
-                    'vip_multiplier': 2.0,
-                    'created_at': datetime.now().isoformat(),
-                    'updated_at': datetime.now().isoformat()
-                }
-                await self.config_collection.insert_one(default_config)
-                print(f"🆕 Configuração padrão criada para guild {guild_id}")
-                return default_config
-            
-            return config
-            
+            return await self.bot.database.config_cache.get(
+                'xp_config', guild_id, lambda: self.load_guild_config(guild_id)
+            )
         except Exception as e:
             print(f"❌ Erro ao buscar config da guild {guild_id}: {e}")
             # Retorna config padrão em caso de erro
@@ -73,10 +98,37 @@ class XPSystem(commands.Cog):
                 'vip_multiplier': 2.0
             }
 
+    async def load_guild_config(self, guild_id):
+        """Carrega a configuração da guild do banco, criando a padrão se não existir"""
+        if not await self.ensure_connection():
+            raise ConnectionError("Conexão com MongoDB não está disponível")
+        
+        config = await self.config_collection.find_one({'guild_id': guild_id})
+        
+        if not config:
+            default_config = {
+                'guild_id': guild_id,
+                'base_xp': 15,
+                'xp_per_message': 25,
+                'xp_per_level': 100,
+                'cooldown': 60,
+                'vip_cooldown': 30,
+                'vip_multiplier': 2.0,
+                'created_at': datetime.now().isoformat(),
+                'updated_at': datetime.now().isoformat()
+            }
+            await self.config_collection.insert_one(default_config)
+            print(f"🆕 Configuração padrão criada para guild {guild_id}")
+            return default_config
+        
+        return config
+
     async def save_guild_config(self, guild_id, config):
         """Salva configuração da guild"""
         guild_id = str(guild_id)
         try:
+            if not await self.ensure_connection():
+                raise ConnectionError("Conexão com MongoDB não está disponível")
             config['updated_at'] = datetime.now().isoformat()
             result = await self.config_collection.update_one(
                 {'guild_id': guild_id},
@@ -89,53 +141,58 @@ class XPSystem(commands.Cog):
             elif result.modified_count > 0:
                 print(f"✏️ Configuração atualizada para guild {guild_id}")
             
+            self.bot.database.config_cache.set('xp_config', guild_id, config)
             return True
             
         except Exception as e:
             print(f"❌ Erro ao salvar config da guild {guild_id}: {e}")
+            self.bot.database.config_cache.invalidate('xp_config', guild_id)
             return False
 
     async def get_user_data(self, user_id, guild_id):
-        """Obtém dados do usuário"""
+        """Obtém dados do usuário (cache LRU compartilhado; leituras simultâneas viram uma só)"""
         user_key = f"{guild_id}_{user_id}"
+        user_data = self.bot.database.profiles.get('xp_data', user_key)
+        if user_data is MISSING:
+            user_data = await self.user_reads.do(('data', user_key), lambda: self.load_user_data(user_key))
+        
+        if user_data is None:
+            # Sem documento: dados padrão em memória, criado no primeiro flush de XP
+            return self.get_default_user_data(user_id, guild_id)
+        return copy.deepcopy(user_data)
+
+    async def load_user_data(self, user_key):
+        """Busca o usuário no MongoDB e guarda no cache (None = usuário sem documento)"""
         try:
+            if not await self.ensure_connection():
+                raise ConnectionError("Conexão com MongoDB não está disponível")
             user_data = await self.xp_collection.find_one({'user_key': user_key})
-            
-            if not user_data:
-                default_data = {
-                    'user_key': user_key,
-                    'user_id': str(user_id),
-                    'guild_id': str(guild_id),
-                    'xp': 0,
-                    'level': 1,
-                    'messages': 0,
-                    'last_message': None,
-                    'created_at': datetime.now().isoformat(),
-                    'updated_at': datetime.now().isoformat()
-                }
-                await self.xp_collection.insert_one(default_data)
-                print(f"🆕 Dados de XP criados para usuário {user_id} na guild {guild_id}")
-                return default_data
-            
+            self.bot.database.profiles.set('xp_data', user_key, user_data)
             return user_data
-            
         except Exception as e:
-            print(f"❌ Erro ao buscar dados do usuário {user_id}: {e}")
-            # Retorna dados padrão em caso de erro
-            return {
-                'user_key': user_key,
-                'user_id': str(user_id),
-                'guild_id': str(guild_id),
-                'xp': 0,
-                'level': 1,
-                'messages': 0,
-                'last_message': None
-            }
+            print(f"❌ Erro ao buscar dados do usuário {user_key}: {e}")
+            return None
+
+    def get_default_user_data(self, user_id, guild_id):
+        """Retorna dados padrão do usuário (não gravados no banco)"""
+        return {
+            'user_key': f"{guild_id}_{user_id}",
+            'user_id': str(user_id),
+            'guild_id': str(guild_id),
+            'xp': 0,
+            'level': 1,
+            'messages': 0,
+            'last_message': None
+        }
 
     async def save_user_data(self, user_id, guild_id, data):
         """Salva dados do usuário"""
         user_key = f"{guild_id}_{user_id}"
+        self.bot.database.profiles.invalidate('xp_data', user_key)
+        self.bot.database.profiles.invalidate('xp_totals', user_key)
         try:
+            if not await self.ensure_connection():
+                raise ConnectionError("Conexão com MongoDB não está disponível")
             data['updated_at'] = datetime.now().isoformat()
             result = await self.xp_collection.update_one(
                 {'user_key': user_key},
@@ -154,6 +211,262 @@ class XPSystem(commands.Cog):
             print(f"❌ Erro ao salvar dados do usuário {user_id}: {e}")
             return False
 
+    def get_cached_totals(self, user_key):
+        """Total em memória: do ledger pendente (fixo até o flush) ou do cache LRU"""
+        # XP/level total por usuário, para detectar level up sem ir ao banco:
+        # fica na entrada do ledger enquanto há deltas pendentes e, depois do
+        # flush, no cache LRU compartilhado (coleção 'xp_totals'), onde pode
+        # ser descartado porque o banco já tem o valor
+        entry = self.xp_ledger.get(user_key)
+        if entry is not None:
+            return entry['totals']
+        for ledger in self.flushing_ledgers:
+            entry = ledger.get(user_key)
+            if entry is not None:
+                return entry['totals']
+        totals = self.bot.database.profiles.get('xp_totals', user_key)
+        return None if totals is MISSING else totals
+
+    async def get_xp_totals(self, user_id, guild_id):
+        """Obtém o XP total do usuário mantido em memória (carrega do banco se não estiver)"""
+        user_key = f"{guild_id}_{user_id}"
+        totals = self.get_cached_totals(user_key)
+        if totals is not None:
+            return totals
+        
+        try:
+            if not await self.ensure_connection():
+                raise ConnectionError("Conexão com MongoDB não está disponível")
+            # Várias mensagens do mesmo usuário antes do cache: uma única consulta
+            data = await self.user_reads.do(
+                ('totals', user_key),
+                lambda: self.xp_collection.find_one({'user_key': user_key}, {'xp': 1, 'level': 1})
+            )
+        except Exception as e:
+            print(f"❌ Erro ao buscar XP do usuário {user_id}: {e}")
+            # Sem cache: o $inc do flush mantém o banco correto mesmo assim
+            return {'xp': 0, 'level': 1}
+        
+        # Outra mensagem pode ter carregado o total enquanto aguardávamos o banco
+        totals = self.get_cached_totals(user_key)
+        if totals is None:
+            totals = {
+                'xp': data.get('xp', 0) if data else 0,
+                'level': data.get('level', 1) if data else 1
+            }
+            self.bot.database.profiles.set('xp_totals', user_key, totals)
+        return totals
+
+    def add_to_ledger(self, user_id, guild_id, xp, level, now, totals):
+        """Acumula os deltas de XP do usuário até o próximo flush (o total fica junto)"""
+        user_key = f"{guild_id}_{user_id}"
+        entry = self.xp_ledger.get(user_key)
+        if entry is None:
+            entry = {
+                'user_id': str(user_id),
+                'guild_id': str(guild_id),
+                'xp': 0,
+                'messages': 0,
+                'last_message': None,
+                'level': level,
+                'totals': totals
+            }
+            self.xp_ledger[user_key] = entry
+        
+        entry['xp'] += xp
+        entry['messages'] += 1
+        entry['last_message'] = now.isoformat()
+        entry['level'] = level
+
+    def apply_pending_xp(self, user_data):
+        """Soma ao documento do banco os deltas ainda não gravados"""
+        entry = self.xp_ledger.get(user_data['user_key'])
+        if entry:
+            user_data['xp'] += entry['xp']
+            user_data['messages'] += entry['messages']
+            user_data['last_message'] = entry['last_message']
+            user_data['level'] = entry['level']
+        return user_data
+
+    async def get_levels(self, guild_id, user_ids):
+        """Níveis de vários usuários do servidor com uma única consulta $in.
+
+        Inclui o XP ainda não gravado; usuários sem documento ficam de fora
+        (nível 1). Erros do banco são propagados para quem chamou.
+        """
+        if not await self.ensure_connection():
+            raise ConnectionError("Conexão com MongoDB não está disponível")
+        
+        guild_id = str(guild_id)
+        user_ids = [str(user_id) for user_id in user_ids]
+        levels = {}
+        cursor = self.xp_collection.find(
+            {'guild_id': guild_id, 'user_id': {'$in': user_ids}},
+            {'_id': 0, 'user_id': 1, 'level': 1}
+        )
+        async for doc in cursor:
+            levels[doc['user_id']] = doc.get('level', 1)
+        
+        for user_id in user_ids:
+            entry = self.xp_ledger.get(f"{guild_id}_{user_id}")
+            if entry:
+                levels[user_id] = entry['level']
+        return levels
+
+    async def flush_xp(self):
+        """Grava o ledger de XP no banco com um único bulk_write"""
+        if not self.xp_ledger:
+            return
+        if not await self.ensure_connection():
+            # Os deltas continuam no ledger até o banco voltar
+            return
+        
+        ledger, self.xp_ledger = self.xp_ledger, {}
+        now = datetime.now().isoformat()
+        keys = list(ledger.keys())
+        operations = [
+            UpdateOne(
+                {'user_key': key},
+                {
+                    '$inc': {'xp': ledger[key]['xp'], 'messages': ledger[key]['messages']},
+                    '$max': {'last_message': ledger[key]['last_message']},
+                    '$set': {'level': ledger[key]['level'], 'updated_at': now},
+                    '$setOnInsert': {
+                        'user_id': ledger[key]['user_id'],
+                        'guild_id': ledger[key]['guild_id'],
+                        'created_at': now
+                    }
+                },
+                upsert=True
+            )
+            for key in keys
+        ]
+        
+        # Enquanto o bulk_write não termina, os totais continuam fixos neste ledger
+        self.flushing_ledgers.append(ledger)
+        try:
+            try:
+                await self.xp_collection.bulk_write(operations, ordered=False)
+                failed = []
+            except BulkWriteError as e:
+                # Só as operações que falharam voltam para o ledger
+                failed = [keys[error['index']] for error in e.details.get('writeErrors', [])]
+                print(f"⚠️ Falha ao gravar XP de {len(failed)} usuário(s), tentando novamente no próximo flush")
+                self.restore_ledger({key: ledger[key] for key in failed})
+            except Exception as e:
+                print(f"❌ Erro ao gravar ledger de XP: {e}")
+                self.restore_ledger(ledger)
+                return
+            
+            failed = set(failed)
+            profiles = self.bot.database.profiles
+            for key in keys:
+                if key not in failed:
+                    self.apply_flush_to_profile(key, ledger[key], now)
+                    # Gravado: o total pode ir para o cache limitado (e ser descartado)
+                    profiles.set('xp_totals', key, ledger[key]['totals'])
+        finally:
+            self.flushing_ledgers.remove(ledger)
+
+    def apply_flush_to_profile(self, user_key, entry, now):
+        """Mantém o perfil em cache igual ao banco depois do flush"""
+        profiles = self.bot.database.profiles
+        cached = profiles.get('xp_data', user_key)
+        if cached is MISSING or cached is None:
+            # Ausente ou cache negativo (o flush acabou de criar o documento)
+            profiles.invalidate('xp_data', user_key)
+            return
+        
+        cached['xp'] = cached.get('xp', 0) + entry['xp']
+        cached['messages'] = cached.get('messages', 0) + entry['messages']
+        if entry['last_message'] and (not cached.get('last_message') or entry['last_message'] > cached['last_message']):
+            cached['last_message'] = entry['last_message']
+        cached['level'] = entry['level']
+        cached['updated_at'] = now
+
+    def restore_ledger(self, ledger):
+        """Devolve deltas não gravados ao ledger atual"""
+        for key, old in ledger.items():
+            entry = self.xp_ledger.get(key)
+            if entry is None:
+                self.xp_ledger[key] = old
+                continue
+            entry['xp'] += old['xp']
+            entry['messages'] += old['messages']
+            if old['last_message'] and (not entry['last_message'] or old['last_message'] > entry['last_message']):
+                entry['last_message'] = old['last_message']
+
+    @tasks.loop(seconds=XP_FLUSH_INTERVAL)
+    async def flush_xp_ledger(self):
+        """Grava periodicamente o XP acumulado em memória"""
+        await self.flush_xp()
+
+    @flush_xp_ledger.before_loop
+    async def before_flush_xp_ledger(self):
+        await self.bot.wait_until_ready()
+
+    async def build_leaderboard(self, guild):
+        """Monta o snapshot do ranking (top N membros atuais) com uma consulta indexada"""
+        if not await self.ensure_connection():
+            raise ConnectionError("Conexão com MongoDB não está disponível")
+        
+        guild_id = str(guild.id)
+        cursor = self.xp_collection.find(
+            {'guild_id': guild_id},
+            {'_id': 0, 'user_id': 1, 'xp': 1, 'level': 1}
+        ).sort('xp', -1).limit(LEADERBOARD_SIZE * 2)
+        
+        # Apenas membros que ainda estão no servidor
+        rows = []
+        async for data in cursor:
+            if guild.get_member(int(data['user_id'])):
+                rows.append(data)
+                if len(rows) >= LEADERBOARD_SIZE:
+                    break
+        
+        total = await self.xp_collection.count_documents({'guild_id': guild_id})
+        previous = self.leaderboards.get(guild_id)
+        snapshot = {
+            'rows': rows,
+            'total': total,
+            'updated_at': datetime.now(),
+            'viewed_at': previous['viewed_at'] if previous else time.monotonic()
+        }
+        self.leaderboards[guild_id] = snapshot
+        return snapshot
+
+    async def get_leaderboard(self, guild):
+        """Retorna o snapshot do ranking, montando na primeira consulta"""
+        snapshot = self.leaderboards.get(str(guild.id))
+        if snapshot is None:
+            # Garante que o XP acumulado em memória entre no ranking
+            await self.flush_xp()
+            snapshot = await self.build_leaderboard(guild)
+        snapshot['viewed_at'] = time.monotonic()
+        return snapshot
+
+    @tasks.loop(seconds=LEADERBOARD_REFRESH_INTERVAL)
+    async def refresh_leaderboards(self):
+        """Atualiza os snapshots de ranking consultados recentemente"""
+        if not self.leaderboards:
+            return
+        
+        await self.flush_xp()
+        now = time.monotonic()
+        for guild_id, snapshot in list(self.leaderboards.items()):
+            guild = self.bot.get_guild(int(guild_id))
+            if guild is None or now - snapshot['viewed_at'] > LEADERBOARD_IDLE_TIMEOUT:
+                del self.leaderboards[guild_id]
+                continue
+            try:
+                await self.build_leaderboard(guild)
+            except Exception as e:
+                print(f"❌ Erro ao atualizar ranking de XP: {e}")
+
+    @refresh_leaderboards.before_loop
+    async def before_refresh_leaderboards(self):
+        await self.bot.wait_until_ready()
+
     def calculate_level(self, xp, xp_per_level):
         """Calcula o nível baseado no XP"""
         return int(math.sqrt(xp / xp_per_level)) + 1
@@ -162,11 +475,11 @@ class XPSystem(commands.Cog):
         """Calcula XP necessário para um nível específico"""
         return ((level - 1) ** 2) * xp_per_level
 
-    async def is_user_vip(self, user_id, guild_id):
-        """Verifica se o usuário é VIP"""
+    def is_user_vip(self, user_id, guild_id):
+        """Verifica se o usuário é VIP (índice em memória do VIPSystem)"""
         vip_cog = self.bot.get_cog('VIPSystem')
         if vip_cog:
-            return await vip_cog.is_vip(user_id, guild_id)
+            return vip_cog.is_vip_cached(user_id, guild_id)
         return False
 
     @commands.Cog.listener()
@@ -184,7 +497,7 @@ class XPSystem(commands.Cog):
         now = datetime.now()
         
         # Cooldown menor para VIPs
-        is_vip = await self.is_user_vip(user_id, guild_id)
+        is_vip = self.is_user_vip(user_id, guild_id)
         cooldown_time = config['vip_cooldown'] if is_vip else config['cooldown']
         
         if cooldown_key in self.message_cooldowns:
@@ -201,22 +514,15 @@ class XPSystem(commands.Cog):
         if is_vip:
             base_xp = int(base_xp * config['vip_multiplier'])
         
-        # Atualizar dados do usuário
-        user_data = await self.get_user_data(user_id, guild_id)
-        old_level = user_data['level']
-        user_data['xp'] += base_xp
-        user_data['messages'] += 1
-        user_data['last_message'] = now.isoformat()
-        
-        new_level = self.calculate_level(user_data['xp'], config['xp_per_level'])
-        user_data['level'] = new_level
+        # Atualizar total em memória (o banco é atualizado em lote por flush_xp_ledger)
+        totals = await self.get_xp_totals(user_id, guild_id)
+        old_level = totals['level']
+        totals['xp'] += base_xp
         
-        # Salvar no banco
-        success = await self.save_user_data(user_id, guild_id, user_data)
+        new_level = self.calculate_level(totals['xp'], config['xp_per_level'])
+        totals['level'] = new_level
         
-        if not success:
-            print(f"⚠️ Falha ao salvar XP para usuário {user_id}")
-            return
+        self.add_to_ledger(user_id, guild_id, base_xp, new_level, now, totals)
         
         # Verificar level up
         if new_level > old_level:
@@ -225,7 +531,7 @@ class XPSystem(commands.Cog):
                 description=f"{message.author.mention} subiu para o **Level {new_level}**!",
                 color=discord.Color.gold()
             )
-            embed.add_field(name="XP Total", value=f"{user_data['xp']:,}", inline=True)
+            embed.add_field(name="XP Total", value=f"{totals['xp']:,}", inline=True)
             embed.add_field(name="XP Ganho", value=f"+{base_xp}", inline=True)
             embed.set_thumbnail(url=message.author.display_avatar.url)
             
@@ -240,14 +546,14 @@ class XPSystem(commands.Cog):
         if not member:
             member = ctx.author
             
-        user_data = await self.get_user_data(member.id, ctx.guild.id)
+        user_data = self.apply_pending_xp(await self.get_user_data(member.id, ctx.guild.id))
         config = await self.get_guild_config(ctx.guild.id)
         
         current_level_xp = self.calculate_xp_for_level(user_data['level'], config['xp_per_level'])
         next_level_xp = self.calculate_xp_for_level(user_data['level'] + 1, config['xp_per_level'])
         xp_needed = next_level_xp - user_data['xp']
         
-        is_vip = await self.is_user_vip(member.id, ctx.guild.id)
+        is_vip = self.is_user_vip(member.id, ctx.guild.id)
         
         embed = discord.Embed(
             title=f"📊 XP de {member.display_name}",
@@ -281,22 +587,10 @@ class XPSystem(commands.Cog):
     async def leaderboard_xp(self, ctx, page: int = 1):
         """Mostra ranking de XP"""
         try:
-            # Buscar todos os usuários do guild ordenados por XP
-            guild_users_cursor = self.xp_collection.find(
-                {'guild_id': str(ctx.guild.id)}
-            ).sort('xp', -1)
-            
-            guild_users_data = await guild_users_cursor.to_list(length=None)
-            
-            # Filtrar apenas membros que ainda estão no servidor
-            guild_users = []
-            for data in guild_users_data:
-                user_id = int(data['user_id'])
-                user = ctx.guild.get_member(user_id)
-                if user:
-                    guild_users.append((user, data))
-            
-            if not guild_users:
+            snapshot = await self.get_leaderboard(ctx.guild)
+            rows = snapshot['rows']
+            
+            if not rows:
                 embed = discord.Embed(
                     title="📊 Top XP",
                     description="Nenhum usuário com XP encontrado!",
@@ -305,8 +599,8 @@ class XPSystem(commands.Cog):
                 await ctx.send(embed=embed)
                 return
             
-            per_page = 10
-            max_pages = math.ceil(len(guild_users) / per_page)
+            per_page = LEADERBOARD_PAGE_SIZE
+            max_pages = math.ceil(len(rows) / per_page)
             if page > max_pages or page < 1:
                 page = 1
             
@@ -320,8 +614,8 @@ class XPSystem(commands.Cog):
             )
             
             leaderboard_text = ""
-            for i, (user, data) in enumerate(guild_users[start:end], start + 1):
-                is_vip = await self.is_user_vip(user.id, ctx.guild.id)
+            for i, data in enumerate(rows[start:end], start + 1):
+                is_vip = self.is_user_vip(data['user_id'], ctx.guild.id)
                 vip_icon = "👑" if is_vip else ""
                 
                 medal = ""
@@ -332,11 +626,11 @@ class XPSystem(commands.Cog):
                 elif i == 3:
                     medal = "🥉"
                 
-                leaderboard_text += f"{medal} **#{i}** {vip_icon} {user.mention}\n"
-                leaderboard_text += f"Level **{data['level']}** • **{data['xp']:,}** XP\n\n"
+                leaderboard_text += f"{medal} **#{i}** {vip_icon} <@{data['user_id']}>\n"
+                leaderboard_text += f"Level **{data.get('level', 1)}** • **{data['xp']:,}** XP\n\n"
             
             embed.description = leaderboard_text
-            embed.set_footer(text=f"👑 = VIP | Página {page}/{max_pages} | Total: {len(guild_users)} usuários")
+            embed.set_footer(text=f"👑 = VIP | Página {page}/{max_pages} | Total: {snapshot['total']} usuários | Atualizado às {snapshot['updated_at'].strftime('%H:%M:%S')}")
             
             await ctx.send(embed=embed)
             
@@ -360,6 +654,9 @@ class XPSystem(commands.Cog):
         )
         
         try:
+            if not await self.ensure_connection():
+                raise ConnectionError("Conexão com MongoDB não está disponível")
+            
             # Teste 1: Ping no banco
             start_time = datetime.now()
             await self.mongo_client.admin.command('ping')
@@ -555,6 +852,8 @@ class XPSystem(commands.Cog):
         
         # Contar usuários ativos
         try:
+            if not await self.ensure_connection():
+                raise ConnectionError("Conexão com MongoDB não está disponível")
             active_users = await self.xp_collection.count_documents({'guild_id': str(ctx.guild.id)})
         except:
             active_users = 0
@@ -635,10 +934,10 @@ class XPSystem(commands.Cog):
             await ctx.send(embed=embed)
 
     async def cog_unload(self):
-        """Cleanup quando o cog é descarregado"""
-        if hasattr(self, 'mongo_client'):
-            self.mongo_client.close()
-            print("🔌 Conexão MongoDB fechada")
+        """Grava o XP pendente quando o cog é descarregado"""
+        self.flush_xp_ledger.cancel()
+        self.refresh_leaderboards.cancel()
+        await self.flush_xp()
 
 async def setup(bot):
     await bot.add_cog(XPSystem(bot))
\ No newline at end of file
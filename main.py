@@ -4,14 +4,13 @@ from discord.ext import commands
 from flask import Flask
 import asyncio
 from dotenv import load_dotenv
-from motor.motor_asyncio import AsyncIOMotorClient  # MongoDB
+from utils.database import Database  # MongoDB (pool compartilhado)
 
 # Carregar variáveis do .env
 load_dotenv()
 
 TOKEN = os.getenv("TOKEN")
 AUTOPING = os.getenv("AUTOPING")
-MONGO_URL = os.getenv("MONGO_URL")  # URL de conexão MongoDB Atlas
 
 # Intents e prefixo
 intents = discord.Intents.all()
@@ -39,8 +38,10 @@ async def auto_ping():
 class CustomBot(commands.Bot):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.db_client = AsyncIOMotorClient(MONGO_URL, tls=True, tlsAllowInvalidCertificates=True)
-        self.db = self.db_client["natanbot"]  # Nome do banco de dados
+        # Pool único de conexões emprestado por todos os cogs
+        self.database = Database()
+        self.db_client = self.database.client
+        self.db = self.database.db
 
     async def setup_hook(self):
         for filename in os.listdir("./cogs"):
@@ -53,6 +54,10 @@ class CustomBot(commands.Bot):
 
         self.loop.create_task(auto_ping())
 
+    async def close(self):
+        await super().close()
+        self.database.close()
+
 # Instância do bot
 bot = CustomBot(command_prefix="!", intents=intents)
 
@@ -0,0 +1,105 @@
+import time
+from collections import OrderedDict
+
+# Tempo que um valor antigo continua sendo servido após uma falha no banco
+STALE_RETRY_SECONDS = 30
+
+
+class ConfigCache:
+    """Cache TTL + write-through das configurações por servidor.
+
+    As entradas são chaveadas por (coleção, guild_id). Os métodos save_*/
+    set_guild_config dos cogs atualizam ou invalidam a entrada, e se o banco
+    falhar o último valor conhecido continua sendo servido.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._entries = {}
+
+    async def get(self, collection, guild_id, loader):
+        """Retorna a configuração em cache ou carrega com ``loader()``"""
+        key = (collection, str(guild_id))
+        entry = self._entries.get(key)
+        now = time.monotonic()
+
+        if entry is not None and entry[1] > now:
+            return entry[0]
+
+        try:
+            value = await loader()
+        except Exception as e:
+            if entry is None:
+                raise
+            # Banco indisponível: serve o valor antigo e tenta de novo mais tarde
+            print(f"⚠️ Usando configuração em cache para {key}: {e}")
+            self._entries[key] = (entry[0], now + STALE_RETRY_SECONDS)
+            return entry[0]
+
+        self._entries[key] = (value, now + self.ttl)
+        return value
+
+    def set(self, collection, guild_id, value):
+        """Grava o valor no cache (write-through após salvar no banco)"""
+        self._entries[(collection, str(guild_id))] = (value, time.monotonic() + self.ttl)
+
+    def peek(self, collection, guild_id):
+        """Retorna o valor em cache sem carregar, ou None"""
+        entry = self._entries.get((collection, str(guild_id)))
+        return entry[0] if entry is not None else None
+
+    def invalidate(self, collection, guild_id=None):
+        """Remove uma entrada (ou todas as entradas da coleção)"""
+        if guild_id is not None:
+            self._entries.pop((collection, str(guild_id)), None)
+            return
+
+        for key in [key for key in self._entries if key[0] == collection]:
+            del self._entries[key]
+
+
+# Sentinela de "não está em cache" (None é um valor válido: usuário sem documento)
+MISSING = object()
+
+
+class LRUCache:
+    """Cache LRU limitado (com TTL) dos perfis de usuário.
+
+    As entradas são chaveadas por (coleção, chave). Guardar ``None`` registra
+    que o documento não existe (cache negativo), assim consultas de usuários
+    sem registro não voltam ao banco nem criam documentos.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, collection, key):
+        """Retorna o valor em cache (pode ser None) ou MISSING"""
+        cache_key = (collection, str(key))
+        entry = self._entries.get(cache_key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self._entries[cache_key]
+            self.misses += 1
+            return MISSING
+
+        self._entries.move_to_end(cache_key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, collection, key, value):
+        cache_key = (collection, str(key))
+        self._entries[cache_key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, collection, key):
+        self._entries.pop((collection, str(key)), None)
@@ -0,0 +1,131 @@
+import asyncio
+import os
+from motor.motor_asyncio import AsyncIOMotorClient
+from utils.cache import ConfigCache, LRUCache
+
+
+def get_mongo_uri():
+    """Obtém a URL do MongoDB (aceita os nomes de variável usados pelos cogs)"""
+    return (
+        os.getenv("MONGO_URI")
+        or os.getenv("MONGO_URL")
+        or os.getenv("MONGODB_URI")
+        or os.getenv("MONGODB_URL")
+    )
+
+
+def env_flag(name, default):
+    """Lê uma variável de ambiente booleana (1/true/yes/on)"""
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_tls_options():
+    """Opções TLS do cliente.
+
+    O padrão repete o que o main.py usava antes do pool compartilhado
+    (tls=True, tlsAllowInvalidCertificates=True), para que deployments
+    existentes continuem conectando. Com um certificado válido, defina
+    MONGO_TLS_ALLOW_INVALID_CERTIFICATES=false.
+    """
+    if not env_flag("MONGO_TLS", "true"):
+        return {"tls": False}
+    return {
+        "tls": True,
+        "tlsAllowInvalidCertificates": env_flag("MONGO_TLS_ALLOW_INVALID_CERTIFICATES", "true")
+    }
+
+
+def get_pool_options():
+    """Configuração única do pool de conexões (compartilhado por todos os cogs)"""
+    return {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "20")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000")),
+        "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000")),
+        "retryWrites": True,
+        "appname": "NatanBot",
+        **get_tls_options()
+    }
+
+
+def get_config_cache_ttl():
+    """Tempo (segundos) que uma configuração de servidor fica em cache"""
+    return int(os.getenv("CONFIG_CACHE_TTL", "300"))
+
+
+def get_profile_cache_options():
+    """Tamanho e TTL do cache LRU de perfis (Economia/XP)"""
+    return {
+        "maxsize": int(os.getenv("PROFILE_CACHE_SIZE", "10000")),
+        "ttl": int(os.getenv("PROFILE_CACHE_TTL", "300"))
+    }
+
+
+class Database:
+    """Camada de acesso ao MongoDB compartilhada pelo bot.
+
+    Um único AsyncIOMotorClient (um pool, um monitor, um handshake TLS) é
+    criado aqui e emprestado por todos os cogs através de ``bot.database``.
+    """
+
+    def __init__(self, uri=None, db_name=None):
+        self.uri = uri or get_mongo_uri()
+        self.db_name = db_name or os.getenv("MONGO_DB_NAME", "discord_bot")
+        self.pool_options = get_pool_options()
+        self.client = None
+        self.db = None
+        self._connection_ready = False
+        self._lock = asyncio.Lock()
+
+        # Cache compartilhado de configurações por servidor
+        self.config_cache = ConfigCache(ttl=get_config_cache_ttl())
+        # Cache LRU compartilhado de perfis de usuário (users, xp_data)
+        self.profiles = LRUCache(**get_profile_cache_options())
+
+        if self.uri:
+            self.client = AsyncIOMotorClient(self.uri, **self.pool_options)
+            self.db = self.client[self.db_name]
+
+    @property
+    def connection_ready(self):
+        return self._connection_ready
+
+    def __getitem__(self, name):
+        """Retorna uma coleção do banco compartilhado"""
+        return self.db[name]
+
+    async def ensure_connection(self):
+        """Garante que a conexão está ativa (um único ping para todos os cogs)"""
+        if self._connection_ready:
+            return True
+
+        if not self.client:
+            print("❌ MONGO_URI não encontrada nas variáveis de ambiente!")
+            return False
+
+        async with self._lock:
+            if self._connection_ready:
+                return True
+            try:
+                print("🔄 Conectando ao MongoDB...")
+                await self.client.admin.command('ping')
+                self._connection_ready = True
+                print(f"✅ Conectado ao MongoDB com sucesso! (pool máx: {self.pool_options['maxPoolSize']})")
+            except Exception as e:
+                print(f"❌ Erro ao conectar com MongoDB: {e}")
+                self._connection_ready = False
+
+        return self._connection_ready
+
+    def mark_unavailable(self):
+        """Força um novo ping na próxima chamada de ensure_connection"""
+        self._connection_ready = False
+
+    def close(self):
+        """Fecha o pool de conexões compartilhado"""
+        if self.client:
+            self.client.close()
+            self._connection_ready = False
+            print("🔌 Conexão com MongoDB fechada")
@@ -0,0 +1,51 @@
+import asyncio
+import weakref
+
+
+class KeyedLock:
+    """Um asyncio.Lock por chave (ex.: user_key), criado sob demanda.
+
+    Os locks ficam em um WeakValueDictionary: quando ninguém mais segura ou
+    espera o lock de uma chave ele é coletado, então a memória acompanha só
+    os usuários ativos no momento.
+
+        async with self.user_locks(user_key):
+            ...
+    """
+
+    def __init__(self):
+        self._locks = weakref.WeakValueDictionary()
+
+    def __call__(self, key):
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    def __len__(self):
+        return len(self._locks)
+
+
+class SingleFlight:
+    """Agrupa chamadas simultâneas com a mesma chave em uma única execução.
+
+    Enquanto ``do(key, func)`` está em andamento, outras chamadas com a mesma
+    chave aguardam o mesmo resultado em vez de repetir a consulta. O resultado
+    é compartilhado: quem for alterá-lo deve trabalhar em uma cópia.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, func):
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        # shield: cancelar um chamador não cancela a consulta dos outros
+        return await asyncio.shield(future)
+
+    def __len__(self):
+        return len(self._calls)
@@ -0,0 +1,125 @@
+import os
+from collections import OrderedDict, deque
+
+
+def get_message_store_options():
+    """Limites do armazenamento de mensagens (memória previsível: total de registros x conteúdo)"""
+    return {
+        "per_channel": int(os.getenv("MESSAGE_STORE_PER_CHANNEL", "200")),
+        "max_channels": int(os.getenv("MESSAGE_STORE_MAX_CHANNELS", "500")),
+        "max_records": int(os.getenv("MESSAGE_STORE_MAX_RECORDS", "20000")),
+        "max_content": int(os.getenv("MESSAGE_STORE_MAX_CONTENT", "500"))
+    }
+
+
+class StoredMessage:
+    """Registro compacto de uma mensagem (sem o objeto discord.Message)"""
+
+    __slots__ = ("message_id", "channel_id", "author_id", "author_name", "author_bot", "content", "attachments")
+
+    def __init__(self, message_id, channel_id, author_id, author_name, author_bot, content, attachments):
+        self.message_id = message_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.author_name = author_name
+        self.author_bot = author_bot
+        self.content = content
+        self.attachments = attachments
+
+
+class ChannelBuffer:
+    """Buffer circular de um canal: deque na ordem de chegada + índice por id"""
+
+    __slots__ = ("order", "index")
+
+    def __init__(self):
+        self.order = deque()
+        self.index = {}
+
+
+class MessageStore:
+    """Conteúdo das mensagens recentes por canal, para logs de edição/remoção.
+
+    Cada canal guarda no máximo ``per_channel`` mensagens (as mais antigas
+    saem primeiro) e no máximo ``max_channels`` canais ficam em memória (os
+    menos ativos são descartados). O total entre todos os canais é limitado
+    por ``max_records``: acima dele saem as mensagens mais antigas do canal
+    menos ativo. Assim o custo de memória fica em torno de
+    ``max_records * max_content``, independente do cache do discord.py.
+    """
+
+    def __init__(self, per_channel=200, max_channels=500, max_records=20000, max_content=500):
+        self.per_channel = per_channel
+        self.max_channels = max_channels
+        self.max_records = max_records
+        self.max_content = max_content
+        self._channels = OrderedDict()
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _evict_oldest(self):
+        """Descarta a mensagem mais antiga do canal menos ativo"""
+        channel_id, buffer = next(iter(self._channels.items()))
+        while buffer.order:
+            if buffer.index.pop(buffer.order.popleft(), None) is not None:
+                self._size -= 1
+                break
+        if not buffer.order:
+            del self._channels[channel_id]
+
+    def add(self, message):
+        """Guarda uma mensagem recebida em on_message"""
+        buffer = self._channels.get(message.channel.id)
+        if buffer is None:
+            buffer = self._channels[message.channel.id] = ChannelBuffer()
+            while len(self._channels) > self.max_channels:
+                _, evicted = self._channels.popitem(last=False)
+                self._size -= len(evicted.index)
+        else:
+            self._channels.move_to_end(message.channel.id)
+            if message.id in buffer.index:
+                return
+
+        if len(buffer.order) >= self.per_channel:
+            oldest = buffer.order.popleft()
+            if buffer.index.pop(oldest, None) is not None:
+                self._size -= 1
+
+        buffer.order.append(message.id)
+        buffer.index[message.id] = StoredMessage(
+            message.id,
+            message.channel.id,
+            message.author.id,
+            str(message.author),
+            message.author.bot,
+            message.content[:self.max_content],
+            len(message.attachments)
+        )
+        self._size += 1
+        while self._size > self.max_records:
+            self._evict_oldest()
+
+    def get(self, channel_id, message_id):
+        buffer = self._channels.get(channel_id)
+        return buffer.index.get(message_id) if buffer else None
+
+    def pop(self, channel_id, message_id):
+        """Remove e retorna o registro (a posição no deque é limpa ao sair do buffer)"""
+        buffer = self._channels.get(channel_id)
+        record = buffer.index.pop(message_id, None) if buffer else None
+        if record is not None:
+            self._size -= 1
+        return record
+
+    def update_content(self, channel_id, message_id, content):
+        record = self.get(channel_id, message_id)
+        if record is not None:
+            record.content = content[:self.max_content]
+        return record
+
+    def remove_channel(self, channel_id):
+        buffer = self._channels.pop(channel_id, None)
+        if buffer is not None:
+            self._size -= len(buffer.index)
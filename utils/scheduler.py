@@ -0,0 +1,99 @@
+import asyncio
+import heapq
+import itertools
+from datetime import datetime
+
+# Tempo máximo dormindo de uma vez (protege contra ajustes no relógio do sistema)
+MAX_SLEEP_SECONDS = 3600
+
+
+class DeadlineScheduler:
+    """Agendador de prazos em memória: um heap e uma única task.
+
+    Cada chave tem no máximo um prazo. A task dorme até o prazo mais próximo
+    (ou até ser acordada por um prazo mais cedo) e chama ``callback(chaves)``
+    com todas as chaves vencidas de uma vez. Reagendar e cancelar são
+    O(log n); entradas antigas ficam no heap e são descartadas quando chegam
+    ao topo.
+    """
+
+    def __init__(self, callback, name="agendador"):
+        self.callback = callback
+        self.name = name
+        self._heap = []
+        self._deadlines = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def deadline(self, key):
+        """Retorna o prazo agendado para a chave, ou None"""
+        return self._deadlines.get(key)
+
+    def schedule(self, key, when):
+        """Agenda (ou reagenda) a chave para ``when`` (datetime)"""
+        self._deadlines[key] = when
+        heapq.heappush(self._heap, (when, next(self._counter), key))
+        if self._heap[0][2] == key:
+            self._wakeup.set()
+
+    def cancel(self, key):
+        """Cancela o prazo da chave; retorna True se ela estava agendada"""
+        return self._deadlines.pop(key, None) is not None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _is_current(self, entry):
+        when, _, key = entry
+        return self._deadlines.get(key) == when
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if self._is_current(entry):
+                del self._deadlines[entry[2]]
+                due.append(entry[2])
+        return due
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+
+            # Descarta entradas canceladas/reagendadas no topo do heap
+            while self._heap and not self._is_current(self._heap[0]):
+                heapq.heappop(self._heap)
+
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = (self._heap[0][0] - datetime.now()).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=min(delay, MAX_SLEEP_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due = self._pop_due(datetime.now())
+            if not due:
+                continue
+
+            try:
+                await self.callback(due)
+            except Exception as e:
+                print(f"❌ Erro no {self.name}: {e}")